@@ -14,8 +14,11 @@
 
 """App Engine datastore related functions and classes."""
 
+import operator
+
 from django.core import validators
 
+from google.appengine.api import datastore
 from google.appengine.ext import db
 from google.appengine.ext import ndb
 
@@ -112,3 +115,172 @@ def addFilterToNDBQuery(query, prop, values):
   else:
     return query.filter(prop.IN(values))
 
+
+# Mapping of query operators to functions which evaluate them in memory.
+_OPERATORS = {
+    '=': operator.eq,
+    '==': operator.eq,
+    '<': operator.lt,
+    '<=': operator.le,
+    '>': operator.gt,
+    '>=': operator.ge,
+    }
+
+# Name of the pseudo property which refers to keys of entities.
+_KEY_PROPERTY_NAME = '__key__'
+
+
+class QueryFilter(object):
+  """In-memory equivalent of filters of a datastore query.
+
+  It can be used to check if an entity is fetched by a query without
+  actually running the query against datastore.
+  """
+
+  def __init__(self, filters, ancestor=None):
+    """Initializes a new instance of QueryFilter class.
+
+    Args:
+      filters: A list of tuples. Each of them contains datastore name of
+        a property, a query operator and a value to compare with.
+      ancestor: db.Key of the ancestor entity, if the query is restricted
+        to the entity group of that entity.
+    """
+    self.filters = filters
+    self.ancestor = ancestor
+
+  def matches(self, entity):
+    """Checks whether the specified entity satisfies filters of the query.
+
+    Args:
+      entity: A db or ndb entity.
+
+    Returns:
+      True if the entity satisfies the filters, False if it does not.
+      None is returned if it cannot be determined in memory.
+    """
+    key = _toOldKey(entity)
+    if self.ancestor is not None:
+      parent = key
+      while parent is not None and parent != self.ancestor:
+        parent = parent.parent()
+      if parent is None:
+        return False
+
+    for name, op, value in self.filters:
+      if name == _KEY_PROPERTY_NAME:
+        entity_values = [key]
+      else:
+        entity_values = _getDatastoreValues(entity, name)
+        if entity_values is None:
+          return None
+
+      # keys are ordered differently in datastore and in memory
+      if op not in ('=', '==') and any(
+          isinstance(v, db.Key) for v in entity_values + [value]):
+        return None
+
+      # repeated properties match, if any of their values matches
+      if not any(_OPERATORS[op](v, value) for v in entity_values):
+        return False
+
+    return True
+
+
+def _toOldKey(entity):
+  """Returns db.Key of the specified db or ndb entity."""
+  if isinstance(entity, ndb.Model):
+    return entity.key.to_old_key()
+  else:
+    return entity.key()
+
+
+def _getDatastoreValues(entity, name):
+  """Returns values of the specified property of an entity in the form
+  in which they are stored in datastore.
+
+  Args:
+    entity: A db or ndb entity.
+    name: Datastore name of the property.
+
+  Returns:
+    A list of values of the property. None, if the values cannot be
+    determined.
+  """
+  if isinstance(entity, ndb.Model):
+    prop = entity._properties.get(name)
+    if prop is None or '.' in name:
+      return None
+    value = prop._get_value(entity)
+    values = value if prop._repeated else [value]
+    return [
+        None if v is None else prop._datastore_type(prop._call_to_base_type(v))
+        for v in values]
+  else:
+    props = dict(
+        (prop.name, prop) for prop in entity.properties().itervalues())
+    prop = props.get(name)
+    if prop is None:
+      return None
+    value = prop.get_value_for_datastore(entity)
+    return value if isinstance(value, list) else [value]
+
+
+def getQueryFilter(query):
+  """Returns in-memory equivalent of filters of the specified query.
+
+  Only conjunctions of simple comparisons are supported. Queries with
+  other filters, for example with disjunctions or filters on structured
+  properties, have to be run against datastore.
+
+  Args:
+    query: A db or ndb query.
+
+  Returns:
+    QueryFilter object for the query or None, if filters of the query
+    cannot be evaluated in memory.
+  """
+  if isinstance(query, ndb.Query):
+    ancestor = query.ancestor.to_old_key() if query.ancestor else None
+
+    if query.filters is None:
+      nodes = []
+    elif isinstance(query.filters, ndb.ConjunctionNode):
+      nodes = list(query.filters)
+    else:
+      nodes = [query.filters]
+
+    filters = []
+    for node in nodes:
+      if type(node) is not ndb.FilterNode:
+        return None
+      name, op, value = node.__getnewargs__()
+      if op not in _OPERATORS:
+        return None
+      filters.append((name, op, value))
+    return QueryFilter(filters, ancestor=ancestor)
+  else:
+    datastore_query = query._get_query()
+    if not isinstance(datastore_query, datastore.Query):
+      # queries with IN and != filters are run as multiple queries
+      return None
+
+    filters = []
+    for filter_str, values in datastore_query.iteritems():
+      parts = filter_str.split()
+      name = parts[0]
+      op = parts[1] if len(parts) > 1 else '='
+      if op not in _OPERATORS:
+        return None
+
+      # more filters for the same property and operator are grouped together
+      if not isinstance(values, list):
+        values = [values]
+      filters.extend((name, op, value) for value in values)
+
+    # db.Query does not expose its ancestor publicly
+    ancestor = getattr(query, '_Query__ancestor', None)
+    if ancestor is not None and not isinstance(ancestor, db.Key):
+      ancestor = ancestor.key()
+
+    return QueryFilter(filters, ancestor=ancestor)
@@ -14,12 +14,33 @@
 
 """Contains logic concerning cached lists."""
 
+import collections
+import datetime
+
 from google.appengine.ext import ndb
 
 from melange import key_column_id_const
 from melange.models import cached_list as cached_list_model
 
-import datetime
+
+# Maximal number of list items which are stored in a single CachedListPage.
+PAGE_SIZE = 500
+
+
+def _getPageKey(data_id, page_number):
+  """Returns key of the page with the specified number of a cached list.
+
+  Args:
+    data_id: A string containing the unique id of the cached list data.
+    page_number: Number of the page, starting with 0.
+
+  Returns:
+    ndb.Key of the CachedListPage entity.
+  """
+  # ndb does not accept zero as a numeric identifier
+  return ndb.Key(
+      cached_list_model.CachedList, data_id,
+      cached_list_model.CachedListPage, page_number + 1)
 
 
 def setCacheItems(data_id, items, valid_period=datetime.timedelta(1)):
@@ -31,7 +52,7 @@ def setCacheItems(data_id, items, valid_period=datetime.timedelta(1)):
   Args:
     data_id: A string containing the unique id of the cached list data.
     items: The list of dicts each representing an item in the list.
-    valid_through: A datetime.timedelta value indicating the time period the
+    valid_period: A datetime.timedelta value indicating the time period the
       cached data should be considered valid. Defaults to one day.
   """
   list_key = ndb.Key(cached_list_model.CachedList, data_id)
@@ -39,10 +60,168 @@ def setCacheItems(data_id, items, valid_period=datetime.timedelta(1)):
   if not cached_list:
     cached_list = cached_list_model.CachedList(id=data_id)
   items = _remove_duplicates(items, key_column_id_const.KEY_COLUMN_ID)
-  cached_list.list_data = items
+
   cached_list.valid_through = datetime.datetime.now() + valid_period
   cached_list.is_processing = False
-  cached_list.put()
+  _writeItems(cached_list, items)
+
+
+def _writeItems(cached_list, items):
+  """Stores the specified items in pages of a cached list.
+
+  All the pages are written and the pages which are left over after the list
+  shrank are removed. This function should always be run in a transaction.
+
+  Args:
+    cached_list: CachedList entity.
+    items: The list of dicts each representing an item in the list.
+  """
+  data_id = cached_list.key.id()
+
+  pages = []
+  for page_number, index in enumerate(range(0, len(items), PAGE_SIZE)):
+    page_items = items[index:index + PAGE_SIZE]
+    pages.append(cached_list_model.CachedListPage(
+        key=_getPageKey(data_id, page_number), list_data=page_items,
+        item_keys=[
+            item[key_column_id_const.KEY_COLUMN_ID] for item in page_items]))
+
+  # remove pages which are left over after the list shrank
+  stale_page_keys = [
+      _getPageKey(data_id, page_number)
+      for page_number in range(len(pages), cached_list.no_of_pages or 0)]
+  if stale_page_keys:
+    ndb.delete_multi(stale_page_keys)
+
+  cached_list.list_data = []
+  cached_list.no_of_items = len(items)
+  cached_list.no_of_pages = len(pages)
+  cached_list.page_sizes = [len(page.list_data) for page in pages]
+  ndb.put_multi([cached_list] + pages)
+
+
+def _getPageSizes(cached_list):
+  """Returns numbers of items stored in the pages of a cached list.
+
+  Args:
+    cached_list: CachedList entity whose items are stored in pages.
+
+  Returns:
+    A list with the number of items of each page.
+  """
+  if cached_list.page_sizes or not cached_list.no_of_pages:
+    return cached_list.page_sizes
+
+  # all the pages but the last one are full
+  last_page_size = cached_list.no_of_items - (
+      (cached_list.no_of_pages - 1) * PAGE_SIZE)
+  return [PAGE_SIZE] * (cached_list.no_of_pages - 1) + [last_page_size]
+
+
+def _isIndexed(cached_list):
+  """Checks whether items of the pages of a cached list are indexed.
+
+  Args:
+    cached_list: CachedList entity whose items are stored in pages.
+
+  Returns:
+    True if the pages are indexed, False otherwise.
+  """
+  # lists with no pages have nothing to index
+  return bool(cached_list.page_sizes or not cached_list.no_of_pages)
+
+
+def _updateItem(items, item_key, item):
+  """Replaces, appends or removes an item in the specified list of items.
+
+  Args:
+    items: The list of dicts each representing an item in the list.
+    item_key: Value of the key column of the item.
+    item: A dict representing the updated item or None to remove it.
+
+  Returns:
+    A new list of items.
+  """
+  items = list(items)
+  for index, existing_item in enumerate(items):
+    if existing_item[key_column_id_const.KEY_COLUMN_ID] == item_key:
+      if item is None:
+        del items[index]
+      else:
+        items[index] = item
+      break
+  else:
+    if item is not None:
+      items.append(item)
+  return items
+
+
+def updateCachedItem(data_id, item_key, item=None):
+  """Updates a single item of a cached list in place.
+
+  The item is replaced, if it already exists in the list, or appended to
+  the end of the list otherwise. The page which stores the item is found by
+  its index of item keys, so that only that page and the list entity are
+  read and written. Validity of the list is not affected.
+
+  This function should always be run in a transaction.
+
+  Args:
+    data_id: A string containing the unique id of the cached list data.
+    item_key: Value of the key column of the item.
+    item: A dict representing the updated item. If None, the item is
+      removed from the list.
+
+  Returns:
+    True if the list has been updated, False if it does not exist or
+    it has not been changed.
+  """
+  list_key = ndb.Key(cached_list_model.CachedList, data_id)
+  cached_list = list_key.get()
+
+  if not cached_list:
+    return False
+
+  if cached_list.no_of_pages is None or not _isIndexed(cached_list):
+    # lists stored before their pages were indexed are entirely rewritten
+    old_items = _readItems(cached_list)
+    items = _updateItem(old_items, item_key, item)
+    if items == old_items:
+      return False
+    _writeItems(cached_list, items)
+    return True
+
+  page_sizes = _getPageSizes(cached_list)
+  page = cached_list_model.CachedListPage.query(
+      cached_list_model.CachedListPage.item_keys == item_key,
+      ancestor=list_key).get()
+
+  if page:
+    page_items = _updateItem(page.list_data, item_key, item)
+    if page_items == page.list_data:
+      return False
+  elif item is None:
+    return False
+  elif page_sizes and page_sizes[-1] < PAGE_SIZE:
+    # new items are appended to the last page, unless it is full
+    page = _getPageKey(data_id, len(page_sizes) - 1).get()
+    page_items = page.list_data + [item]
+  else:
+    page = cached_list_model.CachedListPage(
+        key=_getPageKey(data_id, len(page_sizes)))
+    page_sizes.append(0)
+    page_items = [item]
+
+  page.list_data = page_items
+  page.item_keys = [
+      page_item[key_column_id_const.KEY_COLUMN_ID] for page_item in page_items]
+
+  page_sizes[page.key.id() - 1] = len(page_items)
+  cached_list.page_sizes = page_sizes
+  cached_list.no_of_pages = len(page_sizes)
+  cached_list.no_of_items = sum(page_sizes)
+  ndb.put_multi([cached_list, page])
+  return True
 
 
 def _remove_duplicates(items, key='key'):
@@ -91,10 +270,175 @@ def getCachedItems(data_id, start=0, limit=None):
   if not cached_list:
     raise ValueError('A cached list with data id %s does not exist' % data_id)
 
+  return _readItems(cached_list, start=start, limit=limit)
+
+
+def _readItems(cached_list, start=0, limit=None):
+  """Reads the specified items of a cached list.
+
+  Args:
+    cached_list: CachedList entity.
+    start: The starting index of the items returned.
+    limit: Number of items to be returned. If None, all the items after
+      the starting index are returned.
+
+  Returns:
+    A list of dicts each representing an item in the cached list.
+  """
+  if cached_list.no_of_pages is None:
+    # items are stored directly in the list entity
+    if limit:
+      return cached_list.list_data[start:(start + limit)]
+    else:
+      return cached_list.list_data[start:]
+
+  end = cached_list.no_of_items
   if limit:
-    return cached_list.list_data[start:(start + limit)]
+    end = min(end, start + limit)
+  if start >= end:
+    return []
+
+  # only the pages which contain the requested items are fetched
+  page_keys = []
+  offset = first_offset = 0
+  for page_number, page_size in enumerate(_getPageSizes(cached_list)):
+    if offset < end and offset + page_size > start:
+      if not page_keys:
+        first_offset = offset
+      page_keys.append(_getPageKey(cached_list.key.id(), page_number))
+    offset += page_size
+
+  items = []
+  for page in ndb.get_multi(page_keys):
+    items.extend(page.list_data if page else [])
+
+  return items[(start - first_offset):(end - first_offset)]
+
+
+def _getNumberOfItems(cached_list):
+  """Returns the number of items which are stored in a cached list.
+
+  Args:
+    cached_list: CachedList entity.
+
+  Returns:
+    The number of cached items.
+  """
+  if cached_list.no_of_pages is None:
+    return len(cached_list.list_data)
+  else:
+    return cached_list.no_of_items
+
+
+def _isValid(cached_list):
+  """Checks whether the specified cached list is still valid.
+
+  Args:
+    cached_list: CachedList entity.
+
+  Returns:
+    True if the list is valid, False otherwise.
+  """
+  return bool(cached_list.valid_through and
+      cached_list.valid_through > datetime.datetime.now())
+
+
+def _isWithinStaleness(cached_list, max_staleness):
+  """Checks whether the specified cached list may still be served after
+  it has become invalid.
+
+  Args:
+    cached_list: CachedList entity.
+    max_staleness: A datetime.timedelta value indicating for how long after
+      the list has become invalid it may be served. If None, invalid lists
+      may not be served.
+
+  Returns:
+    True if the list may be served, False otherwise.
+  """
+  return bool(max_staleness is not None and cached_list.valid_through and
+      cached_list.valid_through + max_staleness > datetime.datetime.now())
+
+
+# State of a cached list along with a batch of its items.
+CachedListState = collections.namedtuple(
+    'CachedListState',
+    ['exists', 'is_valid', 'is_processing', 'no_of_items', 'items'])
+
+# State returned for cached lists which do not exist.
+_NON_EXISTENT_LIST_STATE = CachedListState(False, False, False, 0, None)
+
+
+def getCachedListsForList(list_id):
+  """Returns all cached lists which store data for the specified list.
+
+  Args:
+    list_id: The id of the list.
+
+  Returns:
+    A list of CachedList entities.
+  """
+  return cached_list_model.CachedList.query(
+      cached_list_model.CachedList.list_id == list_id).fetch(1000)
+
+
+def getCachedListState(data_id, start=0, limit=None, max_staleness=None):
+  """Returns the state of a cached list and the requested items.
+
+  All the information is read from a single lookup of the list entity
+  followed by one batch lookup of the pages containing the requested items.
+  The lookups go through the in-context cache and memcache, so that
+  repeated reads of a warm list do not hit the datastore.
+
+  Args:
+    data_id: A string containing the unique id of the cached list data.
+    start: The starting index of the items returned.
+    limit: Number of items to be returned. If None, all the items after
+      the starting index are returned.
+    max_staleness: A datetime.timedelta value indicating for how long after
+      the list has become invalid its items may still be returned. If None,
+      items of invalid lists are not returned.
+
+  Returns:
+    CachedListState object for the list. Its items are set only if
+    the list is valid or has not been invalid for longer than the specified
+    staleness, otherwise they are None.
+  """
+  list_key = ndb.Key(cached_list_model.CachedList, data_id)
+  cached_list = list_key.get()
+
+  if not cached_list:
+    return _NON_EXISTENT_LIST_STATE
+
+  is_valid = _isValid(cached_list)
+  if is_valid or _isWithinStaleness(cached_list, max_staleness):
+    items = _readItems(cached_list, start=start, limit=limit)
   else:
-    return cached_list.list_data[start:]
+    items = None
+  return CachedListState(
+      True, is_valid, bool(cached_list.is_processing),
+      _getNumberOfItems(cached_list), items)
+
+
+def getNumberOfItems(data_id):
+  """Returns the number of items which are stored in a cached list.
+
+  Args:
+    data_id: A string containing the unique id of the cached list data.
+
+  Raises:
+    ValueError: if a cached list does not exist for the given list id.
+
+  Returns:
+    The number of cached items.
+  """
+  list_key = ndb.Key(cached_list_model.CachedList, data_id)
+  cached_list = list_key.get()
+
+  if not cached_list:
+    raise ValueError('A cached list with data id %s does not exist' % data_id)
+
+  return _getNumberOfItems(cached_list)
 
 
 def isCachedListExists(data_id):
@@ -132,11 +476,7 @@ def isValid(data_id):
   if not cached_list:
     raise ValueError('A cached list with data id %s does not exist' % data_id)
 
-  if cached_list.valid_through and \
-         cached_list.valid_through > datetime.datetime.now():
-    return True
-  else:
-    return False
+  return _isValid(cached_list)
 
 
 def isProcessing(data_id):
@@ -179,6 +519,40 @@ def setProcessing(data_id):
   cached_list.put()
 
 
+def startProcessing(data_id, list_id=None, query_pickle=None):
+  """Changes the list state to indicate a caching process is running.
+
+  If a cached list does not exist for the given data id, an empty list
+  in processing state is created. This function should always be run in
+  a transaction.
+
+  Args:
+    data_id: A string containing the unique id of the cached list data.
+    list_id: The id of the list whose data is cached.
+    query_pickle: A pickled query which is used to collect data for the list.
+
+  Returns:
+    True if the list has been set to processing state, False if a caching
+    process was already running for the list.
+  """
+  list_key = ndb.Key(cached_list_model.CachedList, data_id)
+  cached_list = list_key.get()
+
+  if not cached_list:
+    cached_list = cached_list_model.CachedList(
+        id=data_id, list_data=[], no_of_items=0, no_of_pages=0)
+  elif cached_list.is_processing:
+    return False
+
+  cached_list.is_processing = True
+  if list_id:
+    cached_list.list_id = list_id
+  if query_pickle:
+    cached_list.query_pickle = query_pickle
+  cached_list.put()
+  return True
+
+
 def createEmptyProcessingList(data_id):
   """Create a cached list with empty list data and in processing state.
 
@@ -196,5 +570,7 @@ def createEmptyProcessingList(data_id):
 
   cached_list = cached_list_model.CachedList(id=data_id)
   cached_list.list_data = []
+  cached_list.no_of_items = 0
+  cached_list.no_of_pages = 0
   cached_list.is_processing = True
   cached_list.put()
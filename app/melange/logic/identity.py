@@ -0,0 +1,292 @@
+# Copyright 2014 the Melange authors.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Logic for resolving identity of the currently logged in user."""
+
+from google.appengine.api import memcache
+from google.appengine.api import users
+from google.appengine.ext import db
+from google.appengine.ext import ndb
+
+from melange import types
+from melange.logic import profile as profile_logic
+from melange.models import settings as settings_model
+from melange.models import user as user_model
+
+from soc.logic import user as db_user_logic
+from soc.models import program as program_model
+from soc.models import user as db_user_model
+
+
+# Time for which keys of users are cached for their accounts. Keys of users
+# never change, so only short lived caching is used to make sure that
+# deleted users are eventually forgotten.
+_USER_KEY_CACHE_TIME = 10 * 60
+
+_USER_KEY_CACHE_KEY = 'user_key_for_account_%s'
+
+
+class Identity(object):
+  """Identity of the currently logged in user.
+
+  Both the legacy db entities and their ndb counterparts are available,
+  so that all the code which accesses them is served by a single lookup.
+
+  Attributes:
+    user: soc.models.user.User entity of the user or None.
+    ndb_user: melange.models.user.User entity of the user or None.
+    profile: db profile entity of the user for the program or None.
+    ndb_profile: ndb profile entity of the user for the program or None.
+    program_key: db.Key of the program for which the profiles have been
+      resolved or None, if they have not been resolved.
+    view_as_user: db user entity of the developer who views the site as the
+      user or None, if the site is not viewed as another user.
+    view_as_ndb_user: ndb user entity of the developer who views the site as
+      the user or None, if the site is not viewed as another user.
+    view_as_missing: Whether the user as which the site is supposed to be
+      viewed does not exist. In that case, view_as_user and view_as_ndb_user
+      are set to the developer but the other attributes are unspecified.
+  """
+
+  def __init__(self, user=None, ndb_user=None, profile=None,
+      ndb_profile=None, program_key=None):
+    """Initializes a new instance of this class.
+
+    Args:
+      user: soc.models.user.User entity of the user or None.
+      ndb_user: melange.models.user.User entity of the user or None.
+      profile: db profile entity of the user for the program or None.
+      ndb_profile: ndb profile entity of the user for the program or None.
+      program_key: db.Key of the program for which the profiles have been
+        resolved or None, if they have not been resolved.
+    """
+    self.user = user
+    self.ndb_user = ndb_user
+    self.profile = profile
+    self.ndb_profile = ndb_profile
+    self.program_key = program_key
+    self.view_as_user = None
+    self.view_as_ndb_user = None
+    self.view_as_missing = False
+
+
+def _getUserKeyForAccountId(account_id, use_cache):
+  """Returns key of the user entity associated with the specified account.
+
+  Args:
+    account_id: User ID of the Google account.
+    use_cache: Whether the key may be served from and stored in memcache.
+
+  Returns:
+    ndb.Key of the user or None, if no user exists for the account.
+  """
+  cache_key = _USER_KEY_CACHE_KEY % account_id
+  if use_cache:
+    user_id = memcache.get(cache_key)
+    if user_id:
+      return ndb.Key(user_model.User._get_kind(), user_id)
+
+  user_key = user_model.User.query(
+      user_model.User.account_id == account_id).get(keys_only=True)
+  if user_key and use_cache:
+    memcache.set(cache_key, user_key.id(), time=_USER_KEY_CACHE_TIME)
+  return user_key
+
+
+def _getProfileKeys(user_id, program_key, models):
+  """Returns keys of db and ndb profiles of the specified user for
+  the specified program.
+
+  Args:
+    user_id: Identifier of the user.
+    program_key: db.Key of the program.
+    models: instance of types.Models that represent appropriate models.
+
+  Returns:
+    A tuple of db.Key of db profile and ndb.Key of ndb profile.
+  """
+  db_profile_key = db.Key.from_path(
+      db_user_model.User.kind(), user_id,
+      models.profile_model.kind(), '%s/%s' % (program_key.name(), user_id))
+  ndb_profile_key = profile_logic.getProfileKey(
+      program_model.getSponsorId(program_key),
+      program_model.getProgramId(program_key), user_id, models=models)
+  return db_profile_key, ndb_profile_key
+
+
+def _fetchIdentity(user_key, program_key, models, fetch_db_user, db_user=None):
+  """Fetches entities of the identity of the specified user in a single
+  batch for each of db and ndb. The batches are processed concurrently.
+
+  Args:
+    user_key: ndb.Key of the user.
+    program_key: db.Key of the program for which profiles are fetched or
+      None, if profiles should not be fetched.
+    models: instance of types.Models that represent appropriate models.
+    fetch_db_user: Whether the db user should be fetched by its key.
+    db_user: db user entity, if it has already been fetched.
+
+  Returns:
+    Identity of the specified user.
+  """
+  ndb_keys = [user_key]
+  db_keys = [user_key.to_old_key()] if fetch_db_user else []
+  if program_key:
+    db_profile_key, ndb_profile_key = _getProfileKeys(
+        user_key.id(), program_key, models)
+    ndb_keys.append(ndb_profile_key)
+    if fetch_db_user or db_user:
+      db_keys.append(db_profile_key)
+
+  ndb_futures = ndb.get_multi_async(ndb_keys)
+  db_rpc = db.get_async(db_keys) if db_keys else None
+
+  db_entities = db_rpc.get_result() if db_rpc else []
+  if fetch_db_user:
+    db_user = db_entities.pop(0)
+  ndb_entities = [future.get_result() for future in ndb_futures]
+
+  identity = Identity(user=db_user, ndb_user=ndb_entities[0])
+  if program_key:
+    identity.program_key = program_key
+    identity.ndb_profile = ndb_entities[1]
+    if db_user and db_user.link_id == user_key.id():
+      identity.profile = db_entities[0]
+    elif db_user:
+      # the legacy user is not keyed by the same identifier
+      identity.profile = _getDbProfile(db_user, program_key, models)
+  return identity
+
+
+def _getDbProfile(db_user, program_key, models):
+  """Returns db profile of the specified user for the specified program.
+
+  Args:
+    db_user: db user entity.
+    program_key: db.Key of the program.
+    models: instance of types.Models that represent appropriate models.
+
+  Returns:
+    db profile entity or None, if the user has no profile for the program.
+  """
+  return models.profile_model.get_by_key_name(
+      '%s/%s' % (program_key.name(), db_user.link_id), parent=db_user)
+
+
+def getCurrentIdentity(
+    program_key=None, models=types.MELANGE_MODELS, use_cache=False):
+  """Returns identity of the currently logged in user.
+
+  Users, their settings and, if a program is specified, their profiles
+  are fetched in batches for both db and ndb entities. Developers who have
+  chosen to view the site as another user are resolved to that user.
+
+  Args:
+    program_key: Optional db.Key of the program for which profiles are
+      fetched. If not specified, profiles are not fetched.
+    models: instance of types.Models that represent appropriate models.
+    use_cache: Whether the key of the user associated with the current
+      account may be served from memcache.
+
+  Returns:
+    Identity of the currently logged in user.
+  """
+  account = users.get_current_user()
+  if not account:
+    return Identity(program_key=program_key)
+
+  account_id = account.user_id()
+  is_admin = users.is_current_user_admin()
+
+  # the legacy user is queried for concurrently with the rest of the identity
+  db_user_query = db_user_model.User.all()
+  db_user_query.filter('user_id', account_id)
+  db_user_query.filter('status', 'valid')
+  db_users = iter(db_user_query.run(limit=1))
+
+  user_key = _getUserKeyForAccountId(account_id, use_cache)
+  settings_future = None
+  if user_key:
+    if is_admin:
+      settings_future = ndb.Query(
+          kind=settings_model.UserSettings._get_kind(),
+          ancestor=user_key).get_async()
+    identity = _fetchIdentity(user_key, program_key, models, False,
+        db_user=next(db_users, None))
+    if not identity.ndb_user and use_cache:
+      # the cached key belongs to a user who has been deleted
+      memcache.delete(_USER_KEY_CACHE_KEY % account_id)
+      return getCurrentIdentity(program_key=program_key, models=models)
+  else:
+    identity = Identity(user=next(db_users, None), program_key=program_key)
+    if identity.user and program_key:
+      identity.profile = _getDbProfile(identity.user, program_key, models)
+
+  if identity.user:
+    db_user_logic.updateCurrentAccount(identity.user)
+  else:
+    # look up using the account address thereby setting the unique id
+    identity.user = db_user_logic.forCurrentAccount()
+    if identity.user and program_key:
+      identity.profile = _getDbProfile(identity.user, program_key, models)
+
+  # developer may view the page as another user
+  view_db_user = bool(
+      identity.user and (identity.user.is_developer or is_admin))
+  view_ndb_user = bool(identity.ndb_user and is_admin)
+  if view_db_user or view_ndb_user:
+    if settings_future:
+      settings = settings_future.get_result()
+    else:
+      settings = ndb.Query(
+          kind=settings_model.UserSettings._get_kind(),
+          ancestor=ndb.Key.from_old_key(identity.user.key())).get()
+    if settings and settings.view_as is not None:
+      identity = _viewAs(identity, settings.view_as, program_key, models,
+          view_db_user, view_ndb_user)
+
+  return identity
+
+
+def _viewAs(identity, view_as, program_key, models, view_db_user,
+    view_ndb_user):
+  """Returns identity of the user as which a developer views the site.
+
+  Args:
+    identity: Identity of the developer.
+    view_as: ndb.Key of the user as which the site is viewed.
+    program_key: db.Key of the program for which profiles are fetched or
+      None, if profiles should not be fetched.
+    models: instance of types.Models that represent appropriate models.
+    view_db_user: Whether the db user is viewed as another user.
+    view_ndb_user: Whether the ndb user is viewed as another user.
+
+  Returns:
+    Identity of the viewed user.
+  """
+  viewed_identity = _fetchIdentity(view_as, program_key, models, view_db_user)
+  if not view_db_user:
+    viewed_identity.user = identity.user
+    viewed_identity.profile = identity.profile
+  if not view_ndb_user:
+    viewed_identity.ndb_user = identity.ndb_user
+    viewed_identity.ndb_profile = identity.ndb_profile
+
+  viewed_identity.program_key = program_key
+  viewed_identity.view_as_user = identity.user
+  viewed_identity.view_as_ndb_user = identity.ndb_user
+  viewed_identity.view_as_missing = (
+      (view_db_user and not viewed_identity.user) or
+      (view_ndb_user and not viewed_identity.ndb_user))
+  return viewed_identity
@@ -32,6 +32,7 @@ from melange.models import survey as survey_model
 from melange.utils import rich_bool
 
 from soc.logic.helper import notifications
+from soc.tasks import cached_list as cached_list_task
 from soc.tasks import mailer
 
 
@@ -71,6 +72,7 @@ def createOrganization(
     organization = models.ndb_org_model(
         id=entity_id, org_id=org_id, program=program_key, **org_properties)
     organization.put()
+    cached_list_task.spawnUpdateCachedItemsTask(organization.key)
   except ValueError as e:
     return rich_bool.RichBool(False, extra=str(e))
   except datastore_errors.BadValueError as e:
@@ -94,6 +96,7 @@ def updateOrganization(org, org_properties):
 
   org.populate(**org_properties)
   org.put()
+  cached_list_task.spawnUpdateCachedItemsTask(org.key)
 
 
 def getApplicationResponsesQuery(survey_key):
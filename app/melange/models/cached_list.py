@@ -18,13 +18,56 @@ from google.appengine.ext import ndb
 
 
 class CachedList(ndb.Model):
-  """The CachedList model, represents a list cached as a ndb entity."""
+  """The CachedList model, represents a list cached as a ndb entity.
 
-  # The list of items cached in the list in json format
+  Items of the list are stored in child CachedListPage entities, so that
+  the size of a single list is not bounded by the maximum size of an entity.
+  This entity holds only the header data of the list.
+  """
+
+  # The list of items cached in the list in json format. It is used only
+  # by lists which were cached before list pages were introduced.
   list_data = ndb.JsonProperty(repeated=True)
 
+  # Total number of items cached in the list
+  no_of_items = ndb.IntegerProperty(default=0)
+
+  # Number of CachedListPage entities which store items of the list. None, if
+  # the items are stored directly in list_data property.
+  no_of_pages = ndb.IntegerProperty()
+
+  # Numbers of items stored in the consecutive CachedListPage entities. Empty,
+  # if the pages were written before their items were indexed; all the pages
+  # but the last one are then full.
+  page_sizes = ndb.IntegerProperty(repeated=True, indexed=False)
+
   # If True a caching processing is running collecting data for this list
   is_processing = ndb.BooleanProperty()
 
   # When the list data should be invalidated
   valid_through = ndb.DateTimeProperty()
+
+  # The id of the list whose data is cached
+  list_id = ndb.StringProperty()
+
+  # Pickled query which is used to collect data for the list
+  query_pickle = ndb.BlobProperty()
+
+
+class CachedListPage(ndb.Model):
+  """A single page of items of a cached list.
+
+  Pages are identified by their consecutive numbers, starting with 1, so
+  that any page can be accessed directly by its key. A page may hold fewer
+  items than the others, after some of its items have been removed.
+
+  Parent:
+    melange.models.cached_list.CachedList
+  """
+
+  # The list of items which belong to this page in json format
+  list_data = ndb.JsonProperty(repeated=True)
+
+  # Values of the key column of the items which belong to this page, so that
+  # the page which stores a particular item may be queried
+  item_keys = ndb.GenericProperty(repeated=True)
@@ -0,0 +1,236 @@
+# Copyright 2014 the Melange authors.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""URL resolvers which index URL patterns by their literal prefixes."""
+
+from django.core import urlresolvers
+
+
+# Characters which have special meaning in regular expressions.
+_SPECIAL_CHARACTERS = frozenset('.^$*+?{}[]\\|()')
+
+# Characters which make the preceding character of a regular expression
+# optional or repeated.
+_QUANTIFIERS = frozenset('*+?{')
+
+# Separator of segments of URL paths.
+_SEPARATOR = '/'
+
+
+def _hasTopLevelAlternative(regex):
+  """Returns whether the specified regular expression contains an
+  alternative which is not enclosed in a group or a character class.
+
+  Args:
+    regex: Regular expression as a string.
+
+  Returns:
+    True if the expression contains a top-level '|'; False otherwise.
+  """
+  depth = 0
+  in_class = False
+  index = 0
+  while index < len(regex):
+    character = regex[index]
+    if character == '\\':
+      # the escaped character has no special meaning
+      index += 1
+    elif in_class:
+      in_class = character != ']'
+    elif character == '[':
+      in_class = True
+      # a closing bracket at the beginning of a class is a literal
+      if regex[index + 1:index + 2] == '^':
+        index += 1
+      if regex[index + 1:index + 2] == ']':
+        index += 1
+    elif character == '(':
+      depth += 1
+    elif character == ')':
+      depth -= 1
+    elif character == '|' and not depth:
+      return True
+    index += 1
+  return False
+
+
+def getLiteralPrefix(regex):
+  """Returns the literal prefix of the specified regular expression, i.e.
+  the longest prefix which is matched only by itself.
+
+  Expressions which are not anchored at the beginning or which consist of
+  a few alternatives may match paths starting with anything, so their
+  literal prefix is empty.
+
+  Args:
+    regex: Regular expression as a string.
+
+  Returns:
+    The literal prefix of the expression as a string.
+  """
+  if not regex.startswith('^') or _hasTopLevelAlternative(regex):
+    return ''
+
+  regex = regex[1:]
+
+  prefix = []
+  for index, character in enumerate(regex):
+    if character in _SPECIAL_CHARACTERS:
+      break
+    elif index + 1 < len(regex) and regex[index + 1] in _QUANTIFIERS:
+      # the character may be absent or repeated in matching paths
+      break
+    else:
+      prefix.append(character)
+  return ''.join(prefix)
+
+
+def _getSegments(path):
+  """Returns complete segments of the specified path, i.e. the ones which
+  are followed by the separator.
+
+  Args:
+    path: URL path as a string.
+
+  Returns:
+    A list of complete segments of the path.
+  """
+  return path.split(_SEPARATOR)[:-1]
+
+
+class _PrefixTreeNode(object):
+  """Node of a prefix tree of URL patterns.
+
+  Attributes:
+    patterns: List of (position, pattern) tuples for patterns whose literal
+      prefixes consist of the segments on the path to this node.
+    children: Dict mapping segments to child nodes.
+    resolver: Resolver for all patterns which may match paths ending at
+      this node, i.e. the patterns of this node and all its ancestors.
+  """
+
+  def __init__(self):
+    """Initializes a new instance of this class."""
+    self.patterns = []
+    self.children = {}
+    self.resolver = None
+
+
+class PrefixIndexedURLResolver(urlresolvers.RegexURLResolver):
+  """Resolver which dispatches URLs only to patterns whose literal
+  prefixes match them.
+
+  Patterns are indexed in a prefix tree by the segments of their literal
+  prefixes, e.g. 'gsoc/' or 'tasks/gsoc/'. Paths are resolved by trying,
+  in the order of their registration, only the patterns of the nodes on
+  the path of the matching segments. The cost of resolution thus does not
+  grow with the number of registered patterns, as long as they are
+  distributed among many prefixes.
+
+  Reverse lookups are handled by the base class which considers all
+  the patterns.
+  """
+
+  def __init__(self, url_patterns):
+    """Initializes a new instance of this class.
+
+    Args:
+      url_patterns: List of URL patterns as returned by
+        django.conf.urls.patterns.
+    """
+    super(PrefixIndexedURLResolver, self).__init__(r'^', url_patterns)
+    self._root = None
+
+  def _buildPrefixTree(self):
+    """Builds the prefix tree of all the patterns of this resolver.
+
+    Returns:
+      The root node of the tree.
+    """
+    root = _PrefixTreeNode()
+    for position, pattern in enumerate(self.url_patterns):
+      node = root
+      for segment in _getSegments(getLiteralPrefix(pattern.regex.pattern)):
+        node = node.children.setdefault(segment, _PrefixTreeNode())
+      node.patterns.append((position, pattern))
+
+    nodes = [(root, [])]
+    while nodes:
+      node, inherited_patterns = nodes.pop()
+      node_patterns = sorted(inherited_patterns + node.patterns)
+      node.resolver = urlresolvers.RegexURLResolver(
+          r'^', [pattern for _, pattern in node_patterns])
+      nodes.extend(
+          (child, node_patterns) for child in node.children.itervalues())
+    return root
+
+  def resolve(self, path):
+    """See urlresolvers.RegexURLResolver.resolve for specification."""
+    if self._root is None:
+      self._root = self._buildPrefixTree()
+
+    node = self._root
+    for segment in _getSegments(path):
+      if segment not in node.children:
+        break
+      node = node.children[segment]
+    return node.resolver.resolve(path)
+
+
+class LazyURLResolver(urlresolvers.RegexURLResolver):
+  """Resolver for URL patterns of modules which are registered lazily.
+
+  Each module declares URL prefixes of all its views up front. A path is
+  resolved only by patterns of the modules which have claimed one of its
+  prefixes, so that other modules do not have to be imported at all. Paths
+  which are not claimed by any module are resolved by patterns of all
+  the modules.
+
+  Reverse lookups require patterns of all the modules, so they are all
+  registered on first reverse lookup.
+  """
+
+  def __init__(self, modules, get_patterns):
+    """Initializes a new instance of this class.
+
+    Args:
+      modules: List of (module name, URL prefixes) tuples in the order in
+        which patterns of the modules should be tried.
+      get_patterns: Function which takes a list of module names and returns
+        a list of URL patterns of the modules in the specified order.
+    """
+    super(LazyURLResolver, self).__init__(r'^', [])
+    self._modules = modules
+    self._get_patterns = get_patterns
+    # maps tuples of module names to resolvers of their patterns
+    self._resolvers = {}
+
+  @property
+  def url_patterns(self):
+    """Returns URL patterns of all the modules."""
+    return self._get_patterns(
+        [module_name for module_name, _ in self._modules])
+
+  def resolve(self, path):
+    """See urlresolvers.RegexURLResolver.resolve for specification."""
+    module_names = tuple(
+        module_name for module_name, url_prefixes in self._modules
+        if any(path.startswith(url_prefix) for url_prefix in url_prefixes))
+    if not module_names:
+      module_names = tuple(module_name for module_name, _ in self._modules)
+
+    if module_names not in self._resolvers:
+      self._resolvers[module_names] = PrefixIndexedURLResolver(
+          self._get_patterns(module_names))
+    return self._resolvers[module_names].resolve(path)
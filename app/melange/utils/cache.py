@@ -0,0 +1,135 @@
+# Copyright 2014 the Melange authors.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Module with utilities for caching data in memory of the instance
+and in memcache."""
+
+import time
+
+from google.appengine.api import memcache
+
+
+# All instance caches which have been created, so that they can be cleared.
+_INSTANCE_CACHES = []
+
+# Namespace of versioned caches of program wide entities, i.e. programs,
+# their timelines, organization application surveys and sponsors.
+PROGRAM_CACHE_NAMESPACE = 'program'
+
+# Namespace of versioned caches of the singleton site settings entity.
+SITE_CACHE_NAMESPACE = 'site'
+
+_VERSION_KEY = 'cache_version_%s'
+
+
+class InstanceCache(object):
+  """Cache which keeps values in memory of the current instance.
+
+  Values are kept only for the specified time, because caches of other
+  instances cannot be invalidated. The cache should be used only for small
+  amounts of data which are read very often but change rarely.
+  """
+
+  def __init__(self, expiration_time, namespace=None):
+    """Initializes a new instance of this class.
+
+    Args:
+      expiration_time: Number of seconds for which values are kept.
+      namespace: Optional name of the namespace of versioned caches whose
+        data is kept. The cache is cleared whenever the version of
+        the namespace is incremented by the current instance.
+    """
+    self._expiration_time = expiration_time
+    self._values = {}
+    self.namespace = namespace
+    _INSTANCE_CACHES.append(self)
+
+  def get(self, key):
+    """Returns the value cached for the specified key.
+
+    Args:
+      key: The cache key.
+
+    Returns:
+      The cached value or None if there is no such value or it has expired.
+    """
+    value, expires_on = self._values.get(key, (None, None))
+    if expires_on is None or expires_on < time.time():
+      return None
+    else:
+      return value
+
+  def set(self, key, value):
+    """Caches the specified value for the specified key.
+
+    Args:
+      key: The cache key.
+      value: The value to cache.
+    """
+    self._values[key] = (value, time.time() + self._expiration_time)
+
+  def delete(self, key):
+    """Removes the value cached for the specified key, if there is any.
+
+    Args:
+      key: The cache key.
+    """
+    self._values.pop(key, None)
+
+  def clear(self):
+    """Removes all the values from the cache."""
+    self._values.clear()
+
+
+def clearInstanceCaches():
+  """Removes all the values from all instance caches."""
+  for instance_cache in _INSTANCE_CACHES:
+    instance_cache.clear()
+
+
+def getVersion(namespace):
+  """Returns the current version of data cached in the specified namespace.
+
+  Versions should be a part of all cache keys in the namespace, so that
+  all the cached data can be invalidated at once by incrementVersion.
+
+  Args:
+    namespace: Name of the namespace.
+
+  Returns:
+    The current version as an integer.
+  """
+  version_key = _VERSION_KEY % namespace
+  version = memcache.get(version_key)
+  if version is None:
+    # the version is based on the current time, so that it differs from
+    # all the versions which have been evicted from memcache
+    version = int(time.time() * 1000)
+    if not memcache.add(version_key, version):
+      version = memcache.get(version_key) or version
+  return version
+
+
+def incrementVersion(namespace):
+  """Invalidates all data cached in the specified namespace.
+
+  Instance caches of other instances keep their values until they expire.
+
+  Args:
+    namespace: Name of the namespace.
+  """
+  memcache.incr(_VERSION_KEY % namespace)
+  for instance_cache in _INSTANCE_CACHES:
+    if instance_cache.namespace == namespace:
+      instance_cache.clear()
@@ -0,0 +1,36 @@
+# Copyright 2014 the Melange authors.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Module with utilities for iterables."""
+
+
+def iterBatches(iterable, batch_size):
+  """Groups items of the specified iterable into lists of the specified size.
+
+  Args:
+    iterable: An iterable whose items are to be grouped.
+    batch_size: Maximal number of items in a single batch.
+
+  Yields:
+    Lists of consecutive items. Only the last one may contain fewer than
+    batch_size items.
+  """
+  batch = []
+  for item in iterable:
+    batch.append(item)
+    if len(batch) == batch_size:
+      yield batch
+      batch = []
+  if batch:
+    yield batch
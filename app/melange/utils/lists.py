@@ -21,11 +21,15 @@ from google.appengine.datastore import datastore_query
 from google.appengine.ext import ndb
 from google.appengine.ext import db
 
+from django.utils.translation import ugettext
+
 from mapreduce import base_handler
 from mapreduce import mapreduce_pipeline
 
 from melange import key_column_id_const
+from melange.appengine import db as melange_db
 from melange.logic import cached_list
+from melange.request import exception
 from soc.modules.gsoc.models import project as project_model
 from soc.views.helper import url as url_helper
 
@@ -42,6 +46,15 @@ from summerofcode.models import organization as org_model
 # string that is used as the next_key parameter in the final batch.
 FINAL_BATCH = 'done'
 
+# Prefixes of next_key parameters which tell the reader that created them.
+# Positions in a cached list and datastore keys or cursors cannot be used
+# interchangeably, so a batch is continued only by the reader of its prefix.
+CACHE_KEY_PREFIX = 'c:'
+DATASTORE_KEY_PREFIX = 'd:'
+
+LIST_EXPIRED = ugettext(
+    'The list has changed since it was loaded. Please reload the page.')
+
 # The number of shards in a CacheListsPipeline.
 _NO_OF_SHARDS = 4
 
@@ -80,7 +93,8 @@ class List(object):
   """Represents a list."""
 
   def __init__(self, list_id, index, model_class, columns, datastore_reader,
-               cache_reader=None, valid_period=datetime.timedelta(1)):
+               cache_reader=None, valid_period=datetime.timedelta(1),
+               max_staleness=None):
     """Initialize a list object.
 
     Args:
@@ -92,6 +106,10 @@ class List(object):
       cache_reader: A ListReader to read list data from the cache.
       valid_period: datetime.timedelta value indicating the time period a list's
        cache data should be valid, after a caching process completes.
+      max_staleness: datetime.timedelta value indicating the time period
+       a list's cache data may still be served after it has become invalid,
+       while it is being refreshed in the background. If None, expired cache
+       data is never served.
     """
     self._list_id = list_id
     self._index = index
@@ -100,31 +118,79 @@ class List(object):
     self._cache_reader = cache_reader
     self._datastore_reader = datastore_reader
     self.valid_period = valid_period
+    self.max_staleness = max_staleness
 
   def getListData(self, query, start=None, limit=50):
     """Get a set of list items of this list.
 
+    The next key of the returned data is prefixed with the kind of the reader
+    which read it. A position in a cached list which has expired in the
+    meantime cannot be continued from datastore, because the items are not
+    in the same order there, so the list has to be loaded again.
+
     Args:
       query: Query that can be used to fetch items for this list. Entities
         related to all the list items in this list, satisfy filters in this
         query.
-      start: The key of the object that should be the first in the list.
+      start: The next key returned with the previous batch of the list.
       limit: Number of the elements that should be returned.
 
     Returns: A ListData entity with data regarding the query.
+
+    Raises:
+      exception.UserError: if the batch starts with a position in a cached
+        list which cannot be read anymore.
     """
-    if self._cache_reader:
+    cache_start = _stripKeyPrefix(start, CACHE_KEY_PREFIX)
+    datastore_start = _stripKeyPrefix(start, DATASTORE_KEY_PREFIX)
+
+    # batches read from datastore are continued from datastore, even if
+    # the list has been cached in the meantime
+    if self._cache_reader and not datastore_start:
       list_data = self._cache_reader.getListData(
-          self._list_id, query, start, limit)
-      if not list_data:
-        # A cache miss. Fetch data using the datastore reader.
-        list_data = self._datastore_reader.getListData(
-            self._list_id, query, start, limit)
-    else:
-      list_data = self._datastore_reader.getListData(
-          self._list_id, query, start, limit)
+          self._list_id, query, cache_start, limit)
+      if list_data:
+        return _addKeyPrefix(list_data, CACHE_KEY_PREFIX)
+      elif cache_start:
+        raise exception.BadRequest(message=LIST_EXPIRED)
+
+    # A cache miss. Fetch data using the datastore reader.
+    list_data = self._datastore_reader.getListData(
+        self._list_id, query, datastore_start, limit)
+    return _addKeyPrefix(list_data, DATASTORE_KEY_PREFIX)
+
 
-    return list_data
+def _stripKeyPrefix(key, prefix):
+  """Returns the specified next key without the specified reader prefix.
+
+  Args:
+    key: A next key returned by List.getListData or None.
+    prefix: The prefix of the reader which is to read the batch.
+
+  Returns:
+    The key as it was returned by the reader or None, if the key is not
+    prefixed with the specified prefix.
+  """
+  if key and key.startswith(prefix):
+    return key[len(prefix):]
+  else:
+    return None
+
+
+def _addKeyPrefix(list_data, prefix):
+  """Prefixes the next key of the specified list data with the specified
+  reader prefix.
+
+  Args:
+    list_data: ListData returned by a reader.
+    prefix: The prefix of the reader which returned the data.
+
+  Returns:
+    The specified ListData object.
+  """
+  if list_data.next_key != FINAL_BATCH:
+    list_data.next_key = prefix + list_data.next_key
+  return list_data
 
 
 class ListData(object):
@@ -170,40 +236,35 @@ class CacheReader(ListDataReader):
   def getListData(self, list_id, query, start=None, limit=50):
     """See ListDataReader.getListData for specification."""
     data_id = getDataId(query)
-    if cached_list.isCachedListExists(data_id):
-      if cached_list.isValid(data_id):
-        return ListData(cached_list.getCachedItems(data_id), FINAL_BATCH)
-      else:
-        if not cached_list.isProcessing(data_id):
-          self._start_caching(list_id, data_id, query)
+    # keys which are not positions in the cached list are not continued
+    start = int(start) if start and start.isdigit() else 0
 
-        # return None because cache is not hit
-        return None
+    state = cached_list.getCachedListState(
+        data_id, start=start, limit=limit,
+        max_staleness=getList(list_id).max_staleness)
 
-    else:
+    # stale data may still be served but it is refreshed in the background
+    if not state.is_valid and not state.is_processing:
       self._start_caching(list_id, data_id, query)
 
+    if state.items is not None:
+      if start + len(state.items) < state.no_of_items:
+        next_key = str(start + len(state.items))
+      else:
+        next_key = FINAL_BATCH
+      return ListData(state.items, next_key)
+    else:
       # return None because cache is not hit
       return None
 
   def _start_caching(self, list_id, data_id, query):
-    def prepareCachingTransaction():
-      if cached_list.isCachedListExists(data_id):
-        if cached_list.isProcessing(data_id):
-          return False
-        else:
-          cached_list.setProcessing(data_id)
-          return True
-      else:
-        cached_list.createEmptyProcessingList(data_id)
-        return True
-
-    if not ndb.transaction(prepareCachingTransaction):
+    query_pickle = pickle.dumps(query)
+    if not ndb.transaction(lambda: cached_list.startProcessing(
+        data_id, list_id=list_id, query_pickle=query_pickle)):
       return
 
     entity_kind = '%s.%s' % \
         (query._model_class.__module__, query._model_class.__name__)
-    query_pickle = pickle.dumps(query)
 
     cache_list_pipline = CacheListsPipeline(list_id, entity_kind, query_pickle)
 
@@ -225,9 +286,13 @@ class DatastoreReaderForDB(ListDataReader):
     else:
       next_key = FINAL_BATCH
 
-    col_funcs = [(c.col_id, c.getValue) for c in getList(list_id).columns]
+    columns = getList(list_id).columns
+    entities = entities[:limit]
+    prefetchDependencies(columns, entities)
+
+    col_funcs = [(c.col_id, c.getValue) for c in columns]
     items = [toListItemDict(entity, col_funcs) for entity in entities]
-    return ListData(items[:limit], next_key)
+    return ListData(items, next_key)
 
 
 class DatastoreReaderForNDB(ListDataReader):
@@ -241,7 +306,10 @@ class DatastoreReaderForNDB(ListDataReader):
 
     next_cursor = next_cursor.urlsafe() if more else FINAL_BATCH
 
-    col_funcs = [(c.col_id, c.getValue) for c in getList(list_id).columns]
+    columns = getList(list_id).columns
+    prefetchDependencies(columns, entities)
+
+    col_funcs = [(c.col_id, c.getValue) for c in columns]
     items = [toListItemDict(entity, col_funcs) for entity in entities]
     return ListData(items[:limit], next_cursor)
 
@@ -408,6 +476,23 @@ class Column(object):
     """
     raise NotImplementedError
 
+  def getDependencies(self, entity):
+    """Returns keys of the entities which are needed to render the column
+    for a single entity.
+
+    The entities are fetched for all the list items at once, before any
+    values are rendered, so that getValue can get them from ndb context cache.
+    Implementing subclasses should override this method, if getValue needs
+    other entities.
+
+    Args:
+      entity: The entity from which data for this column is taken from.
+
+    Returns:
+      A list of ndb keys.
+    """
+    return []
+
 
 class Row(object):
   """Base class for a row in a list."""
@@ -713,6 +798,109 @@ def toListItemDict(entity, column_def):
   return output
 
 
+def prefetchDependencies(columns, entities):
+  """Fetches all the entities on which the specified columns depend for
+  the specified entities.
+
+  All the keys are fetched in a single batch, so that subsequent lookups
+  done by the columns are served from ndb context cache.
+
+  Args:
+    columns: A list of Column objects.
+    entities: A list of entities for which list items will be created.
+  """
+  keys = set()
+  for column in columns:
+    for entity in entities:
+      keys.update(column.getDependencies(entity))
+
+  if keys:
+    ndb.get_multi(list(keys))
+
+
+def _getKind(model_class):
+  """Returns the datastore kind of the specified db or ndb model class."""
+  if issubclass(model_class, ndb.Model):
+    return model_class._get_kind()
+  else:
+    return model_class.kind()
+
+
+def isEntityInQuery(entity, query, query_filter=None):
+  """Checks whether the specified entity satisfies filters of a query.
+
+  Filters of the query are evaluated in memory, if it is possible. Otherwise,
+  the query is run against datastore.
+
+  Args:
+    entity: A db or ndb entity.
+    query: A db or ndb query.
+    query_filter: Optional melange_db.QueryFilter object for the query.
+      It may be specified so that the filters do not have to be extracted from
+      the query each time the function is called.
+
+  Returns:
+    True if the entity is fetched by the query, False otherwise.
+  """
+  query_filter = query_filter or melange_db.getQueryFilter(query)
+  result = query_filter.matches(entity) if query_filter else None
+  if result is not None:
+    return result
+
+  if isinstance(entity, ndb.Model):
+    return bool(query.filter(type(entity)._key == entity.key).get())
+  else:
+    # db queries are modified in place by filters, so a copy is used
+    query = pickle.loads(pickle.dumps(query))
+    return bool(query.filter('__key__', entity.key()).get())
+
+
+def updateCachedItems(entity_key):
+  """Updates list items related to the specified entity in all cached lists.
+
+  For each list which is based on entities of the same kind, a list item
+  is created using functions of the list columns. The item is then put in
+  place of the existing one in all cached lists which store data for that
+  list, so that the lists do not have to be cached from scratch.
+
+  Deleted entities are not handled by this function and their items stay
+  in cached lists until the lists are cached again.
+
+  Args:
+    entity_key: ndb.Key of the entity which has been written.
+  """
+  for list_id, list_obj in LISTS.iteritems():
+    if _getKind(list_obj.model_class) != entity_key.kind():
+      continue
+
+    if issubclass(list_obj.model_class, ndb.Model):
+      entity = entity_key.get()
+    else:
+      entity = db.get(entity_key.to_old_key())
+
+    if not entity:
+      continue
+
+    col_funcs = [(c.col_id, c.getValue) for c in list_obj.columns]
+    item = toListItemDict(entity, col_funcs)
+    item_key = item[key_column_id_const.KEY_COLUMN_ID]
+
+    for cached in cached_list.getCachedListsForList(list_id):
+      if not cached.query_pickle:
+        continue
+
+      query = pickle.loads(cached.query_pickle)
+      if isEntityInQuery(entity, query):
+        new_item = item
+      else:
+        # the entity may not belong to the list anymore
+        new_item = None
+
+      data_id = cached.key.id()
+      ndb.transaction(lambda: cached_list.updateCachedItem(
+          data_id, item_key, item=new_item))
+
+
 def getList(list_id):
   """Get the list instance relevant to a list id.
 
@@ -762,6 +950,10 @@ class StudentColumn(Column):
     """See Column.getValue for specification"""
     return ndb.Key.from_old_key(entity.parent_key()).get().public_name
 
+  def getDependencies(self, entity):
+    """See Column.getDependencies for specification"""
+    return [ndb.Key.from_old_key(entity.parent_key())]
+
 
 class OrganizationColumn(Column):
   """Column object to represent the organization"""
@@ -772,6 +964,11 @@ class OrganizationColumn(Column):
     org_key = project_model.GSoCProject.org.get_value_for_datastore(entity)
     return ndb.Key.from_old_key(org_key).get().name
 
+  def getDependencies(self, entity):
+    """See Column.getDependencies for specification"""
+    org_key = project_model.GSoCProject.org.get_value_for_datastore(entity)
+    return [ndb.Key.from_old_key(org_key)]
+
 
 class MentorsColumn(Column):
   """Column object to represent the mentors of a project."""
@@ -809,9 +1006,17 @@ ndb_datastore_reader = DatastoreReaderForNDB()
 # CachedList should be updated once a day
 valid_period = datetime.timedelta(0, 60)
 
+# Projects may be shown up to an hour after they have changed. The list is
+# cached for as long as it may be stale, so that it is refreshed by at most
+# one caching process per hour for each query.
+projects_valid_period = datetime.timedelta(hours=1)
+projects_max_staleness = datetime.timedelta(hours=1)
+
 GSOC_PROJECTS_LIST = List(GSOC_PROJECTS_LIST_ID, 0, project_model.GSoCProject,
                           [key, student, title, org, mentors], datastore_reader,
-                          valid_period=valid_period)
+                          cache_reader=cache_reader,
+                          valid_period=projects_valid_period,
+                          max_staleness=projects_max_staleness)
 
 # TODO(daniel): move this part to a separate module
 # TODO(daniel): replace this column with one that is more versatile
@@ -0,0 +1,122 @@
+# Copyright 2014 the Melange authors.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Module with a template loader which loads templates from a bundle
+of all the templates of the site."""
+
+import json
+import os
+
+from django import template
+from django.conf import settings
+from django.template import loader
+
+
+# Maps paths of bundles to dicts with the templates they contain.
+_BUNDLES = {}
+
+
+def _getBundle(bundle_path):
+  """Returns templates of the bundle at the specified path.
+
+  The bundle is read only once per instance.
+
+  Args:
+    bundle_path: Path of the bundle file.
+
+  Returns:
+    A dict mapping template names to their sources or None, if there is no
+    bundle at the specified path.
+  """
+  if bundle_path not in _BUNDLES:
+    if os.path.exists(bundle_path):
+      with open(bundle_path) as bundle_file:
+        _BUNDLES[bundle_path] = json.load(bundle_file)
+    else:
+      _BUNDLES[bundle_path] = None
+  return _BUNDLES[bundle_path]
+
+
+class BundleLoader(loader.BaseLoader):
+  """Template loader which loads templates from a bundle built by
+  buildBundle function.
+
+  All the templates are read from a single file, rather than from
+  a separate file for each template. No templates are loaded, if the bundle
+  does not exist, so that other loaders may be used instead.
+  """
+
+  is_usable = True
+
+  def __init__(self, bundle_path=None):
+    """Initializes a new instance of this class.
+
+    Args:
+      bundle_path: Path of the bundle file. If not specified,
+        settings.TEMPLATE_BUNDLE_PATH is used.
+    """
+    super(BundleLoader, self).__init__()
+    self._bundle_path = bundle_path or settings.TEMPLATE_BUNDLE_PATH
+
+  def load_template_source(self, template_name, template_dirs=None):
+    """See loader.BaseLoader.load_template_source for specification."""
+    bundle = _getBundle(self._bundle_path)
+    if bundle is None or template_name not in bundle:
+      raise template.TemplateDoesNotExist(template_name)
+    return bundle[template_name], '%s:%s' % (self._bundle_path, template_name)
+
+
+def buildBundle(template_dirs, bundle_path):
+  """Builds a bundle of all the templates in the specified directories.
+
+  Templates are named after their paths relative to the directory in which
+  they are found. If there are more templates with the same name, the one
+  from the first directory is used, as it would be by the filesystem loader.
+  All the templates are parsed, so that invalid templates are reported
+  and left out of the bundle when it is built.
+
+  Args:
+    template_dirs: List of directories with templates.
+    bundle_path: Path of the bundle file to write.
+
+  Returns:
+    A list of (template name, error message) tuples for templates which
+    could not be parsed. These templates are not bundled, so that they
+    are loaded by other loaders and fail on use just like they would
+    without the bundle.
+  """
+  bundle = {}
+  for template_dir in template_dirs:
+    for dir_path, _, file_names in os.walk(template_dir):
+      for file_name in file_names:
+        file_path = os.path.join(dir_path, file_name)
+        template_name = os.path.relpath(file_path, template_dir).replace(
+            os.sep, '/')
+        if template_name not in bundle:
+          with open(file_path) as template_file:
+            bundle[template_name] = template_file.read().decode(
+                settings.FILE_CHARSET)
+
+  errors = []
+  for template_name, source in sorted(bundle.iteritems()):
+    try:
+      template.Template(source, name=template_name)
+    except template.TemplateSyntaxError as e:
+      errors.append((template_name, str(e)))
+      del bundle[template_name]
+
+  with open(bundle_path, 'w') as bundle_file:
+    json.dump(bundle, bundle_file)
+
+  return errors
@@ -75,12 +75,6 @@ MEDIA_URL = ''
 # Examples: "http://foo.com/media/", "/media/".
 ADMIN_MEDIA_PREFIX = '/media/'
 
-# List of callables that know how to import templates from various sources.
-TEMPLATE_LOADERS = (
-    'django.template.loaders.filesystem.Loader',
-    'django.template.loaders.app_directories.Loader',
-)
-
 # Create a random SECRET_KEY, this key will be different for each instance of
 # Melange that AppEngine creates, guaranteeing that we cannot accidentally rely
 # on any Django feature that uses it. That is, if we would accidentally rely on
@@ -110,6 +104,30 @@ TEMPLATE_DIRS = (
     os.path.join(ROOT_PATH, 'codein', 'content', 'html'),
 )
 
+# Path of the bundle of all the templates from TEMPLATE_DIRS which may be
+# built by scripts/build_template_bundle.py. If the bundle does not exist,
+# templates are loaded from the directories.
+TEMPLATE_BUNDLE_PATH = os.path.join(ROOT_PATH, 'templates.bundle')
+
+# List of callables that know how to import templates from various sources.
+# Templates are loaded from the bundle and parsed only once per instance,
+# if the bundle has been deployed. Otherwise, as well as for the development
+# server where templates may be edited while it is running, they are loaded
+# from the directories on each use.
+if DEBUG or not os.path.exists(TEMPLATE_BUNDLE_PATH):
+  TEMPLATE_LOADERS = (
+      'django.template.loaders.filesystem.Loader',
+      'django.template.loaders.app_directories.Loader',
+  )
+else:
+  TEMPLATE_LOADERS = (
+      ('django.template.loaders.cached.Loader', (
+          'melange.utils.template_loader.BundleLoader',
+          'django.template.loaders.filesystem.Loader',
+          'django.template.loaders.app_directories.Loader',
+      )),
+  )
+
 INSTALLED_APPS = (
     'soc.views.helper',
 #    'soc.modules.gsoc.views.helper',
@@ -131,6 +149,22 @@ CALLBACK_MODULE_NAMES = [
     'summerofcode.callback'
     ]
 
+# URL prefixes of all the views of the callback modules, which are used
+# by Core.registerLazyModuleCallbacks. A callback module is imported for
+# any path which starts with one of its prefixes. Paths which are not
+# claimed by any module cause all the modules to be imported. The prefixes
+# are checked by CallbackModuleURLPrefixesTest.
+CALLBACK_MODULE_URL_PREFIXES = {
+    'codein.callback': [],
+    'melange.callback': ['site/settings/'],
+    'soc.modules.soc_core.callback': [
+        'login', 'logout', 'site/', 'tasks/lists/', 'tasks/mail/', 'user/'],
+    'soc.modules.gsoc.callback': [
+        'document/show/', 'gsoc/', 'program/home/', 'tasks/gsoc/'],
+    'soc.modules.gci.callback': ['gci/', 'tasks/gci/'],
+    'summerofcode.callback': ['gsoc/', 'oauth2callback', 'tasks/gsoc/'],
+    }
+
 #GData APIs Source:
 GDATA_SOURCE = 'Google-Melange-v1'
 
@@ -92,6 +92,22 @@ def sendMailFromTemplate(template, context):
   sendMail(dicts.filter(context, mail.EmailMessage.PROPERTIES))
 
 
+def getMailContextFromTemplate(template, context):
+  """Returns the context of an email whose content is rendered using
+  a Django template.
+
+  The returned context may be passed to sendMail or sendMails.
+
+  Args:
+    template: the template (or search list of templates) to use
+    context: The context supplied to the template and email (dictionary)
+  """
+  context['html'] = loader.render_to_string(template, dictionary=context)
+
+  # filter out the unneeded values in context to keep sendMail happy
+  return dicts.filter(context, mail.EmailMessage.PROPERTIES)
+
+
 def getSendMailFromTemplateNameTxn(template_name, context, parent=None,
     transactional=True):
   """Returns a method that is safe to be run in a transaction to sent out an
@@ -134,6 +150,23 @@ def getSendMailFromTemplateStringTxn(template_string, context, parent=None,
       transactional=transactional)
 
 
+def getMailContextFromTemplateString(template_string, context):
+  """Returns the context of an email whose content is rendered using a Django
+  template which is represented by the specified string instance.
+
+  The returned context may be passed to sendMails.
+
+  Args:
+    template_string: The string representation of the template.
+    context: The context supplied to the template and email (dictionary).
+  """
+  template = loader.get_template_from_string(template_string)
+  context['html'] = template.render(Context(context))
+
+  # filter out the unneeded values in context to keep sendMail happy
+  return dicts.filter(context, mail.EmailMessage.PROPERTIES)
+
+
 def getSendMailFromTemplateTxn(template, context, parent=None,
     transactional=True):
   """Returns a method that is safe to be run in a transaction to sent out an
@@ -190,6 +223,52 @@ def sendMail(context, parent=None, run=True, transactional=True):
     return txn
 
 
+def sendMails(contexts):
+  """Sends out emails in bulk using contexts to supply the needed information.
+
+  Args:
+    contexts: List of contexts supplied to the email messages (dictionaries).
+
+  Raises:
+    Error that corresponds with the first problem it finds iff any of the
+    messages is not properly initialized.
+  """
+  for context in contexts:
+    mail.EmailMessage(**context).check_initialized()
+
+  # don't send out emails in non-local debug mode
+  if not system.isLocal() and system.isDebug():
+    return
+
+  mailer.spawnMailTasks(contexts)
+
+
+def getSendMailsTxn(contexts):
+  """Returns a method that is safe to be run in a cross-group transaction to
+  send out emails in bulk.
+
+  The emails are sent out only if the transaction succeeds. See sendMails()
+  for more information.
+
+  Args:
+    contexts: List of contexts supplied to the email messages (dictionaries).
+
+  Raises:
+    Error that corresponds with the first problem it finds iff any of the
+    messages is not properly initialized.
+    ValueError if there are too many messages to send them out in
+    a single transaction.
+  """
+  for context in contexts:
+    mail.EmailMessage(**context).check_initialized()
+
+  # don't send out emails in non-local debug mode
+  if not system.isLocal() and system.isDebug():
+    return lambda: None
+
+  return mailer.getSpawnMailTasksTxn(contexts)
+
+
 def getDefaultMailSender(site=None):
   """Returns the sender that currently can be used to send emails.
 
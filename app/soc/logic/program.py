@@ -14,9 +14,24 @@
 
 """Logic for programs."""
 
+from google.appengine.api import memcache
+from google.appengine.ext import db
+
+from melange.utils import cache
+
 from soc.models import program as program_model
 
 
+# Time, in seconds, for which program wide entities are cached in memcache.
+_PROGRAM_WIDE_MEMCACHE_TIME = 60 * 60
+
+# Time, in seconds, for which program wide entities are cached by each
+# instance. They are also invalidated whenever the cache version changes.
+_PROGRAM_WIDE_INSTANCE_CACHE_TIME = 10 * 60
+
+_program_wide_cache = cache.InstanceCache(_PROGRAM_WIDE_INSTANCE_CACHE_TIME)
+
+
 def getSponsorKey(program):
   """Returns key which represents Sponsor of the specified program.
 
@@ -27,3 +42,73 @@ def getSponsorKey(program):
     db.Key instance of the sponsor for the specified program
   """
   return program_model.Program.sponsor.get_value_for_datastore(program)
+
+
+def _encodeEntity(entity):
+  """Encodes the specified entity so that it can be cached.
+
+  Args:
+    entity: db.Model entity or None.
+
+  Returns:
+    String with the encoded entity or None, if no entity is specified.
+  """
+  return db.model_to_protobuf(entity).Encode() if entity else None
+
+
+def _decodeEntity(encoded_entity):
+  """Decodes an entity encoded by _encodeEntity.
+
+  Args:
+    encoded_entity: String with the encoded entity or None.
+
+  Returns:
+    db.Model entity or None, if no encoded entity is specified.
+  """
+  return db.model_from_protobuf(encoded_entity) if encoded_entity else None
+
+
+def getProgramWideEntities(program_key, timeline_key, org_app_key):
+  """Returns a program together with its timeline, organization application
+  survey and sponsor.
+
+  The entities are served from the cache of the current instance or memcache
+  whenever possible. The cached entities are invalidated whenever any program,
+  timeline, organization application survey or sponsor is saved. A separate
+  copy of each entity is returned by each call.
+
+  Args:
+    program_key: db.Key of the program.
+    timeline_key: db.Key of the timeline of the program.
+    org_app_key: db.Key of the organization application survey.
+
+  Returns:
+    A tuple of program, timeline, organization application survey and sponsor
+    entities. Each of them is None if the entity does not exist.
+  """
+  cache_key = 'program_wide_entities_%s_%s_%s_%s' % (
+      cache.getVersion(cache.PROGRAM_CACHE_NAMESPACE),
+      program_key, timeline_key, org_app_key)
+
+  encoded_entities = _program_wide_cache.get(cache_key)
+  if encoded_entities is None:
+    encoded_entities = memcache.get(cache_key)
+    if encoded_entities is None:
+      program, timeline, org_app = db.get(
+          [program_key, timeline_key, org_app_key])
+      sponsor = db.get(getSponsorKey(program)) if program else None
+
+      if program is None:
+        # the program may be created later by a batch put which does not
+        # invalidate the cache, so a missing program is never cached
+        return program, timeline, org_app, sponsor
+
+      encoded_entities = [
+          _encodeEntity(entity)
+          for entity in [program, timeline, org_app, sponsor]]
+      memcache.set(
+          cache_key, encoded_entities, time=_PROGRAM_WIDE_MEMCACHE_TIME)
+    _program_wide_cache.set(cache_key, encoded_entities)
+
+  return tuple(
+      _decodeEntity(encoded_entity) for encoded_entity in encoded_entities)
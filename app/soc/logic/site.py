@@ -15,15 +15,61 @@
 """Site (Model) query functions."""
 
 from google.appengine.api import memcache
+from google.appengine.ext import db
 
 from melange.appengine import system
+from melange.utils import cache
 from soc.logic.helper import xsrfutil
 from soc.models import site
 
 
+# Key name of the singleton Site entity.
+_SITE_KEY_NAME = 'site'
+
+# Memcache key under which the singleton Site entity is cached. It is
+# combined with the current version of the site cache.
+_SITE_CACHE_KEY = 'site_singleton_%s'
+
+# Time, in seconds, for which the Site entity is cached in memcache.
+_SITE_MEMCACHE_TIME = 10 * 60
+
+# Time, in seconds, for which the Site entity is cached by each instance.
+_SITE_INSTANCE_CACHE_TIME = 30
+
+_site_cache = cache.InstanceCache(
+    _SITE_INSTANCE_CACHE_TIME, namespace=cache.SITE_CACHE_NAMESPACE)
+
+
 def singleton():
-  """Return singleton Site settings entity, since there is always only one."""
-  return site.Site.get_or_insert('site')
+  """Return singleton Site settings entity, since there is always only one.
+
+  The entity is served from the cache of the current instance whenever
+  possible. Only when it expires, the current version of the site cache
+  is read and the entity is looked up in memcache, so the datastore is
+  accessed only when both of them miss. A separate copy of the entity is
+  returned by each call, so callers may modify it freely.
+  """
+  encoded_site = _site_cache.get(_SITE_KEY_NAME)
+  if encoded_site is None:
+    cache_key = _SITE_CACHE_KEY % cache.getVersion(cache.SITE_CACHE_NAMESPACE)
+    encoded_site = memcache.get(cache_key)
+    if encoded_site is None:
+      settings = (site.Site.get_by_key_name(_SITE_KEY_NAME) or
+          site.Site.get_or_insert(_SITE_KEY_NAME))
+      encoded_site = db.model_to_protobuf(settings).Encode()
+      memcache.set(cache_key, encoded_site, time=_SITE_MEMCACHE_TIME)
+    _site_cache.set(_SITE_KEY_NAME, encoded_site)
+
+  return db.model_from_protobuf(encoded_site)
+
+
+def invalidateSingleton():
+  """Invalidates the cached singleton Site entity.
+
+  It is done automatically whenever the entity is put by the model, so it
+  is needed only after the entity is written by other means.
+  """
+  cache.incrementVersion(cache.SITE_CACHE_NAMESPACE)
 
 
 def xsrfSecretKey(settings):
@@ -70,9 +70,21 @@ def forCurrentUserId():
     return None
 
   user_ent = forUserId(user_id)
+  if user_ent:
+    updateCurrentAccount(user_ent)
+
+  return user_ent
+
+
+def updateCurrentAccount(user_ent):
+  """Updates the account of the specified user entity, which has been found
+  for the currently logged in user id, if the account has changed.
 
+  Args:
+    user_ent: User entity of the currently logged in user.
+  """
   current_account = accounts.getCurrentAccount()
-  if user_ent and (str(user_ent.account) != str(current_account)):
+  if str(user_ent.account) != str(current_account):
     # The account of the user has changed, we use this account to send system
     # emails to.
     try:
@@ -82,8 +94,6 @@ def forCurrentUserId():
       # readonly mode, that's fine
       pass
 
-  return user_ent
-
 
 def current():
   """Retrieves the user entity for the currently logged in user.
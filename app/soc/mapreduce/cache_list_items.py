@@ -22,24 +22,64 @@ from google.appengine.ext import ndb
 from mapreduce import context
 
 
-def mapProcess(entity):
-  # TODO: (Aruna) Fix this import
-  from melange.utils import lists
+# Mapper state which is shared by all the entities mapped by a shard. It maps
+# mapreduce ids to _MapperState objects.
+_MAPPER_STATES = {}
+
+# Maximal number of mapper states which are kept by an instance.
+_MAX_MAPPER_STATES = 10
+
+
+class _MapperState(object):
+  """Data computed from the mapper parameters of a mapreduce."""
+
+  def __init__(self, params):
+    """Initializes a new instance of _MapperState class.
+
+    Args:
+      params: A dict with mapper parameters.
+    """
+    # TODO: (Aruna) Fix this import
+    from melange.appengine import db as melange_db
+    from melange.utils import lists
+
+    columns = lists.getList(params['list_id']).columns
+    self.col_funcs = [(c.col_id, c.getValue) for c in columns]
+    self.query = pickle.loads(params['query_pickle'])
+    self.data_id = lists.getDataId(self.query)
+    self.query_filter = melange_db.getQueryFilter(self.query)
+
 
+def _getMapperState():
+  """Returns the mapper state of the currently running mapreduce.
+
+  The state is computed only once per mapreduce by each instance.
+
+  Returns:
+    _MapperState object for the current mapreduce.
+  """
   ctx = context.get()
-  params = ctx.mapreduce_spec.mapper.params
+  mapreduce_id = ctx.mapreduce_id
 
-  list_id = params['list_id']
-  col_funcs = [(c.col_id, c.getValue) for c in lists.getList(list_id).columns]
-  query_pickle = params['query_pickle']
+  if mapreduce_id not in _MAPPER_STATES:
+    if len(_MAPPER_STATES) >= _MAX_MAPPER_STATES:
+      _MAPPER_STATES.clear()
+    _MAPPER_STATES[mapreduce_id] = _MapperState(
+        ctx.mapreduce_spec.mapper.params)
+  return _MAPPER_STATES[mapreduce_id]
+
+
+def mapProcess(entity):
+  # TODO: (Aruna) Fix this import
+  from melange.utils import lists
 
-  query = pickle.loads(query_pickle)
-  data_id = lists.getDataId(query)
+  state = _getMapperState()
 
-  if(query.filter('__key__', entity.key()).get()):
-    item = json.dumps(lists.toListItemDict(entity, col_funcs))
+  if lists.isEntityInQuery(
+      entity, state.query, query_filter=state.query_filter):
+    item = json.dumps(lists.toListItemDict(entity, state.col_funcs))
 
-    yield (data_id, item)
+    yield (state.data_id, item)
 
 
 def reduceProcess(data_id, entities):
@@ -0,0 +1,43 @@
+# Copyright 2014 the Melange authors.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+"""MapReduce job that sets number_of_accepted_proposals property for
+organizations.
+
+The number is maintained by the organizations once it is set, so the job
+should be run for each program before proposals are accepted.
+"""
+
+from google.appengine.ext import ndb
+
+from mapreduce import operation
+
+from soc.modules.gsoc.logic import proposal as proposal_logic
+
+# MapReduce requires import of processed models.
+# pylint: disable=unused-import
+from summerofcode.models.organization import SOCOrganization
+# pylint: enable=unused-import
+
+
+def process(org_key):
+  """Counts accepted proposals of the organization with the specified key
+  and stores their number.
+
+  Args:
+    org_key: key of the processed organization.
+  """
+  proposal_logic.setNumberOfAcceptedProposals(ndb.Key.from_old_key(org_key))
+  yield operation.counters.Increment('counted_organization')
@@ -0,0 +1,107 @@
+# Copyright 2014 the Melange authors.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Defines a Mapper API input reader which iterates only over the entities
+that match a list of equality filters.
+"""
+
+from google.appengine.ext import db
+
+from mapreduce import context
+from mapreduce import input_readers
+from mapreduce import util
+
+
+class FilteredDatastoreInputReader(input_readers.DatastoreInputReader):
+  """Input reader which yields the model instances of a kind that match
+  the filters of the mapper.
+
+  The filters are specified by the 'filters' parameter of the mapper as
+  a list of [property_name, '=', value] lists. Values of reference properties
+  are specified as strings of the referenced keys, so that the parameters
+  can be serialized.
+
+  Only equality filters are supported, so that the queries, which are also
+  ordered by keys, are served without any composite indexes.
+  """
+
+  # Mapreduce parameters.
+  FILTERS_PARAM = 'filters'
+
+  def _iter_key_range(self, k_range):
+    """See input_readers.DatastoreInputReader._iter_key_range
+    for specification.
+    """
+    model_class = util.for_name(self._entity_kind)
+    params = context.get().mapreduce_spec.mapper.params
+    filters = _getFilters(model_class, params.get(self.FILTERS_PARAM, []))
+
+    cursor = None
+    while True:
+      query = k_range.make_ascending_query(model_class)
+      for filter_str, value in filters:
+        query.filter(filter_str, value)
+      if cursor:
+        query.with_cursor(cursor)
+
+      results = query.fetch(limit=self._batch_size)
+      if not results:
+        break
+
+      for model_instance in results:
+        yield model_instance.key(), model_instance
+      cursor = query.cursor()
+
+  @classmethod
+  def validate(cls, mapper_spec):
+    """See input_readers.DatastoreInputReader.validate for specification."""
+    super(FilteredDatastoreInputReader, cls).validate(mapper_spec)
+    params = mapper_spec.params
+    model_class = util.for_name(params[cls.ENTITY_KIND_PARAM])
+    try:
+      _getFilters(model_class, params.get(cls.FILTERS_PARAM, []))
+    except (ValueError, db.BadKeyError), e:
+      raise input_readers.BadReaderParamsError('Bad filters: %s' % e)
+
+
+def _getFilters(model_class, filters):
+  """Returns the filters which are applied to the queries for the specified
+  model class.
+
+  Args:
+    model_class: Model class whose instances are iterated over.
+    filters: List of [property_name, operator, value] lists.
+
+  Returns:
+    A list of (filter_string, value) tuples, which can be passed
+    to db.Query.filter.
+
+  Raises:
+    ValueError: if any of the filters is not an equality filter on a property
+      of the model class.
+  """
+  properties = model_class.properties()
+
+  query_filters = []
+  for property_name, operator, value in filters:
+    if operator != '=':
+      raise ValueError('Unsupported operator %s.' % operator)
+    if property_name not in properties:
+      raise ValueError('Unknown property %s.' % property_name)
+
+    if isinstance(properties[property_name], db.ReferenceProperty):
+      value = db.Key(value)
+    query_filters.append(('%s =' % property_name, value))
+
+  return query_filters
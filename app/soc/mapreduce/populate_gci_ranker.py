@@ -0,0 +1,44 @@
+# Copyright 2014 the Melange authors.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+"""MapReduce job that populates rankers of GCI programs with GCIScore
+entities which were created before the rankers were introduced.
+
+The leaderboard and the winners of a program are read from its ranker,
+so scores which are not stored in the ranker are not displayed.
+"""
+
+from mapreduce import operation
+
+from soc.modules.gci.logic import ranking as ranking_logic
+from soc.modules.gci.models.score import GCIScore
+
+
+def process(score):
+  """Schedules the ranker of the program of the specified score to be
+  updated with the points of its student.
+
+  The rankers are updated by the tasks of the ranker queue, one at a time,
+  so that the shards of the job do not contend for their entity groups.
+
+  Args:
+    score: GCIScore entity.
+  """
+  if score.points > 0:
+    ranking_logic.spawnUpdateRankerTask(
+        GCIScore.program.get_value_for_datastore(score), score.parent_key())
+    yield operation.counters.Increment('scheduled_score')
+  else:
+    yield operation.counters.Increment('skipped_score')
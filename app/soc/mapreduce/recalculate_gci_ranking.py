@@ -0,0 +1,286 @@
+# Copyright 2014 the Melange authors.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Mapreduce to recalculate scores of all the students in a GCI program."""
+
+import json
+
+from google.appengine.ext import db
+from google.appengine.ext import ndb
+
+from mapreduce import base_handler
+from mapreduce import context
+from mapreduce import mapper_pipeline
+from mapreduce import mapreduce_pipeline
+from mapreduce import operation
+from mapreduce.lib import pipeline
+
+from soc.modules.gci.logic import org_score as org_score_logic
+from soc.modules.gci.logic import ranking as ranking_logic
+from soc.modules.gci.models import task as task_model
+from soc.modules.gci.models.profile import GCIStudentInfo
+from soc.modules.gci.models.program import GCIProgram
+from soc.modules.gci.models.score import GCIOrgScore
+from soc.modules.gci.models.score import GCIScore
+
+
+# Input reader which iterates only over the entities of the program.
+_FILTERED_INPUT_READER = (
+    'soc.mapreduce.filtered_input_reader.FilteredDatastoreInputReader')
+
+# The number of shards in a RecalculateRankingPipeline.
+_NO_OF_SHARDS = 8
+
+# The number of scores which are set in the ranker in a single transaction.
+_RANKER_BATCH_SIZE = 100
+
+# The number of profiles which are put to the datastore in a single batch.
+_PROFILE_BATCH_SIZE = 100
+
+# Key of the pool which batches writes of profiles in a mapreduce context.
+_PROFILE_POOL_KEY = 'gci_profile_pool'
+
+
+class RecalculateRankingPipeline(base_handler.PipelineBase):
+  """A pipeline to recalculate scores of all the students in a program.
+
+  Closed tasks of the program are grouped by their students, so that all
+  the scores of a single student are calculated by one reducer call. The new
+  scores overwrite the existing ones, so the leaderboard is not emptied while
+  the pipeline runs. Once they are written, the scores which have not been
+  recalculated are deleted and the ranker of the program is updated.
+
+  Args:
+    program_key: Key name of the GCI program.
+  """
+  # Overridden method defines only *args.
+  # pylint: disable=arguments-differ
+  def run(self, program_key):
+    program_filter = [
+        'program', '=',
+        str(db.Key.from_path(GCIProgram.kind(), program_key))]
+
+    recalculate_pipeline = yield mapreduce_pipeline.MapreducePipeline(
+        'recalculate_gci_ranking',
+        'soc.mapreduce.recalculate_gci_ranking.mapProcess',
+        'soc.mapreduce.recalculate_gci_ranking.reduceProcess',
+        _FILTERED_INPUT_READER,
+        mapper_params={
+            'entity_kind': 'soc.modules.gci.models.task.GCITask',
+            'filters': [program_filter, ['status', '=', task_model.CLOSED]],
+        },
+        reducer_params={
+            'program_key': program_key,
+        },
+        shards=_NO_OF_SHARDS)
+
+    with pipeline.After(recalculate_pipeline):
+      clear_scores_pipeline = yield mapper_pipeline.MapperPipeline(
+          'clear_stale_gci_scores',
+          'soc.mapreduce.recalculate_gci_ranking.clearStaleScoreProcess',
+          _FILTERED_INPUT_READER,
+          params={
+              'entity_kind': 'soc.modules.gci.models.score.GCIScore',
+              'filters': [program_filter],
+              'program_key': program_key,
+          },
+          shards=_NO_OF_SHARDS)
+
+    with pipeline.After(clear_scores_pipeline):
+      yield RebuildRankerPipeline(program_key)
+
+
+class RebuildRankerPipeline(base_handler.PipelineBase):
+  """A pipeline to rebuild the ranker of a program from the scores
+  of its students.
+
+  The scores in the ranker are overwritten rather than cleared first, so
+  that the ranker can be read while it is rebuilt. Students who no longer
+  have any points are removed from the ranker afterwards.
+
+  Args:
+    program_key: Key name of the GCI program.
+  """
+  # Overridden method defines only *args.
+  # pylint: disable=arguments-differ
+  def run(self, program_key):
+    program = GCIProgram.get_by_key_name(program_key)
+    ranker = ranking_logic.getOrCreateRanker(program)
+
+    query = ranking_logic.allScoresForProgramQuery(program)
+    query.filter('points >', 0)
+
+    ranked_names = set()
+    scores = {}
+    for score in query.run(batch_size=_RANKER_BATCH_SIZE):
+      name = str(score.parent_key())
+      ranked_names.add(name)
+      scores[name] = [score.points]
+      if len(scores) == _RANKER_BATCH_SIZE:
+        ranker.SetScores(scores)
+        scores = {}
+
+    if scores:
+      ranker.SetScores(scores)
+
+    stale_names = [
+        name for name in ranking_logic.getRankerScoreNames(program)
+        if name not in ranked_names]
+    for i in xrange(0, len(stale_names), _RANKER_BATCH_SIZE):
+      ranker.SetScores(
+          dict((name, None) for name in stale_names[i:i + _RANKER_BATCH_SIZE]))
+
+
+class _ProfilePool(object):
+  """Pool which accumulates profiles to put them to the datastore in batches.
+
+  The pool of the mapreduce context supports only db entities, whereas
+  profiles are ndb entities.
+  """
+
+  def __init__(self):
+    """Initializes a new instance of this class."""
+    self._profiles = []
+
+  def put(self, profile):
+    """Registers the specified profile to put to the datastore.
+
+    Args:
+      profile: Profile entity.
+    """
+    self._profiles.append(profile)
+    if len(self._profiles) >= _PROFILE_BATCH_SIZE:
+      self.flush()
+
+  def flush(self):
+    """Puts all the registered profiles to the datastore."""
+    if self._profiles:
+      ndb.put_multi(self._profiles)
+      self._profiles = []
+
+
+class _PutProfile(operation.base.Operation):
+  """Operation which puts a profile to the datastore through the profile pool
+  of the mapreduce context.
+  """
+
+  def __init__(self, profile):
+    """Initializes a new instance of this class.
+
+    Args:
+      profile: Profile entity to put.
+    """
+    self.profile = profile
+
+  def __call__(self, ctx):
+    """See operation.base.Operation.__call__ for specification."""
+    pool = ctx.get_pool(_PROFILE_POOL_KEY)
+    if not pool:
+      pool = _ProfilePool()
+      ctx.register_pool(_PROFILE_POOL_KEY, pool)
+    pool.put(self.profile)
+
+
+def clearStaleScoreProcess(score):
+  """Deletes the specified score, if it has not been written by the reducer
+  of RecalculateRankingPipeline, together with the organization scores
+  of its student that have not been written either.
+  """
+  ctx = context.get()
+  params = ctx.mapreduce_spec.mapper.params
+
+  student_key = score.parent_key()
+
+  # scores written by the reducer have fixed key names and their students
+  # have closed at least one task, which has been counted in them
+  if (score.key().name() != params['program_key'] or
+      not _hasClosedTask(student_key, 'program',
+          GCIScore.program.get_value_for_datastore(score))):
+    yield operation.db.Delete(score)
+    yield operation.counters.Increment('scores_cleared')
+
+  # profiles of students belong to a single program, so all the organization
+  # scores of the student belong to the program of the score
+  for org_score in org_score_logic.queryForAncestor(student_key):
+    org_key = GCIOrgScore.org.get_value_for_datastore(org_score)
+    if (org_score.key().name() != org_key.name() or
+        not _hasClosedTask(student_key, 'org', org_key)):
+      yield operation.db.Delete(org_score)
+      yield operation.counters.Increment('org_scores_cleared')
+
+
+def _hasClosedTask(student_key, property_name, value):
+  """Returns whether the specified student has closed any task whose
+  specified property is set to the specified value.
+  """
+  query = task_model.GCITask.all(keys_only=True)
+  query.filter('student =', student_key)
+  query.filter('status =', task_model.CLOSED)
+  query.filter('%s =' % property_name, value)
+  return query.get() is not None
+
+
+def mapProcess(task):
+  points = (0 if task.points_invalidated
+      else task_model.POINTS[task.difficulty_level])
+  item = {
+      'task': str(task.key()),
+      'org': str(task_model.GCITask.org.get_value_for_datastore(task)),
+      'points': points,
+      }
+
+  yield operation.counters.Increment('closed_tasks')
+  yield (str(task_model.GCITask.student.get_value_for_datastore(task)),
+      json.dumps(item))
+
+
+def reduceProcess(student_key, items):
+  ctx = context.get()
+  params = ctx.mapreduce_spec.mapper.params
+
+  student_key = db.Key(student_key)
+  items = [json.loads(item) for item in items]
+
+  task_keys = [db.Key(item['task']) for item in items]
+  tasks_by_org = {}
+  for item, task_key in zip(items, task_keys):
+    tasks_by_org.setdefault(db.Key(item['org']), []).append(task_key)
+
+  # the profile is fetched while the scores are written to the pool
+  profile_future = ndb.Key.from_old_key(student_key).get_async()
+
+  # the key names of the scores are fixed, so that they overwrite the scores
+  # written by a retried slice or by an earlier run of the pipeline; any
+  # other existing scores are deleted by clearStaleScoreProcess
+  yield operation.db.Put(GCIScore(
+      key_name=params['program_key'], parent=student_key,
+      program=db.Key.from_path(GCIProgram.kind(), params['program_key']),
+      points=sum(item['points'] for item in items), tasks=task_keys))
+
+  for org_key, org_task_keys in tasks_by_org.iteritems():
+    yield operation.db.Put(GCIOrgScore(
+        key_name=org_key.name(), parent=student_key, org=org_key,
+        tasks=org_task_keys, number_of_tasks=len(org_task_keys)))
+
+  student_info = GCIStudentInfo.all().ancestor(student_key).get()
+  if student_info and not student_info.task_closed:
+    student_info.task_closed = True
+    yield operation.db.Put(student_info)
+
+  profile = profile_future.get_result()
+  if profile:
+    profile.student_data.number_of_completed_tasks = len(items)
+    yield _PutProfile(profile)
+
+  yield operation.counters.Increment('students_updated')
@@ -0,0 +1,39 @@
+# Copyright 2014 the Melange authors.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""MapReduce job that counts unread messages of GCIConversationUser entities
+which were created before the numbers were maintained.
+
+The number of unread messages of a user in a program is summed only over
+the entities which have their numbers stored.
+"""
+
+from google.appengine.ext import ndb
+
+from mapreduce import operation
+
+from soc.modules.gci.logic import conversation as gciconversation_logic
+
+
+def process(conv_user_key):
+  """Recounts the messages which have not been read by the user of
+  the specified conversation user.
+
+  Args:
+    conv_user_key: Key (db) of GCIConversationUser.
+  """
+  conv_user = gciconversation_logic.recountUnreadMessages(
+      ndb.Key.from_old_key(conv_user_key))
+  if conv_user:
+    yield operation.counters.Increment('recounted_conversation_user')
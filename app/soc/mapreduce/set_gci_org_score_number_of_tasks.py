@@ -0,0 +1,57 @@
+# Copyright 2014 the Melange authors.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+"""MapReduce job that sets number_of_tasks property for GCIOrgScore entities
+which were created before the property was introduced.
+
+Scores without the property are not returned by the queries that order
+the scores by the number of tasks.
+"""
+
+import logging
+
+from google.appengine.ext import db
+
+from mapreduce import operation
+
+# MapReduce requires import of processed models.
+# pylint: disable=unused-import
+from soc.modules.gci.models.score import GCIOrgScore
+# pylint: enable=unused-import
+
+
+def process(org_score_key):
+  """Sets number_of_tasks property for the organization score with
+  the specified key to the number of tasks it contains.
+
+  Args:
+    org_score_key: key of the processed organization score.
+  """
+  def set_number_of_tasks_txn():
+    org_score = db.get(org_score_key)
+    if not org_score:
+      logging.error('Missing entity for key %s.', org_score_key)
+      return False
+
+    org_score.number_of_tasks = len(org_score.tasks)
+    db.put(org_score)
+    return True
+
+  result = db.run_in_transaction(set_number_of_tasks_txn)
+
+  if result:
+    yield operation.counters.Increment('updated_org_score')
+  else:
+    yield operation.counters.Increment('missing_org_score')
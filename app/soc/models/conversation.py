@@ -113,6 +113,12 @@ class ConversationUser(ndb.Model):
   #: Time of the last message seen by this user in this conversation
   last_message_seen_on = ndb.DateTimeProperty(default=datetime.min)
 
+  #: Number of messages in the conversation not yet seen by this user. None,
+  #: if the messages have not been counted since the entity was created.
+  #: Entities created before the property was introduced are counted by
+  #: the GCIRecountUnreadMessages MapReduce job.
+  num_unread_messages = ndb.IntegerProperty()
+
   #: Preference for receiving email notifications for new messages
   enable_notifications = ndb.BooleanProperty(
       default=True,
@@ -25,3 +25,16 @@ class Email(db.Model):
 
   #: JSON content to be passed along the the Mail constructor
   context = db.TextProperty(required=True)
+
+
+class EmailBatch(db.Model):
+  """Data model for storing a group of emails that are sent out together
+  by a single task.
+  """
+
+  #: JSON encoded list of contexts to be passed along to the Mail constructor
+  contexts = db.TextProperty(required=True)
+
+  #: Number of failed attempts to send each of the emails. The list is
+  #: aligned with the list of contexts.
+  attempts = db.ListProperty(int, indexed=False)
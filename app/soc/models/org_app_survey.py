@@ -16,12 +16,21 @@
 """
 
 
+from melange.utils import cache
+
 from soc.models.survey import Survey
 
 
-# TODO(nathaniel): Empty subclass.
 class OrgAppSurvey(Survey):
   """Survey for Users to apply as an Organization.
   """
 
-  pass
+  def put(self, **kwargs):
+    """See db.Model.put for specification.
+
+    The survey is cached together with its program, so the cached program
+    wide entities are invalidated.
+    """
+    key = super(OrgAppSurvey, self).put(**kwargs)
+    cache.incrementVersion(cache.PROGRAM_CACHE_NAMESPACE)
+    return key
@@ -19,6 +19,8 @@ from google.appengine.ext import db
 
 from django.utils import translation
 
+from melange.utils import cache
+
 from soc.models import document as document_model
 from soc.models import linkable as linkable_model
 from soc.models import sponsor as sponsor_model
@@ -317,3 +319,12 @@ class Program(linkable_model.Linkable):
       return entity
 
     return db.run_in_transaction(get_or_create_txn)
+
+  def put(self, **kwargs):
+    """See db.Model.put for specification.
+
+    Cached program wide entities are invalidated.
+    """
+    key = super(Program, self).put(**kwargs)
+    cache.incrementVersion(cache.PROGRAM_CACHE_NAMESPACE)
+    return key
@@ -19,6 +19,8 @@ from google.appengine.ext import db
 
 from django.utils.translation import ugettext
 
+from melange.utils import cache
+
 import soc.models.program
 
 
@@ -170,3 +172,13 @@ class Site(db.Model):
   description = db.TextProperty(verbose_name=ugettext('Description'))
   description.help_text = ugettext(
       'Description of the site to be placed on the site header.')
+
+  def put(self, **kwargs):
+    """See db.Model.put for specification.
+
+    Cached copies of the site settings are invalidated, so that the changes
+    are visible to the next requests.
+    """
+    key = super(Site, self).put(**kwargs)
+    cache.incrementVersion(cache.SITE_CACHE_NAMESPACE)
+    return key
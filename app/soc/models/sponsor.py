@@ -15,11 +15,20 @@
 """This module contains the Sponsor Model."""
 
 
+from melange.utils import cache
+
 import soc.models.group
 
 
-# TODO(nathaniel): Empty subclass.
 class Sponsor(soc.models.group.Group):
   """Sponsor details."""
 
-  pass
+  def put(self, **kwargs):
+    """See db.Model.put for specification.
+
+    Sponsors are cached together with their programs, so the cached program
+    wide entities are invalidated.
+    """
+    key = super(Sponsor, self).put(**kwargs)
+    cache.incrementVersion(cache.PROGRAM_CACHE_NAMESPACE)
+    return key
@@ -20,6 +20,8 @@ from google.appengine.ext import db
 
 from django.utils.translation import ugettext
 
+from melange.utils import cache
+
 from soc.models import linkable
 
 
@@ -43,3 +45,13 @@ class Timeline(linkable.Linkable):
 
   student_signup_end = db.DateTimeProperty(
       verbose_name=ugettext('Student Signup End date'))
+
+  def put(self, **kwargs):
+    """See db.Model.put for specification.
+
+    Cached program wide entities are invalidated, so that the new dates
+    take effect immediately.
+    """
+    key = super(Timeline, self).put(**kwargs)
+    cache.incrementVersion(cache.PROGRAM_CACHE_NAMESPACE)
+    return key
@@ -18,6 +18,8 @@ import importlib
 
 from django.conf import urls
 
+from melange.request import url_resolver
+
 
 class Error(Exception):
   """Error class for the callback module."""
@@ -109,6 +111,12 @@ class Core(object):
     self.sitemap = []
     self.program_map = []
 
+    # list of (callback module name, URL prefixes) tuples for callbacks
+    # which are registered only on first dispatch into their prefixes
+    self.lazy_callbacks = []
+    # maps callback module names to URL patterns of lazily registered callbacks
+    self.lazy_patterns = {}
+
   ##
   ## internal
   ##
@@ -160,9 +168,48 @@ class Core(object):
     self.callService('registerViews', True)
 
   def getPatterns(self):
-    """Returns the Django patterns for this site."""
-    self.callService('registerWithSitemap', True)
-    return urls.patterns(None, *self.sitemap)
+    """Returns the Django patterns for this site.
+
+    All the patterns of the sitemap are served by a single resolver which
+    indexes them by their literal prefixes, so that only the patterns which
+    may match a path are tried to resolve it. If callbacks are registered
+    lazily, the resolver registers them on first dispatch into their
+    URL prefixes.
+    """
+    if self.lazy_callbacks:
+      return [url_resolver.LazyURLResolver(
+          self.lazy_callbacks, self.getLazyModulePatterns)]
+    else:
+      self.callService('registerWithSitemap', True)
+      return [url_resolver.PrefixIndexedURLResolver(
+          urls.patterns(None, *self.sitemap))]
+
+  def getLazyModulePatterns(self, callback_module_names):
+    """Returns URL patterns of the specified lazily registered callbacks.
+
+    Callbacks which have not been registered yet are imported, their views
+    are instantiated and registered with the sitemap.
+
+    Args:
+      callback_module_names: a list of strings corresponding to callback
+          modules registered by registerLazyModuleCallbacks.
+
+    Returns:
+      A list of URL patterns of the callbacks in the specified order.
+    """
+    patterns = []
+    for module_name in callback_module_names:
+      if module_name not in self.lazy_patterns:
+        self.registerModuleCallbacks([module_name])
+        module_callback = self.registered_callbacks[-1]
+
+        sitemap_length = len(self.sitemap)
+        module_callback.registerViews()
+        module_callback.registerWithSitemap()
+        self.lazy_patterns[module_name] = urls.patterns(
+            None, *self.sitemap[sitemap_length:])
+      patterns.extend(self.lazy_patterns[module_name])
+    return patterns
 
   ###
   ### Core control code
@@ -194,6 +241,26 @@ class Core(object):
 
     return True
 
+  def registerLazyModuleCallbacks(self, callback_module_names, url_prefixes):
+    """Registers callbacks of the modules of this site which are imported
+    only on first dispatch into one of their URL prefixes.
+
+    Callbacks which have not declared any prefixes are imported only when
+    all the modules are needed, i.e. for paths which are not claimed by any
+    callback and for reverse lookups.
+
+    Args:
+      callback_module_names: a list of strings corresponding to callback
+          modules that ought to be registered.
+      url_prefixes: a dict mapping callback module names to lists of URL
+          prefixes of all the views of the callbacks.
+    """
+    for module_name in callback_module_names:
+      self.lazy_callbacks.append(
+          (module_name, tuple(url_prefixes.get(module_name, ()))))
+
+    return True
+
   ##
   ## Module code
   ##
@@ -251,5 +318,8 @@ class Core(object):
     in the form fields.
     """
 
+    # all the callbacks have to be registered to collect their programs
+    self.getLazyModulePatterns(
+        [module_name for module_name, _ in self.lazy_callbacks])
     self.callService('registerWithProgramMap', True)
     return self.program_map
@@ -16,6 +16,7 @@
 
 from datetime import timedelta
 
+from google.appengine.api import memcache
 from google.appengine.ext import db
 from google.appengine.ext import ndb
 
@@ -24,12 +25,26 @@ from melange.models import profile as profile_model
 
 from soc.tasks import mailer
 
-from soc.modules.gci.logic import message as gcimessage_logic
 from soc.modules.gci.logic.helper import notifications
 from soc.modules.gci.models import conversation as gciconversation_model
 from soc.modules.gci.models import message as gcimessage_model
 
 from soc.models import conversation as conversation_model
+from soc.models import program as program_model
+
+
+# Time, in seconds, for which the subscribed emails of a conversation are
+# kept in memcache. The cached emails are not invalidated when users change
+# their email addresses, so they should not be kept for long.
+_SUBSCRIBED_EMAILS_CACHE_TIME = 5 * 60
+
+# Maximal number of GCIConversationUsers which are created or deleted
+# in a single batch.
+PARTICIPANTS_BATCH_SIZE = 500
+
+# The number of users for whom a new message is counted as unread
+# in a single transaction.
+_UNREAD_MESSAGES_BATCH_SIZE = 100
 
 
 def queryForProgramAndCreator(program, creator):
@@ -126,14 +141,66 @@ def queryUnreadMessagesForConversationAndUser(conversation, user):
   if not conversation_user:
     return None
 
+  return _queryUnreadMessages(conversation_user)
+
+
+def _queryUnreadMessages(conversation_user):
+  """Creates a query for unread messages in a conversation for a user.
+
+  Args:
+    conversation_user: GCIConversationUser entity of the user.
+
+  Returns:
+    An ndb query for GCIMessages the user has not yet read in the conversation.
+  """
   date_last_seen = conversation_user.last_message_seen_on
 
   # The > filter in the query below seemed to still include equivalent
   # datetimes, so incrememting this by a second fixes this.
   date_last_seen += timedelta(seconds=1)
 
-  return (gcimessage_logic.queryForConversation(conversation)
-      .filter(gcimessage_model.GCIMessage.sent_on > date_last_seen))
+  # the query is an ancestor one, so that it may be run in transactions
+  return gcimessage_model.GCIMessage.query(
+      gcimessage_model.GCIMessage.sent_on > date_last_seen,
+      ancestor=conversation_user.conversation)
+
+
+@ndb.transactional
+def recountUnreadMessages(conv_user_key):
+  """Counts messages in a conversation which have not been read by a user and
+  stores the number in the corresponding GCIConversationUser entity.
+
+  The entity is read and written in a transaction, so that no message
+  counted for it by createMessage in the meantime is lost.
+
+  Args:
+    conv_user_key: Key (ndb) of GCIConversationUser.
+
+  Returns:
+    The updated GCIConversationUser entity or None, if it does not exist.
+  """
+  conv_user = conv_user_key.get()
+  if conv_user:
+    conv_user.num_unread_messages = _queryUnreadMessages(conv_user).count()
+    conv_user.put()
+  return conv_user
+
+
+def getNumUnreadMessages(conversation_user):
+  """Returns the number of unread messages in a conversation for a user.
+
+  The messages are recounted and their number is stored, if it has not been
+  maintained for the specified entity yet.
+
+  Args:
+    conversation_user: GCIConversationUser entity of the user.
+
+  Returns:
+    The number of messages the user has not read in the conversation.
+  """
+  if conversation_user.num_unread_messages is None:
+    conversation_user = recountUnreadMessages(conversation_user.key)
+  return conversation_user.num_unread_messages
 
 
 def numUnreadMessagesForConversationAndUser(conversation, user):
@@ -147,11 +214,11 @@ def numUnreadMessagesForConversationAndUser(conversation, user):
     The number of messages the user has not read in the conversation.
     If the user is not involved in the conversation, 0 is returned.
   """
-  query = queryUnreadMessagesForConversationAndUser(conversation, user)
-  return 0 if query is None else query.count()
+  conversation_user = queryConversationUserForConversationAndUser(
+      conversation, user).get()
+  return getNumUnreadMessages(conversation_user) if conversation_user else 0
 
 
-#TODO(drewgottlieb) use mapreduce for this
 def numUnreadMessagesForProgramAndUser(program, user):
   """Returns the number of unread messages for all conversations the user is in
   for a program.
@@ -160,15 +227,23 @@ def numUnreadMessagesForProgramAndUser(program, user):
     program: Key (ndb) of GCIProgram.
     user: Key (ndb) of User.
   """
-  conv_users = queryForProgramAndUser(program, user).fetch(1000)
-
-  unread_count = 0
-
-  for conv_user in conv_users:
-    unread_count += numUnreadMessagesForConversationAndUser(
-        conv_user.conversation, user)
+  model = gciconversation_model.GCIConversationUser
+  query = queryForProgramAndUser(program, user)
+
+  # only the numbers of conversations with unread messages are read
+  num_unread_messages = sum(
+      conv_user.num_unread_messages for conv_user in query.filter(
+          model.num_unread_messages > 0).iter(
+              projection=[model.num_unread_messages]))
+
+  # messages are recounted for entities which have not been counted yet
+  for conv_user_key in query.filter(
+      model.num_unread_messages == None).iter(keys_only=True):
+    conv_user = recountUnreadMessages(conv_user_key)
+    if conv_user:
+      num_unread_messages += conv_user.num_unread_messages
 
-  return unread_count
+  return num_unread_messages
 
 
 def markAllReadForConversationAndUser(conversation, user):
@@ -181,18 +256,22 @@ def markAllReadForConversationAndUser(conversation, user):
     conversation: Key (ndb) of GCIConversation.
     user: Key (ndb) of User.
   """
-  conv_user_results = queryConversationUserForConversationAndUser(
-      conversation, user).fetch(1)
-
-  if not conv_user_results:
-    raise Exception('No GCIConversationUser could be found.')
+  # the entity is read and written in a transaction, so that no message
+  # counted for it by createMessage in the meantime is lost
+  @ndb.transactional
+  def txn():
+    conv_user = gciconversation_model.GCIConversationUser.query(
+        gciconversation_model.GCIConversationUser.user == user,
+        ancestor=conversation).get()
 
-  conv_user = conv_user_results[0]
+    if not conv_user:
+      raise Exception('No GCIConversationUser could be found.')
 
-  last_message = gcimessage_logic.getLastMessageForConversation(conversation)
+    conv_user.last_message_seen_on = conversation.get().last_message_on
+    conv_user.num_unread_messages = 0
+    conv_user.put()
 
-  conv_user.last_message_seen_on = last_message.sent_on
-  conv_user.put()
+  txn()
 
 
 def reputConversationUsers(conversation):
@@ -238,17 +317,56 @@ def createMessage(conversation, user=None, content=''):
     conversation_ent.last_message_on = message.sent_on
     conversation_ent.put()
 
-    return message
+    # users who are added to the conversation later count the message
+    # when their entities are created
+    conv_user_keys = gciconversation_model.GCIConversationUser.query(
+        ancestor=conversation).fetch(keys_only=True)
 
-  message = create()
+    return message, conv_user_keys
+
+  message, conv_user_keys = create()
 
   # Reput each conversationuser for the conversation to update computed
-  # properties such as last_message_sent_on
-  reputConversationUsers(conversation)
+  # properties such as last_message_sent_on and to count the new message
+  # as unread
+  # the batches are counted one by one, as they belong to the same
+  # entity group and concurrent transactions would collide
+  for i in xrange(0, len(conv_user_keys), _UNREAD_MESSAGES_BATCH_SIZE):
+    _countUnreadMessage(
+        conv_user_keys[i:i + _UNREAD_MESSAGES_BATCH_SIZE],
+        message.sent_on).get_result()
 
   return message
 
 
+@ndb.transactional_tasklet
+def _countUnreadMessage(conv_user_keys, sent_on):
+  """Counts a new message as unread for the specified conversation users.
+
+  The entities are read and written in a transaction, so that concurrent
+  updates of their numbers of unread messages are not lost.
+
+  Args:
+    conv_user_keys: List of keys (ndb) of GCIConversationUsers, which belong
+      to the same conversation.
+    sent_on: Time when the message was sent.
+  """
+  conv_users = yield ndb.get_multi_async(conv_user_keys)
+  conv_users = [
+      conv_user for conv_user in conv_users
+      # the message may have been marked read in the meantime
+      if conv_user and conv_user.last_message_seen_on < sent_on]
+
+  for conv_user in conv_users:
+    if conv_user.num_unread_messages is None:
+      conv_user.num_unread_messages = yield _queryUnreadMessages(
+          conv_user).count_async()
+    else:
+      conv_user.num_unread_messages += 1
+
+  yield ndb.put_multi_async(conv_users)
+
+
 def addUserToConversation(conversation, user):
   """Creates a GCIConversationUser adding the user to the conversation, if the
   user is not already part of the conversation.
@@ -270,15 +388,24 @@ def addUserToConversation(conversation, user):
     conv_user = query.get()
 
     if conv_user:
-      return conv_user
+      return conv_user, False
+
+    # all the messages which have been sent so far are unread for the user
+    num_unread_messages = gcimessage_model.GCIMessage.query(
+        ancestor=conversation).count()
 
     conv_user = gciconversation_model.GCIConversationUser(
-        parent=conversation, conversation=conversation, user=user)
+        parent=conversation, conversation=conversation, user=user,
+        num_unread_messages=num_unread_messages)
     conv_user.put()
 
-    return conv_user
+    return conv_user, True
 
-  return txn()
+  conv_user, created = txn()
+  if created:
+    invalidateSubscribedEmails(conversation)
+
+  return conv_user
 
 
 def removeUserFromConversation(conversation, user):
@@ -290,9 +417,21 @@ def removeUserFromConversation(conversation, user):
     conversation: Key (ndb) of GCIConversation.
     user: Key (ndb) of User.
   """
-  keys = queryConversationUserForConversationAndUser(
-      conversation=conversation, user=user).fetch(100, keys_only=True)
-  ndb.delete_multi(keys)
+  conv_users = queryConversationUserForConversationAndUser(
+      conversation=conversation, user=user).fetch(100)
+  deleteConversationUsers(conv_users)
+
+
+def deleteConversationUsers(conv_users):
+  """Deletes the specified GCIConversationUser entities.
+
+  Args:
+    conv_users: List of GCIConversationUser entities.
+  """
+  ndb.delete_multi([conv_user.key for conv_user in conv_users])
+
+  for conversation in set(conv_user.conversation for conv_user in conv_users):
+    invalidateSubscribedEmails(conversation)
 
 
 def doesConversationUserBelong(
@@ -383,78 +522,192 @@ def doesUserBelongInConversation(
   return True
 
 
+def _queryParticipantProfiles(conversation_ent):
+  """Creates queries for profiles of the users who fit the criteria of
+  a conversation.
+
+  Args:
+    conversation_ent: GCIConversation entity.
+
+  Returns:
+    List of ndb queries for Profiles.
+  """
+  queries = []
+
+  if conversation_ent.recipients_type == conversation_model.PROGRAM:
+    if conversation_ent.include_admins:
+      queries.append(profile_model.Profile.query(
+          profile_model.Profile.program == conversation_ent.program,
+          profile_model.Profile.is_admin == True))
+
+    if conversation_ent.include_mentors:
+      queries.append(profile_logic.queryAllMentorsForProgram(
+          conversation_ent.program.to_old_key()))
+
+    if conversation_ent.include_students:
+      queries.append(profile_model.Profile.query(
+          profile_model.Profile.program == conversation_ent.program,
+          profile_model.Profile.is_student == True))
+
+    if conversation_ent.include_winners:
+      queries.append(profile_model.Profile.query(
+          profile_model.Profile.program == conversation_ent.program,
+          profile_model.Profile.student_data.is_winner == True))
+
+  elif conversation_ent.recipients_type == conversation_model.ORGANIZATION:
+    if conversation_ent.include_admins:
+      queries.append(profile_model.Profile.query(
+          profile_model.Profile.admin_for == conversation_ent.organization,
+          profile_model.Profile.status == profile_model.Status.ACTIVE))
+
+    if conversation_ent.include_mentors:
+      queries.append(profile_model.Profile.query(
+          profile_model.Profile.mentor_for == conversation_ent.organization,
+          profile_model.Profile.status == profile_model.Status.ACTIVE))
+
+    if conversation_ent.include_winners:
+      queries.append(profile_model.Profile.query(
+          profile_model.Profile.student_data.winner_for ==
+              conversation_ent.organization,
+          profile_model.Profile.status == profile_model.Status.ACTIVE))
+
+  return queries
+
+
+def getConversationParticipantsChanges(conversation):
+  """Computes which users should be added to and removed from a conversation
+  depending on the conversation's criteria.
+
+  Only keys of the users are retrieved. The conversation's creator is always
+  included in the conversation. If the conversation's recipients_type is
+  'User', no users are removed from the conversation, because it is expected
+  that the GCIConversationUser will be managed elsewhere.
+
+  Args:
+    conversation: Key (ndb) of GCIConversation.
+
+  Returns:
+    A tuple whose first element is a list of keys (ndb) of Users to add to
+    the conversation and second element is a list of keys (ndb) of
+    GCIConversationUsers to delete.
+  """
+  conversation_ent = conversation.get()
+
+  user_keys = set()
+  for query in _queryParticipantProfiles(conversation_ent):
+    user_keys.update(
+        profile_key.parent() for profile_key in query.iter(keys_only=True))
+
+  if conversation_ent.creator is not None:
+    user_keys.add(conversation_ent.creator)
+
+  # an ancestor query is used, so that users who have just been added or
+  # removed are taken into account
+  query = gciconversation_model.GCIConversationUser.query(
+      ancestor=conversation)
+  existing_conv_user_keys = dict(
+      (conv_user.user, conv_user.key) for conv_user in query.iter())
+
+  user_keys_to_add = [
+      user_key for user_key in user_keys
+      if user_key not in existing_conv_user_keys]
+
+  if conversation_ent.recipients_type == conversation_model.USER:
+    conv_user_keys_to_delete = []
+  else:
+    conv_user_keys_to_delete = [
+        conv_user_key for user_key, conv_user_key
+        in existing_conv_user_keys.iteritems() if user_key not in user_keys]
+
+  return user_keys_to_add, conv_user_keys_to_delete
+
+
+def addUsersToConversation(conversation, user_keys):
+  """Creates GCIConversationUsers adding the specified users to
+  the conversation.
+
+  Users who are already part of the conversation are skipped, so that
+  the same batch of users may be safely added again, for example when
+  a task which adds them is retried.
+
+  Args:
+    conversation: Key (ndb) of GCIConversation.
+    user_keys: List of keys (ndb) of Users.
+  """
+  # the users are added in a transaction, so that no message which is
+  # created concurrently is missed by their numbers of unread messages
+  @ndb.transactional
+  def txn():
+    num_unread_messages_future = gcimessage_model.GCIMessage.query(
+        ancestor=conversation).count_async()
+
+    # ancestor queries are strongly consistent, so that no user is added twice
+    conv_user_futures = [
+        gciconversation_model.GCIConversationUser.query(
+            gciconversation_model.GCIConversationUser.user == user_key,
+            ancestor=conversation).get_async(keys_only=True)
+        for user_key in user_keys]
+    new_user_keys = [
+        user_key for user_key, conv_user_future
+        in zip(user_keys, conv_user_futures)
+        if not conv_user_future.get_result()]
+
+    # all the messages which have been sent so far are unread for the users
+    num_unread_messages = num_unread_messages_future.get_result()
+
+    ndb.put_multi([
+        gciconversation_model.GCIConversationUser(
+            parent=conversation, conversation=conversation, user=user_key,
+            num_unread_messages=num_unread_messages)
+        for user_key in new_user_keys])
+
+    return bool(new_user_keys)
+
+  if txn():
+    invalidateSubscribedEmails(conversation)
+
+
+def applyConversationParticipantsChanges(
+    conversation, user_keys_to_add, conv_user_keys_to_delete):
+  """Adds users to and removes users from a conversation in batches.
+
+  Args:
+    conversation: Key (ndb) of GCIConversation.
+    user_keys_to_add: List of keys (ndb) of Users to add to the conversation.
+    conv_user_keys_to_delete: List of keys (ndb) of GCIConversationUsers
+      to delete.
+  """
+  for i in xrange(0, len(user_keys_to_add), PARTICIPANTS_BATCH_SIZE):
+    addUsersToConversation(
+        conversation, user_keys_to_add[i:i + PARTICIPANTS_BATCH_SIZE])
+
+  for i in xrange(0, len(conv_user_keys_to_delete), PARTICIPANTS_BATCH_SIZE):
+    conv_users = ndb.get_multi(
+        conv_user_keys_to_delete[i:i + PARTICIPANTS_BATCH_SIZE])
+    deleteConversationUsers(
+        [conv_user for conv_user in conv_users if conv_user])
+
+
 def refreshConversationParticipants(conversation):
   """Creates/deletes GCIConversationUser entities depending on the converation's
   criteria.
 
   The conversation's owner is always included in the conversation.
-  If the conversation's recipients_type is 'User', this function will not do
-  anything because it is expected that the GCIConversationUser will be managed
-  elsewhere.
+  If the conversation's recipients_type is 'User', this function will not
+  remove anyone, because it is expected that the GCIConversationUser will be
+  managed elsewhere.
+
+  Only the users whose involvement changes are written. For program-wide
+  conversations, consider using RefreshConversationParticipantsPipeline
+  which applies the changes in parallel.
 
   Args:
     conversation: Key (ndb) of GCIConversation.
   """
-  conv = conversation.get()
-
-  def addProfile(profile):
-    addUserToConversation(
-        conversation=conversation,
-        user=profile.key.parent())
-
-  def deleteConvUserIfDoesntBelong(conv_user):
-    if not doesConversationUserBelong(conversation_user=conv_user.key):
-      conv_user.key.delete()
-
-  # Remove any users included who no longer fit the criteria
-  if conv.recipients_type != conversation_model.USER:
-    conv_user_query = queryConversationUserForConversation(conversation)
-    map(deleteConvUserIfDoesntBelong, conv_user_query)
-
-  # Make sure users who fit the criteria are included
-  if conv.recipients_type == conversation_model.PROGRAM:
-    if conv.include_admins:
-      query = profile_model.Profile.query(
-          profile_model.Profile.program == conv.program,
-          profile_model.Profile.is_admin == True)
-      map(addProfile, query)
-
-    if conv.include_mentors:
-      query = profile_logic.queryAllMentorsForProgram(conv.program.to_old_key())
-      map(addProfile, query)
-
-    if conv.include_students:
-      query = profile_model.Profile.query(
-          profile_model.Profile.program == conv.program,
-          profile_model.Profile.is_student == True)
-      map(addProfile, query)
-
-    if conv.include_winners:
-      query = profile_model.Profile.query(
-          profile_model.Profile.program == conv.program,
-          profile_model.Profile.student_data.is_winner == True)
-      map(addProfile, query)
-
-  elif conv.recipients_type == conversation_model.ORGANIZATION:
-    if conv.include_admins:
-      org_admins = profile_logic.getOrgAdmins(conv.organization)
-      map(addProfile, org_admins)
-
-    if conv.include_mentors:
-      query = profile_model.Profile.query(
-          profile_model.Profile.mentor_for == conv.organization,
-          profile_model.Profile.status == profile_model.Status.ACTIVE)
-      map(addProfile, query)
-
-    if conv.include_winners:
-      query = profile_model.Profile.query(
-          profile_model.Profile.student_data.winner_for == conv.organization,
-          profile_model.Profile.status == profile_model.Status.ACTIVE)
-      map(addProfile, query)
-
-  # Make sure conversation's creator is included
-  if conv.creator is not None:
-    addUserToConversation(conversation=conversation, user=conv.creator)
+  user_keys_to_add, conv_user_keys_to_delete = (
+      getConversationParticipantsChanges(conversation))
+  applyConversationParticipantsChanges(
+      conversation, user_keys_to_add, conv_user_keys_to_delete)
 
 
 def refreshConversationsForUserAndProgram(user_key, program_key):
@@ -486,14 +739,12 @@ def refreshConversationsForUserAndProgram(user_key, program_key):
   if not profile:
     raise Exception('Could not find Profile for user and program.')
 
-  def deleteConvUserIfDoesntBelong(conv_user):
-    if not doesConversationUserBelong(
-        conversation_user=conv_user.key, ignore_auto_update_users=False):
-      conv_user.key.delete()
-
   # Remove user from any conversations they're in that they don't belong in
   conv_user_query = queryForProgramAndUser(user=user_key, program=program_key)
-  map(deleteConvUserIfDoesntBelong, conv_user_query)
+  deleteConversationUsers([
+      conv_user for conv_user in conv_user_query
+      if not doesConversationUserBelong(
+          conversation_user=conv_user.key, ignore_auto_update_users=False)])
 
   def addToConversation(conversation):
     addUserToConversation(conversation=conversation.key, user=user_key)
@@ -578,36 +829,85 @@ def refreshConversationsForUserAndProgram(user_key, program_key):
     map(addToConversation, query)
 
 
-def getSubscribedEmails(conversation, exclude=None):
-  """Gets the list of email addresses for all users subscribed to a
-  conversation.
+def _getSubscribedEmailsCacheKey(conversation):
+  """Returns memcache key of the subscribed emails of a conversation.
+
+  Args:
+    conversation: Key (ndb) of GCIConversation.
+  """
+  return 'subscribed_emails_%s' % conversation.urlsafe()
+
+
+def invalidateSubscribedEmails(conversation):
+  """Removes the cached subscribed emails of a conversation, so that they
+  are computed again next time they are needed.
+
+  Args:
+    conversation: Key (ndb) of GCIConversation.
+  """
+  memcache.delete(_getSubscribedEmailsCacheKey(conversation))
+
+
+def _getSubscribedEmailsByUser(conversation):
+  """Returns email addresses of all users subscribed to a conversation.
+
+  Profiles of the users are retrieved in a single batch and the result is
+  cached for _SUBSCRIBED_EMAILS_CACHE_TIME seconds.
 
   Args:
     conversation: Key (ndb) of GCIConversation.
-    exclude: Keys (ndb) of Users that, if given, will not be in the set of
-             emails.
 
   Returns:
-    Set of email addresses.
+    Dict mapping IDs of the subscribed Users to their email addresses.
   """
+  cache_key = _getSubscribedEmailsCacheKey(conversation)
+  emails = memcache.get(cache_key)
+  if emails is not None:
+    return emails
+
   conversation_ent = conversation.get()
-  conv_users = queryConversationUserForConversation(conversation)
   program_key = ndb.Key.to_old_key(conversation_ent.program)
-  addresses = set()
 
-  for conv_user in conv_users:
-    if conv_user.enable_notifications and (
-        not exclude or conv_user.user not in exclude):
-      profile = profile_logic.getProfileForUsername(
-          conv_user.user.id(), program_key)
+  query = queryConversationUserForConversation(conversation).filter(
+      gciconversation_model.GCIConversationUser.enable_notifications == True)
+  user_keys = [
+      conv_user.user for conv_user in query.fetch(
+          projection=[gciconversation_model.GCIConversationUser.user])]
 
-      if not profile:
-        raise Exception('Could not find GCIProfile for user %s and program. %s'
-            % (conv_user.name, program_key.name()))
+  profile_keys = [
+      profile_logic.getProfileKey(
+          program_model.getSponsorId(program_key),
+          program_model.getProgramId(program_key), user_key.id())
+      for user_key in user_keys]
 
-      addresses.add(profile.contact.email)
+  emails = {}
+  for user_key, profile in zip(user_keys, ndb.get_multi(profile_keys)):
+    if not profile:
+      raise Exception('Could not find GCIProfile for user %s and program. %s'
+          % (user_key.id(), program_key.name()))
+    emails[user_key.id()] = profile.contact.email
 
-  return addresses
+  memcache.set(cache_key, emails, time=_SUBSCRIBED_EMAILS_CACHE_TIME)
+  return emails
+
+
+def getSubscribedEmails(conversation, exclude=None):
+  """Gets the list of email addresses for all users subscribed to a
+  conversation.
+
+  Args:
+    conversation: Key (ndb) of GCIConversation.
+    exclude: Keys (ndb) of Users that, if given, will not be in the set of
+             emails.
+
+  Returns:
+    Set of email addresses.
+  """
+  excluded_ids = set(user.id() for user in exclude or [] if user)
+  return set(
+      email for user_id, email
+      in _getSubscribedEmailsByUser(conversation).iteritems()
+      if user_id not in excluded_ids)
 
 
 def notifyParticipantsOfMessage(message, is_reply):
@@ -40,6 +40,7 @@ def updateOrgScoreTxn(task, student):
       org_score = GCIOrgScore(parent=student.key.to_old_key(), org=org_key)
 
     org_score.tasks.append(task.key())
+    org_score.number_of_tasks = len(org_score.tasks)
     org_score.put()
 
   return txn
@@ -84,6 +85,7 @@ def updateOrgScoresTxn(tasks):
 
       for task in tasks:
         org_score.tasks.append(task.key())
+      org_score.number_of_tasks = len(org_score.tasks)
 
       to_put.append(org_score)
 
@@ -115,18 +117,13 @@ def getPossibleWinners(org):
   """Returns the possible winners for the specified organization which can
   be chosen by the organization admins.
   """
-  # TODO(daniel): this should not retrieve all the students and sort them.
-  # Currently it is necessary, as it is not possible to order the entities
-  # by the length of the list. Instead, number of completed tasks should
-  # be explicitly added to OrgScore model.
-  org_scores = queryForOrg(org).fetch(1000)
-  org_scores = sorted(org_scores, key=lambda e: len(e.tasks), reverse=True)
-
-  profiles = [
-      ndb.Key.from_old_key(org_score.parent_key()).get()
-      for org_score in org_scores]
-
-  return profiles[:POSSIBLE_WINNER_MAX_POSITION]
+  query = queryForOrg(org)
+  query.order('-number_of_tasks')
+  org_scores = query.fetch(POSSIBLE_WINNER_MAX_POSITION)
+
+  return ndb.get_multi(
+      [ndb.Key.from_old_key(org_score.parent_key())
+          for org_score in org_scores])
 
 
 def queryForOrg(org, keys_only=False):
@@ -17,10 +17,15 @@
 import logging
 import re
 
+from google.appengine.api import datastore
+from google.appengine.api import datastore_errors
+from google.appengine.api import taskqueue
 from google.appengine.ext import db
 
 from django.utils.datastructures import SortedDict
 
+from ranklist import ranker as ranker_lib
+
 from soc.modules.gci.models.profile import GCIStudentInfo
 from soc.modules.gci.models.score import GCIScore
 from soc.modules.gci.models.task import POINTS
@@ -28,6 +33,25 @@ from soc.modules.gci.views import forms
 from soc.modules.gci.views.helper import url_names
 
 
+# Range of points that can be stored in a ranker. Each score is a single
+# element list with the number of points that a student has collected.
+RANKER_SCORE_RANGE = [0, 100000]
+
+# Branching factor of the ranker trees. The number of datastore operations
+# to find a rank or a score is proportional to the depth of the tree.
+RANKER_BRANCHING_FACTOR = 100
+
+# Maximal number of entities that are deleted at once when a ranker is cleared
+_CLEAR_RANKER_BATCH_SIZE = 500
+
+# Queue which runs updates of rankers. The queue runs one task at a time,
+# so that the updates do not contend for the entity group of a ranker.
+RANKER_QUEUE_NAME = 'gci-ranker'
+
+# URL of the task which updates the ranker with the score of a student.
+_UPDATE_RANKER_URL = '/tasks/gci/ranking/update_ranker'
+
+
 def get(profile):
   """Gets the score entity associated with the specified profile.
 
@@ -78,6 +102,8 @@ def updateScore(task):
       student_info.task_closed = True
       student_info.put()
 
+    spawnUpdateRankerTask(program.key(), student.key(), transactional=True)
+
   db.run_in_transaction(update_ranking_txn)
 
 
@@ -120,9 +146,210 @@ def calculateScore(student, tasks, program):
     student_info.task_closed = True
     student_info.put()
 
+    spawnUpdateRankerTask(program.key(), student.key(), transactional=True)
+
+    return score
+
   return db.run_in_transaction(calculate_score_txn)
 
 
+def _getRankerRootKey(program):
+  """Returns the key of the root of the ranker for the specified program.
+
+  Args:
+    program: GCIProgram entity.
+
+  Returns:
+    datastore_types.Key of the root of the ranker.
+  """
+  return db.Key.from_path('ranker', program.key().name())
+
+
+def getRanker(program):
+  """Returns the ranker which stores points of the students who participate
+  in the specified program.
+
+  Nothing is written to the datastore, so that the function may be used
+  when pages are rendered.
+
+  Args:
+    program: GCIProgram entity.
+
+  Returns:
+    ranklist.ranker.Ranker for the program or None, if it does not exist yet.
+  """
+  try:
+    return ranker_lib.Ranker(_getRankerRootKey(program))
+  except datastore_errors.EntityNotFoundError:
+    return None
+
+
+def getOrCreateRanker(program):
+  """Returns the ranker which stores points of the students who participate
+  in the specified program.
+
+  The ranker is created, if it does not exist yet.
+
+  Args:
+    program: GCIProgram entity.
+
+  Returns:
+    ranklist.ranker.Ranker for the program.
+  """
+  root_key = _getRankerRootKey(program)
+  try:
+    return ranker_lib.Ranker(root_key)
+  except datastore_errors.EntityNotFoundError:
+    # the root of the ranker stores only its configuration, so it is safe
+    # to put it again if it has been created by a concurrent request
+    root = datastore.Entity('ranker', name=root_key.name())
+    root['score_range'] = RANKER_SCORE_RANGE
+    root['branching_factor'] = RANKER_BRANCHING_FACTOR
+    datastore.Put(root)
+    return ranker_lib.Ranker(root_key)
+
+
+def spawnUpdateRankerTask(program_key, student_key, transactional=False):
+  """Spawns a task to set the current score of the specified student
+  in the ranker for the specified program.
+
+  Args:
+    program_key: db.Key of the GCI program.
+    student_key: db.Key of the student profile.
+    transactional: Whether the task is enqueued in a transaction.
+  """
+  params = {
+      'program': str(program_key),
+      'student': str(student_key),
+      }
+  new_task = taskqueue.Task(url=_UPDATE_RANKER_URL, params=params)
+  new_task.add(RANKER_QUEUE_NAME, transactional=transactional)
+
+
+def updateRankerScore(program, student_key):
+  """Sets the number of points of the current score of the specified student
+  in the ranker for the specified program.
+
+  The score is read when the ranker is updated, so that updates which are
+  run more than once or in a different order leave the ranker consistent.
+
+  Args:
+    program: GCIProgram entity.
+    student_key: db.Key of the student profile.
+  """
+  score = get(student_key)
+  setRankerScore(program, student_key, score.points if score else 0)
+
+
+def setRankerScore(program, student_key, points):
+  """Sets the number of points of the specified student in the ranker
+  for the specified program.
+
+  Students who have not collected any points are not stored in the ranker.
+
+  Args:
+    program: GCIProgram entity.
+    student_key: db.Key of the student profile.
+    points: Number of points that the student has collected.
+  """
+  score = [points] if points > 0 else None
+  getOrCreateRanker(program).SetScore(str(student_key), score)
+
+
+def getRankerScoreNames(program):
+  """Returns the names of all the scores in the ranker for the specified
+  program.
+
+  Args:
+    program: GCIProgram entity.
+
+  Returns:
+    A list of strings of keys of the student profiles.
+  """
+  query = datastore.Query('ranker_score', keys_only=True)
+  query.Ancestor(_getRankerRootKey(program))
+  return [key.name() for key in query.Run()]
+
+
+def clearRanker(program):
+  """Removes all the scores from the ranker for the specified program.
+
+  Args:
+    program: GCIProgram entity.
+  """
+  query = db.Query(keys_only=True).ancestor(_getRankerRootKey(program))
+  keys = query.fetch(_CLEAR_RANKER_BATCH_SIZE)
+  while keys:
+    db.delete(keys)
+    keys = query.fetch(_CLEAR_RANKER_BATCH_SIZE)
+
+
+def getRank(score):
+  """Returns the position of the specified score in the ranking of its program.
+
+  Students with the same number of points share the same position.
+
+  Args:
+    score: GCIScore entity.
+
+  Returns:
+    1-based position of the score in the ranking or None, if the score
+    does not have any points.
+  """
+  if score.points <= 0:
+    return None
+
+  ranker = getRanker(score.program)
+  return ranker.FindRank([score.points]) + 1 if ranker else None
+
+
+def getNumberOfRankedStudents(program):
+  """Returns the number of students who have collected any points in
+  the specified program.
+
+  Args:
+    program: GCIProgram entity.
+  """
+  ranker = getRanker(program)
+  return ranker.TotalRankedScores() if ranker else 0
+
+
+def getScoresPage(program, limit, offset=0):
+  """Returns a page of scores of the students who have collected any points
+  in the specified program.
+
+  The position of the first score on the page is looked up in the ranker,
+  so only the students tied with it at a lower position are skipped by
+  the datastore query, no matter how far the page is from the top.
+
+  Args:
+    program: GCIProgram entity.
+    limit: Maximal number of scores to return.
+    offset: 0-based position of the first score on the page.
+
+  Returns:
+    A list of GCIScore entities ordered by the number of points and then
+    by their keys.
+  """
+  ranker = getRanker(program)
+  if not ranker:
+    return []
+
+  found = ranker.FindScore(offset)
+  if not found:
+    # there are no more than offset students in the ranker
+    return []
+  points, rank_of_tie = found
+
+  query = allScoresForProgramQuery(program)
+  query.filter('points >', 0)
+  query.filter('points <=', points[0])
+  query.order('-points')
+  query.order('__key__')
+
+  return query.fetch(limit, offset=offset - rank_of_tie)
+
+
 def allScoresForProgramQuery(program):
   """Returns the query to fetch all the scores for the specified program.
 
@@ -144,11 +371,7 @@ def winnersForProgram(data):
   """
   program = data.program
 
-  q = GCIScore.all()
-  q.filter('program', program)
-  q.filter('points >', 0)
-  q.order('-points')
-  scores = q.fetch(program.nr_winners)
+  scores = getScoresPage(program, program.nr_winners)
 
   profile_keys = [s.parent_key() for s in scores]
   profiles = db.get(profile_keys)
@@ -61,6 +61,11 @@ class GCIOrgScore(db.Model):
   #: Lists of tasks the student has completed for the organization
   tasks = db.ListProperty(item_type=db.Key, default=[])
 
+  #: Number of tasks the student has completed for the organization. It is
+  #: equal to the length of tasks list, but unlike it, it may be used to
+  #: order the scores in queries.
+  number_of_tasks = db.IntegerProperty(required=True, default=0)
+
   def numberOfTasks(self):
     """Returns the number of tasks that the student completed for
     the organization.
@@ -21,6 +21,7 @@ from google.appengine.ext import db
 
 from django.conf.urls import url
 
+from soc.mapreduce import recalculate_gci_ranking
 from soc.tasks import responses
 from soc.views.helper import url_patterns
 
@@ -42,8 +43,13 @@ class RankingUpdater(object):
     patterns = [
         url(r'^tasks/gci/ranking/update$', self.updateRankingWithTask,
             name='task_update_gci_ranking_with_task'),
+        url(r'^tasks/gci/ranking/update_ranker$', self.updateRanker,
+            name='task_update_gci_ranker'),
         url(r'^tasks/gci/ranking/recalculate/%s$' % url_patterns.PROGRAM,
             self.recalculateGCIRanking, name='task_recalculate_gci_ranking'),
+        url(r'^tasks/gci/ranking/recalculate_sharded/%s$' %
+            url_patterns.PROGRAM, self.recalculateGCIRankingSharded,
+            name='task_recalculate_gci_ranking_sharded'),
         url(r'^tasks/gci/ranking/recalculate_student$',
             self.recalculateForStudent,
             name='task_recalculate_gci_ranking_for_student'),
@@ -71,6 +77,26 @@ class RankingUpdater(object):
     logging.info("ranking_update updateRankingWithTask ends")
     return responses.terminateTask()
 
+  def updateRanker(self, request, *args, **kwargs):
+    """Sets the current score of a student in the ranker of a program.
+
+    Args in POST dict:
+      program: The string version of the key of the GCI program.
+      student: The string version of the key of the student profile.
+    """
+    post_dict = request.POST
+
+    program = GCIProgram.get(post_dict['program'])
+    if not program:
+      logging.warning(
+          'Ranker update queued for non-existing program: %s',
+          post_dict['program'])
+      return responses.terminateTask()
+
+    score_logic.updateRankerScore(program, db.Key(post_dict['student']))
+
+    return responses.terminateTask()
+
   def recalculateGCIRanking(self, request, *args, **kwargs):
     """Recalculates student ranking for the entire program.
 
@@ -121,6 +147,31 @@ class RankingUpdater(object):
 
     return responses.terminateTask()
 
+  def recalculateGCIRankingSharded(self, request, *args, **kwargs):
+    """Recalculates student ranking for the entire program with
+    a mapreduce that processes all the closed tasks in parallel shards.
+
+    The mapreduce is run on the gci-update queue, and its progress may be
+    tracked through the counters of the started pipeline.
+    """
+    key_name = '%s/%s' % (kwargs['sponsor'], kwargs['program'])
+
+    program = GCIProgram.get_by_key_name(key_name)
+    if not program:
+      logging.warning(
+          'Enqueued recalculate ranking task for non-existing program: %s',
+          key_name)
+      return responses.terminateTask()
+
+    recalculate_pipeline = (
+        recalculate_gci_ranking.RecalculateRankingPipeline(key_name))
+    recalculate_pipeline.start(queue_name='gci-update')
+
+    logging.info(
+        'Started recalculating ranking for program %s in pipeline %s',
+        key_name, recalculate_pipeline.pipeline_id)
+    return responses.terminateTask()
+
   def clearGCIRanking(self, request, *args, **kwargs):
     """Clears student ranking for a program with the specified key_name.
     """
@@ -141,6 +192,8 @@ class RankingUpdater(object):
       db.delete(rankings)
       rankings = q.fetch(500)
 
+    score_logic.clearRanker(program)
+
     return responses.terminateTask()
 
   def recalculateForStudent(self, request, *args, **kwargs):
@@ -22,6 +22,9 @@ from google.appengine.ext import ndb
 from django import http
 from django.conf import urls
 
+from mapreduce import base_handler
+from mapreduce.lib import pipeline
+
 from soc.tasks.helper import error_handler
 
 from soc.modules.gci.logic import conversation as gciconversation_logic
@@ -92,3 +95,103 @@ def spawnUpdateConversationsTask(user_key, program_key):
 
   task = taskqueue.Task(params=task_params, url=UPDATE_CONVERSATIONS_URL)
   task.add()
+
+
+def startRefreshingConversationParticipants(conversation_key, message_key=None):
+  """Refreshes participants of a conversation.
+
+  Changes to the participants which fit in a single batch are applied right
+  away. Otherwise, a pipeline is started which applies them in parallel.
+
+  Args:
+    conversation_key: Key (ndb) of GCIConversation.
+    message_key: Key (ndb) of GCIMessage of which to notify participants once
+      they are refreshed, or None if no one should be notified.
+  """
+  user_keys_to_add, conv_user_keys_to_delete = (
+      gciconversation_logic.getConversationParticipantsChanges(
+          conversation_key))
+
+  if (max(len(user_keys_to_add), len(conv_user_keys_to_delete)) <=
+      gciconversation_logic.PARTICIPANTS_BATCH_SIZE):
+    gciconversation_logic.applyConversationParticipantsChanges(
+        conversation_key, user_keys_to_add, conv_user_keys_to_delete)
+    if message_key:
+      gciconversation_logic.notifyParticipantsOfMessage(message_key, False)
+  else:
+    refresh_pipeline = RefreshConversationParticipantsPipeline(
+        conversation_key.urlsafe(), message_key and message_key.urlsafe())
+    refresh_pipeline.start()
+
+
+class RefreshConversationParticipantsPipeline(base_handler.PipelineBase):
+  """A pipeline to add users to and remove users from a conversation
+  depending on the conversation's criteria.
+
+  Changes to the participants are computed up front. They are then split
+  into batches of PARTICIPANTS_BATCH_SIZE users which are applied by
+  separate child pipelines running in parallel.
+
+  Args:
+    conversation_key: URL safe key of GCIConversation.
+    message_key: URL safe key of GCIMessage of which to notify participants
+      once they are refreshed, or None if no one should be notified.
+  """
+  # Overridden method defines only *args.
+  # pylint: disable=arguments-differ
+  def run(self, conversation_key, message_key=None):
+    user_keys_to_add, conv_user_keys_to_delete = (
+        gciconversation_logic.getConversationParticipantsChanges(
+            ndb.Key(urlsafe=conversation_key)))
+
+    batch_size = gciconversation_logic.PARTICIPANTS_BATCH_SIZE
+    batch_pipelines = []
+    for i in xrange(
+        0, max(len(user_keys_to_add), len(conv_user_keys_to_delete)),
+        batch_size):
+      batch_pipeline = yield ApplyConversationParticipantsChangesPipeline(
+          conversation_key,
+          [key.urlsafe() for key in user_keys_to_add[i:i + batch_size]],
+          [key.urlsafe()
+              for key in conv_user_keys_to_delete[i:i + batch_size]])
+      batch_pipelines.append(batch_pipeline)
+
+    if message_key:
+      if batch_pipelines:
+        with pipeline.After(*batch_pipelines):
+          yield NotifyParticipantsPipeline(message_key)
+      else:
+        yield NotifyParticipantsPipeline(message_key)
+
+
+class ApplyConversationParticipantsChangesPipeline(base_handler.PipelineBase):
+  """A pipeline to apply a batch of changes to participants of
+  a conversation.
+
+  Args:
+    conversation_key: URL safe key of GCIConversation.
+    user_keys_to_add: List of URL safe keys of Users to add to
+      the conversation.
+    conv_user_keys_to_delete: List of URL safe keys of GCIConversationUsers
+      to delete.
+  """
+  # Overridden method defines only *args.
+  # pylint: disable=arguments-differ
+  def run(self, conversation_key, user_keys_to_add, conv_user_keys_to_delete):
+    gciconversation_logic.applyConversationParticipantsChanges(
+        ndb.Key(urlsafe=conversation_key),
+        [ndb.Key(urlsafe=key) for key in user_keys_to_add],
+        [ndb.Key(urlsafe=key) for key in conv_user_keys_to_delete])
+
+
+class NotifyParticipantsPipeline(base_handler.PipelineBase):
+  """A pipeline to notify participants of a conversation of a new message.
+
+  Args:
+    message_key: URL safe key of GCIMessage.
+  """
+  # Overridden method defines only *args.
+  # pylint: disable=arguments-differ
+  def run(self, message_key):
+    gciconversation_logic.notifyParticipantsOfMessage(
+        ndb.Key(urlsafe=message_key), False)
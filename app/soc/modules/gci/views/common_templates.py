@@ -71,6 +71,7 @@ class YourScore(Template):
   def context(self):
     return {} if not self.score else {
         'points': self.score.points,
+        'rank': ranking_logic.getRank(self.score),
         'tasks': len(self.score.tasks),
         'my_tasks_link': links.LINKER.profile(
             self.data.ndb_profile, url_names.GCI_STUDENT_TASKS),
@@ -301,6 +301,7 @@ class NotificationsEnabled(GCIRequestHandler):
       conv_user.put()
 
     set_notifications_enabled_txn()
+    gciconversation_logic.invalidateSubscribedEmails(data.conversation.key)
 
   def post(self, data, check, mutator):
     """See soc.modules.gci.views.base.GCIRequestHandler.post for full
@@ -41,6 +41,7 @@ from soc.modules.gci.logic import conversation as gciconversation_logic
 from soc.modules.gci.logic import organization as gciorganization_logic
 
 from soc.modules.gci.models import conversation as gciconversation_model
+from soc.modules.gci.tasks import update_conversations as update_conversation_task
 
 DEF_ROLE_PROGRAM_ADMINISTRATORS = translation.ugettext('Administrators')
 DEF_ROLE_PROGRAM_MENTORS = translation.ugettext('Mentors')
@@ -260,15 +261,24 @@ class ConversationCreateForm(gci_forms.GCIModelForm):
       user_keys.update(cleaned_data['users'])
       for user_key in user_keys:
         gciconversation_logic.addUserToConversation(conversation.key, user_key)
-    else:
+    elif recipients_type == conversation_model.ORGANIZATION:
       gciconversation_logic.refreshConversationParticipants(conversation.key)
+    else:
+      # the other participants of large program-wide conversations are added
+      # by a pipeline, but the creator has to be able to see it right away
+      if creator is not None:
+        gciconversation_logic.addUserToConversation(conversation.key, creator)
 
     message = gciconversation_logic.createMessage(
         conversation=conversation.key, user=creator,
         content=cleaned_data['message_content'])
 
-    gciconversation_logic.notifyParticipantsOfMessage(
-        message.key, False)
+    if recipients_type == conversation_model.PROGRAM:
+      update_conversation_task.startRefreshingConversationParticipants(
+          conversation.key, message_key=message.key)
+    else:
+      gciconversation_logic.notifyParticipantsOfMessage(
+          message.key, False)
 
     return conversation
 
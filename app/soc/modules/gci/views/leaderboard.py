@@ -22,6 +22,7 @@ from soc.views.helper import lists
 from soc.views.helper import url_patterns
 from soc.views.template import Template
 
+from soc.modules.gci.logic import ranking as ranking_logic
 from soc.modules.gci.logic import task as task_logic
 
 from soc.modules.gci.models.score import GCIScore
@@ -72,17 +73,31 @@ class LeaderboardList(Template):
   def getListData(self):
     idx = lists.getListIndex(self.data.request)
     if idx == self.LEADERBOARD_LIST_IDX:
-      q = GCIScore.all()
-      q.filter('program', self.data.program)
+      response = lists.ListContentResponse(
+          self.data.request, self._list_config)
+
+      if response.start == 'done':
+        return response
+
+      # start is the position of the first score on the page
+      try:
+        offset = int(response.start) if response.start else 0
+      except ValueError:
+        raise exception.BadRequest(message='Invalid start position.')
+      scores = ranking_logic.getScoresPage(
+          self.data.program, response.limit, offset=offset)
 
-      skipper = lambda entity, start: entity.points <= 0
       prefetcher = lists.ModelPrefetcher(GCIScore, [], True)
+      args, kwargs = prefetcher.prefetch(scores)
+      for score in scores:
+        response.addRow(score, *args, **kwargs)
 
-      response_builder = lists.RawQueryContentResponseBuilder(
-          self.data.request, self._list_config, q, lists.keyStarter,
-          skipper=skipper, prefetcher=prefetcher)
+      if len(scores) < response.limit:
+        response.next = 'done'
+      else:
+        response.next = str(offset + len(scores))
 
-      return response_builder.build()
+      return response
     else:
       return None
 
@@ -14,6 +14,10 @@
 
 """Functions that help with accept proposals status."""
 
+import datetime
+
+from google.appengine.ext import db
+
 from soc.modules.gsoc.models import accept_proposals_status
 
 
@@ -35,3 +39,70 @@ def getOrCreateStatusForProgram(program_entity):
     aps_entity.put()
 
   return aps_entity
+
+
+def startConversion(program_entity, nr_organizations):
+  """Marks that proposals are about to be converted for the specified number
+  of organizations in the given program.
+
+  Args:
+    program_entity: Program entity for which the proposals are converted.
+    nr_organizations: Number of organizations whose proposals are converted.
+  """
+  aps_entity = getOrCreateStatusForProgram(program_entity)
+  aps_entity.status = 'proceeded'
+  aps_entity.started_on = datetime.datetime.now()
+  aps_entity.finished_on = None
+  aps_entity.nr_converted_projects = 0
+  aps_entity.nr_rejected_proposals = 0
+  aps_entity.nr_organizations = nr_organizations
+  aps_entity.nr_processed_organizations = 0
+  aps_entity.processed_organizations = []
+  aps_entity.put()
+
+
+def recordProcessedOrganization(
+    program_entity, org_id, nr_accepted, nr_rejected):
+  """Records that all the proposals for one organization in the given program
+  have been converted.
+
+  Each organization is recorded only once, even if its proposals are
+  converted again.
+
+  Args:
+    program_entity: Program entity for which the proposals are converted.
+    org_id: Identifier of the organization.
+    nr_accepted: Number of proposals accepted for the organization.
+    nr_rejected: Number of proposals rejected for the organization.
+
+  Returns:
+    True if the organization has been recorded, False if it had already
+    been recorded before.
+  """
+  aps_key = getOrCreateStatusForProgram(program_entity).key()
+
+  def txn():
+    aps_entity = db.get(aps_key)
+    if org_id in aps_entity.processed_organizations:
+      return False
+
+    aps_entity.nr_converted_projects += nr_accepted
+    aps_entity.nr_rejected_proposals += nr_rejected
+    aps_entity.nr_processed_organizations += 1
+    aps_entity.processed_organizations.append(org_id)
+    aps_entity.put()
+    return True
+
+  return db.run_in_transaction(txn)
+
+
+def finishConversion(program_entity):
+  """Marks that proposals have been converted for all organizations
+  in the given program.
+
+  Args:
+    program_entity: Program entity for which the proposals are converted.
+  """
+  aps_entity = getOrCreateStatusForProgram(program_entity)
+  aps_entity.finished_on = datetime.datetime.now()
+  aps_entity.put()
@@ -18,11 +18,21 @@
 
 from google.appengine.ext import db
 
+from melange.utils import iterables
+
+from soc.modules.gsoc.logic import proposal as proposal_logic
 from soc.modules.gsoc.models.proposal_duplicates import GSoCProposalDuplicate
 from soc.modules.gsoc.models.proposal_duplicates_status import \
     GSoCProposalDuplicatesStatus
 
 
+# Maximal number of entities that are written in a single datastore call
+_WRITE_BATCH_SIZE = 500
+
+# Number of organizations for which proposals are queried concurrently
+_ORG_BATCH_SIZE = 20
+
+
 def getOrCreateStatusForProgram(program_entity):
   """Returns the ProposalDuplicatesStatus entity belonging to the given
   program or creates a new one.
@@ -60,3 +70,82 @@ def deleteAllForProgram(program_entity, non_dupes_only=False):
   while proposal_duplicates:
     db.delete(proposal_duplicates)
     proposal_duplicates = q.fetch(500)
+
+
+def getProposalsToBeAcceptedByStudent(organizations):
+  """Returns the proposals which will be accepted into the program for
+  the specified organizations grouped by the students who submitted them.
+
+  Only keys of the proposals are loaded from datastore.
+
+  Args:
+    organizations: List of organization entities.
+
+  Returns:
+    A dict mapping student profile keys to tuples of two lists: one with
+    the keys of the organizations and the other one with the keys of
+    the proposals that will be accepted for the student.
+  """
+  proposals_by_student = {}
+  for org_batch in iterables.iterBatches(organizations, _ORG_BATCH_SIZE):
+    proposals_by_org = proposal_logic.getProposalsToBeAcceptedForOrgs(
+        org_batch, keys_only=True)
+    for org_key, proposal_keys in proposals_by_org.iteritems():
+      for proposal_key in proposal_keys:
+        orgs, proposals = proposals_by_student.setdefault(
+            proposal_key.parent(), ([], []))
+        if org_key.to_old_key() not in orgs:
+          orgs.append(org_key.to_old_key())
+        proposals.append(proposal_key)
+
+  return proposals_by_student
+
+
+def updateDuplicatesForProgram(program_entity, proposals_by_student):
+  """Updates ProposalDuplicates for a given program so that they reflect
+  the specified proposals that will be accepted.
+
+  A ProposalDuplicate is kept only for students with more than one proposal
+  to be accepted. Only the entities that have actually changed are written
+  to or deleted from datastore, in batches.
+
+  Args:
+    program_entity: Program for which to update the ProposalDuplicates.
+    proposals_by_student: A dict as returned by
+        getProposalsToBeAcceptedByStudent for all the organizations
+        in the program.
+  """
+  duplicates_by_student = dict(
+      (student_key, (orgs, proposals))
+      for student_key, (orgs, proposals) in proposals_by_student.iteritems()
+      if len(proposals) >= 2)
+
+  to_put = []
+  to_delete = []
+
+  query = GSoCProposalDuplicate.all().filter('program', program_entity)
+  for proposal_duplicate in query.run(batch_size=_WRITE_BATCH_SIZE):
+    student_key = GSoCProposalDuplicate.student.get_value_for_datastore(
+        proposal_duplicate)
+    if student_key not in duplicates_by_student:
+      to_delete.append(proposal_duplicate)
+      continue
+
+    orgs, proposals = duplicates_by_student.pop(student_key)
+    if (not proposal_duplicate.is_duplicate or
+        set(proposal_duplicate.orgs) != set(orgs) or
+        set(proposal_duplicate.duplicates) != set(proposals)):
+      proposal_duplicate.orgs = orgs
+      proposal_duplicate.duplicates = proposals
+      proposal_duplicate.is_duplicate = True
+      to_put.append(proposal_duplicate)
+
+  for student_key, (orgs, proposals) in duplicates_by_student.iteritems():
+    to_put.append(GSoCProposalDuplicate(
+        program=program_entity, student=student_key, orgs=orgs,
+        duplicates=proposals, is_duplicate=True))
+
+  for i in xrange(0, len(to_put), _WRITE_BATCH_SIZE):
+    db.put(to_put[i:i + _WRITE_BATCH_SIZE])
+  for i in xrange(0, len(to_delete), _WRITE_BATCH_SIZE):
+    db.delete(to_delete[i:i + _WRITE_BATCH_SIZE])
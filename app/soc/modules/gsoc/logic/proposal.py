@@ -21,60 +21,160 @@ from melange.utils import time as time_utils
 
 from soc.logic import timeline as timeline_logic
 
+from soc.tasks import cached_list as cached_list_task
+
 from soc.views.helper import request_data
 
 from soc.modules.gsoc.models import project as project_model
 from soc.modules.gsoc.models import proposal as proposal_model
 
 
-def getProposalsToBeAcceptedForOrg(organization, step_size=25):
-  """Returns all proposals which will be accepted into the program
-  for the specified organization.
+# Maximal number of proposals which may be rejected in a single transaction.
+# Proposals of different students belong to different entity groups and
+# a cross-group transaction may span at most 25 of them, one of which is
+# left for notification mails.
+MAX_PROPOSALS_TO_REJECT_IN_TRANSACTION = 24
+
+def _countAcceptedProposals(org_key):
+  """Counts proposals which have been accepted for the specified organization.
 
   Args:
-    organization: Organization entity.
-    step_size: optional parameter to specify the amount of Student Proposals
-        that should be retrieved per roundtrip to the datastore
+    org_key: ndb.Key of the organization.
 
   Returns:
-    List with all GSoCProposal which will be accepted into the program
+    Number of accepted proposals.
   """
-  # check if there are already slots taken by this org
-  query = proposal_model.GSoCProposal.all()
-  query.filter('org', organization.key.to_old_key())
+  query = proposal_model.GSoCProposal.all(keys_only=True)
+  query.filter('org', org_key.to_old_key())
   query.filter('status', proposal_model.STATUS_ACCEPTED)
+  return query.count()
+
+
+def getNumberOfAcceptedProposals(organization):
+  """Returns the number of proposals which have been accepted for
+  the specified organization.
+
+  The number is maintained by the organization entity. It is counted by
+  a query only for organizations for which it has not been set by
+  the GSoCCountAcceptedProposals mapreduce yet.
+
+  Args:
+    organization: Organization entity.
+
+  Returns:
+    Number of accepted proposals.
+  """
+  if organization.number_of_accepted_proposals is None:
+    return _countAcceptedProposals(organization.key)
+  else:
+    return organization.number_of_accepted_proposals
+
+
+def updateNumberOfAcceptedProposals(org_key, delta):
+  """Updates the number of proposals which have been accepted for
+  the specified organization.
+
+  Organizations for which the number has not been set by
+  the GSoCCountAcceptedProposals mapreduce yet are not updated.
+
+  Args:
+    org_key: ndb.Key of the organization.
+    delta: Number by which the number of accepted proposals is changed.
+  """
+  def updateNumberTxn():
+    org = org_key.get()
+    if org and org.number_of_accepted_proposals is not None:
+      org.number_of_accepted_proposals += delta
+      org.put()
+  ndb.transaction(updateNumberTxn)
 
-  slots_left_to_assign = max(0, organization.slot_allocation - query.count())
-  if slots_left_to_assign == 0:
-    # no slots left so return nothing
-    return []
 
-  query = proposal_model.GSoCProposal.all()
+def setNumberOfAcceptedProposals(org_key):
+  """Counts proposals which have been accepted for the specified organization
+  and stores their number.
+
+  Args:
+    org_key: ndb.Key of the organization.
+  """
+  number = _countAcceptedProposals(org_key)
+
+  def setNumberTxn():
+    org = org_key.get()
+    if org and org.number_of_accepted_proposals != number:
+      org.number_of_accepted_proposals = number
+      org.put()
+  ndb.transaction(setNumberTxn)
+
+
+def _queryProposalsToBeAccepted(organization, keys_only=False):
+  """Returns the query to fetch proposals which will be accepted into
+  the program for the specified organization ordered by their scores.
+  """
+  query = proposal_model.GSoCProposal.all(keys_only=keys_only)
   query.filter('org', organization.key.to_old_key())
   query.filter('status', 'pending')
   query.filter('accept_as_project', True)
   query.filter('has_mentor', True)
   query.order('-score')
+  return query
 
-  # We are not putting this into the filter because order and != do not mix
-  # in GAE.
-  proposals = query.fetch(slots_left_to_assign)
 
-  offset = slots_left_to_assign
-  # retrieve as many additional proposals as needed in case the top
-  # N do not have a mentor assigned
-  while len(proposals) < slots_left_to_assign:
-    new_proposals = query.fetch(step_size, offset=offset)
+def getProposalsToBeAcceptedForOrgs(
+    organizations, step_size=25, keys_only=False):
+  """Returns all proposals which will be accepted into the program
+  for each of the specified organizations.
+
+  The queries for all the organizations are started before any results
+  are retrieved, so that they are run concurrently.
 
-    if not new_proposals:
-      # we ran out of proposals`
-      break
+  Args:
+    organizations: List of organization entities.
+    step_size: optional parameter to specify the amount of Student Proposals
+        that should be retrieved per roundtrip to the datastore
+    keys_only: If True, only keys of the proposals are returned.
 
-    proposals += new_proposals
-    offset += step_size
+  Returns:
+    A dict mapping keys of the organizations to lists with all GSoCProposal
+    which will be accepted into the program or their keys, if keys_only
+    is True.
+  """
+  results = {}
+  for organization in organizations:
+    slots_left_to_assign = max(0,
+        organization.slot_allocation -
+        getNumberOfAcceptedProposals(organization))
+    if slots_left_to_assign == 0:
+      # no slots left so return nothing
+      results[organization.key] = []
+    else:
+      # the query starts fetching the first batch asynchronously
+      results[organization.key] = _queryProposalsToBeAccepted(
+          organization, keys_only=keys_only).run(
+              limit=slots_left_to_assign,
+              batch_size=min(step_size, slots_left_to_assign))
+
+  return dict(
+      (org_key, list(proposals)) for org_key, proposals in results.iteritems())
+
+
+def getProposalsToBeAcceptedForOrg(
+    organization, step_size=25, keys_only=False):
+  """Returns all proposals which will be accepted into the program
+  for the specified organization.
 
-  # cut off any superfluous proposals
-  return proposals[:slots_left_to_assign]
+  Args:
+    organization: Organization entity.
+    step_size: optional parameter to specify the amount of Student Proposals
+        that should be retrieved per roundtrip to the datastore
+    keys_only: If True, only keys of the proposals are returned.
+
+  Returns:
+    List with all GSoCProposal which will be accepted into the program
+    or their keys, if keys_only is True.
+  """
+  return getProposalsToBeAcceptedForOrgs(
+      [organization], step_size=step_size,
+      keys_only=keys_only)[organization.key]
 
 
 def getProposalsQuery(keys_only=False, ancestor=None, **properties):
@@ -261,12 +361,32 @@ def resubmitProposal(proposal, profile, program, timeline):
   return True
 
 
-def acceptProposal(proposal):
+def _runInTransaction(txn):
+  """Runs the specified function in the current transaction or, if there
+  is none, in a new cross-group transaction.
+
+  Args:
+    txn: Function to run.
+  """
+  if db.is_in_transaction():
+    txn()
+  else:
+    db.run_in_transaction_options(
+        db.create_transaction_options(xg=True), txn)
+
+
+def acceptProposal(proposal, mail_txn=None):
   """Accepts the specified proposal as a project and creates a new project
   entity if one has not been created so far.
 
+  The proposal and the project are stored in the current transaction or,
+  if there is none, in a new cross-group transaction.
+
   Args:
     proposal: proposal entity
+    mail_txn: optional function to be run in the cross-group transaction
+        which stores the accepted proposal and the new project, for example
+        to send out notification mails only if it succeeds.
 
   Returns:
     project entity created for the specified proposal
@@ -316,7 +436,14 @@ def acceptProposal(proposal):
   # update proposal's status
   proposal.status = proposal_model.STATUS_ACCEPTED
 
-  db.put([proposal, project])
+  def acceptProposalTxn():
+    db.put([proposal, project])
+    if mail_txn:
+      mail_txn()
+
+  _runInTransaction(acceptProposalTxn)
+  cached_list_task.spawnUpdateCachedItemsTask(project.key())
+  updateNumberOfAcceptedProposals(ndb.Key.from_old_key(org_key), 1)
 
   return project
 
@@ -330,3 +457,27 @@ def rejectProposal(proposal):
   # update proposal's status
   proposal.status = proposal_model.STATUS_REJECTED
   proposal.put()
+
+
+def rejectProposals(proposals, mail_txn=None):
+  """Rejects the specified proposals.
+
+  All the proposals are stored in the current transaction or, if there is
+  none, in a single new cross-group transaction, so no more than
+  MAX_PROPOSALS_TO_REJECT_IN_TRANSACTION proposals may be specified.
+
+  Args:
+    proposals: list of proposal entities
+    mail_txn: optional function to be run in the transaction which stores
+        the rejected proposals, for example to send out notification mails
+        only if it succeeds.
+  """
+  for proposal in proposals:
+    proposal.status = proposal_model.STATUS_REJECTED
+
+  def rejectProposalsTxn():
+    db.put(proposals)
+    if mail_txn:
+      mail_txn()
+
+  _runInTransaction(rejectProposalsTxn)
@@ -41,3 +41,21 @@ class GSoCAcceptProposalsStatus(db.Model):
 
   #: Time where the conversion started on
   started_on = db.DateTimeProperty(auto_now_add=True)
+
+  #: Number of rejected proposals so far
+  nr_rejected_proposals = db.IntegerProperty(required=True, default=0)
+
+  #: Number of organizations for which proposals are converted. It is set
+  #: only when the conversion is run for all organizations in parallel.
+  nr_organizations = db.IntegerProperty()
+
+  #: Number of organizations for which all the proposals have been
+  #: converted so far
+  nr_processed_organizations = db.IntegerProperty(required=True, default=0)
+
+  #: Identifiers of organizations for which all the proposals have been
+  #: converted so far, so that each of them is recorded only once
+  processed_organizations = db.StringListProperty(default=[])
+
+  #: Time when the conversion finished for all organizations
+  finished_on = db.DateTimeProperty()
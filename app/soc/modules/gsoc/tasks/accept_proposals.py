@@ -28,6 +28,7 @@ from google.appengine.ext import ndb
 from google.appengine.runtime import DeadlineExceededError
 
 from melange.models import organization as org_model
+from melange.utils import iterables
 
 from soc.logic import dicts
 from soc.logic import mail_dispatcher
@@ -35,14 +36,32 @@ from soc.tasks.helper.timekeeper import Timekeeper
 from soc.tasks.helper import error_handler
 from soc.tasks import responses
 
+from mapreduce import base_handler
+from mapreduce.lib import pipeline
+
 from soc.modules.gsoc.logic import accept_proposals as conversion_logic
 from soc.modules.gsoc.logic import proposal as proposal_logic
+from soc.modules.gsoc.models import proposal as proposal_model
 from soc.modules.gsoc.models.program import GSoCProgram
 from soc.modules.gsoc.models.proposal import GSoCProposal
 
 from summerofcode.models import organization as soc_org_model
 
 
+# Number of pending proposals which are fetched in a single batch
+_PENDING_PROPOSALS_BATCH_SIZE = 100
+
+
+def _queryAcceptedOrganizations(program):
+  """Returns the query to fetch all accepted organizations
+  for the specified program.
+  """
+  return soc_org_model.SOCOrganization.query(
+      soc_org_model.SOCOrganization.program ==
+          ndb.Key.from_old_key(program.key()),
+      soc_org_model.SOCOrganization.status == org_model.Status.ACCEPTED)
+
+
 class ProposalAcceptanceTask(object):
   """Request handlers for accepting and rejecting proposals in form of a Task.
   """
@@ -63,6 +82,8 @@ class ProposalAcceptanceTask(object):
     POST Args:
       program_key: the key of the program whose proposals should be converted
       org_cursor: the cursor indicating at which org we currently are
+      pipeline: if set to 'yes', proposals for all organizations are
+          converted in parallel by AcceptProposalsPipeline
     """
     params = dicts.merge(request.POST, request.GET)
 
@@ -76,10 +97,15 @@ class ProposalAcceptanceTask(object):
       logging.error("invalid program_key in params: '%s'", params)
       return responses.terminateTask()
 
-    query = soc_org_model.SOCOrganization.query(
-        soc_org_model.SOCOrganization.program ==
-            ndb.Key.from_old_key(program.key()),
-        soc_org_model.SOCOrganization.status == org_model.Status.ACCEPTED)
+    if params.get('pipeline') == 'yes':
+      accept_pipeline = AcceptProposalsPipeline(params['program_key'])
+      accept_pipeline.start()
+      logging.info(
+          'Started accepting proposals for %s in pipeline %s.',
+          program.name, accept_pipeline.pipeline_id)
+      return responses.terminateTask()
+
+    query = _queryAcceptedOrganizations(program)
 
     org_cursor = params.get('org_cursor')
     start_cursor = (
@@ -214,6 +240,14 @@ class ProposalAcceptanceTask(object):
     """Returns the function to sent an acceptance mail for the specified
     proposal.
     """
+    student_entity = ndb.Key.from_old_key(proposal.parent_key()).get()
+    return mail_dispatcher.sendMail(
+        self.getAcceptProposalMailContext(proposal), parent=student_entity,
+        run=False, transactional=transactional)
+
+  def getAcceptProposalMailContext(self, proposal):
+    """Returns the context of an acceptance mail for the specified proposal.
+    """
     sender_name, sender = mail_dispatcher.getDefaultMailSender()
 
     student_entity = ndb.Key.from_old_key(proposal.parent_key()).get()
@@ -236,13 +270,19 @@ class ProposalAcceptanceTask(object):
     messages = program_entity.getProgramMessages()
     template_string = messages.accepted_students_msg
 
-    return mail_dispatcher.getSendMailFromTemplateStringTxn(
-        template_string, context, parent=student_entity,
-        transactional=transactional)
+    return mail_dispatcher.getMailContextFromTemplateString(
+        template_string, context)
 
   def getWelcomeMailTxn(self, proposal, transactional=True):
     """Returns the function to sent an welcome email for an accepted proposal.
     """
+    student_entity = ndb.Key.from_old_key(proposal.parent_key()).get()
+    return mail_dispatcher.sendMail(
+        self.getWelcomeMailContext(proposal), parent=student_entity,
+        run=False, transactional=transactional)
+
+  def getWelcomeMailContext(self, proposal):
+    """Returns the context of a welcome email for an accepted proposal."""
     sender_name, sender = mail_dispatcher.getDefaultMailSender()
 
     student_entity = ndb.Key.from_old_key(proposal.parent_key()).get()
@@ -260,14 +300,20 @@ class ProposalAcceptanceTask(object):
     messages = program_entity.getProgramMessages()
     template_string = messages.accepted_students_welcome_msg
 
-    return mail_dispatcher.getSendMailFromTemplateStringTxn(
-        template_string, context, parent=student_entity,
-        transactional=transactional)
+    return mail_dispatcher.getMailContextFromTemplateString(
+        template_string, context)
 
   def getRejectProposalMailTxn(self, proposal):
     """Returns the function to sent an rejectance mail for the specified
     proposal.
     """
+    student_entity = ndb.Key.from_old_key(proposal.parent_key()).get()
+    return mail_dispatcher.sendMail(
+        self.getRejectProposalMailContext(proposal), parent=student_entity,
+        run=False)
+
+  def getRejectProposalMailContext(self, proposal):
+    """Returns the context of a rejectance mail for the specified proposal."""
     sender_name, sender = mail_dispatcher.getDefaultMailSender()
 
     student_entity = ndb.Key.from_old_key(proposal.parent_key()).get()
@@ -291,8 +337,8 @@ class ProposalAcceptanceTask(object):
     messages = program_entity.getProgramMessages()
     template_string = messages.rejected_students_msg
 
-    return mail_dispatcher.getSendMailFromTemplateStringTxn(
-        template_string, context, parent=student_entity)
+    return mail_dispatcher.getMailContextFromTemplateString(
+        template_string, context)
 
   def acceptProposal(self, proposal, transactional=True):
     """Accept a single proposal.
@@ -354,3 +400,109 @@ class ProposalAcceptanceTask(object):
     # TODO(daniel): run in transaction when proposal and project are NDB
     # db.RunInTransaction(rejectProposalTxn)
     rejectProposalTxn()
+
+
+class AcceptProposalsPipeline(base_handler.PipelineBase):
+  """A pipeline to accept and reject proposals for all accepted organizations
+  in a program.
+
+  Proposals for each organization are converted by a separate child pipeline,
+  and all the child pipelines are run in parallel.
+
+  Args:
+    program_key: Key name of the program whose proposals are converted.
+  """
+  # Overridden method defines only *args.
+  # pylint: disable=arguments-differ
+  def run(self, program_key):
+    program = GSoCProgram.get_by_key_name(program_key)
+    org_keys = _queryAcceptedOrganizations(program).fetch(keys_only=True)
+
+    conversion_logic.startConversion(program, len(org_keys))
+
+    org_pipelines = []
+    for org_key in org_keys:
+      org_pipeline = yield AcceptProposalsForOrgPipeline(
+          program_key, org_key.id())
+      org_pipelines.append(org_pipeline)
+
+    if org_pipelines:
+      with pipeline.After(*org_pipelines):
+        yield FinishAcceptingProposalsPipeline(program_key)
+    else:
+      yield FinishAcceptingProposalsPipeline(program_key)
+
+
+class AcceptProposalsForOrgPipeline(base_handler.PipelineBase):
+  """A pipeline to accept and reject proposals for one organization.
+
+  Notification mails are enqueued in bulk for each accepted proposal and
+  each batch of rejected proposals, in the same transaction which stores
+  the proposals, so that they are sent out only for the converted ones.
+
+  The pipeline may be retried after some of the proposals have been
+  converted, so each proposal is read again before it is converted and
+  skipped if it is not pending anymore.
+
+  Args:
+    program_key: Key name of the program whose proposals are converted.
+    org_id: Identifier of the organization whose proposals are converted.
+  """
+  # Overridden method defines only *args.
+  # pylint: disable=arguments-differ
+  def run(self, program_key, org_id):
+    program = GSoCProgram.get_by_key_name(program_key)
+    org = soc_org_model.SOCOrganization.get_by_id(org_id)
+    acceptance_task = ProposalAcceptanceTask()
+
+    # each proposal is in the entity group of its student
+    nr_accepted = 0
+    proposal_keys = proposal_logic.getProposalsToBeAcceptedForOrg(
+        org, keys_only=True)
+    for proposal in db.get(proposal_keys):
+      if proposal.status == proposal_model.STATUS_PENDING:
+        mail_txn = mail_dispatcher.getSendMailsTxn([
+            acceptance_task.getAcceptProposalMailContext(proposal),
+            acceptance_task.getWelcomeMailContext(proposal)])
+        proposal_logic.acceptProposal(proposal, mail_txn=mail_txn)
+      if proposal.status == proposal_model.STATUS_ACCEPTED:
+        nr_accepted += 1
+
+    query = GSoCProposal.all(keys_only=True)
+    query.filter('org', org.key.to_old_key())
+    query.filter('status', 'pending')
+
+    def rejectProposals(rejected_proposals):
+      mail_txn = mail_dispatcher.getSendMailsTxn([
+          acceptance_task.getRejectProposalMailContext(proposal)
+          for proposal in rejected_proposals])
+      proposal_logic.rejectProposals(rejected_proposals, mail_txn=mail_txn)
+
+    nr_rejected = 0
+    for proposal_keys in iterables.iterBatches(
+        query.run(batch_size=_PENDING_PROPOSALS_BATCH_SIZE),
+        proposal_logic.MAX_PROPOSALS_TO_REJECT_IN_TRANSACTION):
+      # the query may still return proposals which have just been rejected
+      rejected_proposals = [
+          proposal for proposal in db.get(proposal_keys)
+          if proposal.status == proposal_model.STATUS_PENDING]
+      if rejected_proposals:
+        rejectProposals(rejected_proposals)
+        nr_rejected += len(rejected_proposals)
+
+    conversion_logic.recordProcessedOrganization(
+        program, org_id, nr_accepted, nr_rejected)
+
+
+class FinishAcceptingProposalsPipeline(base_handler.PipelineBase):
+  """A pipeline to record that proposals have been converted for all
+  organizations in a program.
+
+  Args:
+    program_key: Key name of the program whose proposals are converted.
+  """
+  # Overridden method defines only *args.
+  # pylint: disable=arguments-differ
+  def run(self, program_key):
+    program = GSoCProgram.get_by_key_name(program_key)
+    conversion_logic.finishConversion(program)
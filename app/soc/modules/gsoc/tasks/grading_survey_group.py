@@ -156,14 +156,9 @@ class GradingRecordTasks(object):
     send_mail = post_dict.get('send_mail', '')
 
     if send_mail:
-      # enqueue a task to send mail for each GradingRecord
-      for record in records:
-        # pass along these params as POST to the new task
-        task_params = {'record_key': str(record.key())}
-        task_url = '/tasks/gsoc/grading_record/mail_result'
-
-        mail_task = taskqueue.Task(params=task_params, url=task_url)
-        mail_task.add('mail')
+      # send out the mails for the whole batch of GradingRecords in bulk
+      mail_dispatcher.sendMails(
+          [_getResultMailContext(record) for record in records])
 
     # pass along these params as POST to the new task
     task_params = {'group_key': group_key,
@@ -201,48 +196,59 @@ class GradingRecordTasks(object):
       error_handler.logErrorAndReturnOK(
           'No valid GradingRecord key specified: %s' % record_key)
 
-    survey_group_entity = record.grading_survey_group
-    project_entity = record.parent()
-    student_entity = ndb.Key.from_old_key(project_entity.parent_key()).get()
-
-    org_key = GSoCProject.org.get_value_for_datastore(project_entity)
-    org = ndb.Key.from_old_key(org_key).get()
-
-    site_entity = site.singleton()
-
-    mail_context = {
-        'survey_group': survey_group_entity,
-        'grading_record': record,
-        'project': project_entity,
-        'organization': org,
-        'site_name': site_entity.site_name,
-        'to_name': student_entity.public_name
-    }
-
-    # set the sender
-    (_, sender_address) = mail_dispatcher.getDefaultMailSender()
-    mail_context['sender'] = sender_address
-
-    # set the receiver and subject
-    mail_context['to'] = student_entity.contact.email
-    mail_context['cc'] = []
-    mail_context['subject'] = '%s results processed for %s' %(
-        survey_group_entity.name, project_entity.title)
+    # send out the email
+    mail_dispatcher.sendMail(_getResultMailContext(record))
 
-    org_admins = profile_logic.getOrgAdmins(org.key)
-
-    # collect all mentors
-    mentors = ndb.get_multi(
-        map(ndb.Key.from_old_key,
-            GSoCProject.mentors.get_value_for_datastore(project_entity)))
+    # return OK
+    return http.HttpResponse()
 
-    # add them all to the cc list
-    for org_member in org_admins + mentors:
-      mail_context['cc'].append(org_member.contact.email)
 
-    # send out the email using a template
-    mail_template = 'modules/gsoc/grading_record/mail/result.html'
-    mail_dispatcher.sendMailFromTemplate(mail_template, mail_context)
+def _getResultMailContext(record):
+  """Returns the context of a mail about the result of the specified
+  GradingRecord.
 
-    # return OK
-    return http.HttpResponse()
+  Args:
+    record: GSoCGradingRecord entity.
+  """
+  survey_group_entity = record.grading_survey_group
+  project_entity = record.parent()
+  student_entity = ndb.Key.from_old_key(project_entity.parent_key()).get()
+
+  org_key = GSoCProject.org.get_value_for_datastore(project_entity)
+  org = ndb.Key.from_old_key(org_key).get()
+
+  site_entity = site.singleton()
+
+  mail_context = {
+      'survey_group': survey_group_entity,
+      'grading_record': record,
+      'project': project_entity,
+      'organization': org,
+      'site_name': site_entity.site_name,
+      'to_name': student_entity.public_name
+  }
+
+  # set the sender
+  (_, sender_address) = mail_dispatcher.getDefaultMailSender()
+  mail_context['sender'] = sender_address
+
+  # set the receiver and subject
+  mail_context['to'] = student_entity.contact.email
+  mail_context['cc'] = []
+  mail_context['subject'] = '%s results processed for %s' %(
+      survey_group_entity.name, project_entity.title)
+
+  org_admins = profile_logic.getOrgAdmins(org.key)
+
+  # collect all mentors
+  mentors = ndb.get_multi(
+      map(ndb.Key.from_old_key,
+          GSoCProject.mentors.get_value_for_datastore(project_entity)))
+
+  # add them all to the cc list
+  for org_member in org_admins + mentors:
+    mail_context['cc'].append(org_member.contact.email)
+
+  mail_template = 'modules/gsoc/grading_record/mail/result.html'
+  return mail_dispatcher.getMailContextFromTemplate(
+      mail_template, mail_context)
@@ -19,7 +19,6 @@
 import datetime
 
 from google.appengine.api import taskqueue
-from google.appengine.datastore import datastore_query
 from google.appengine.ext import db
 from google.appengine.ext import ndb
 
@@ -31,13 +30,15 @@ from melange.models import organization as org_model
 from soc.tasks.helper import error_handler
 
 from soc.modules.gsoc.models.program import GSoCProgram
-from soc.modules.gsoc.logic import proposal as proposal_logic
 from soc.modules.gsoc.logic import duplicates as duplicates_logic
-from soc.modules.gsoc.models.proposal_duplicates import GSoCProposalDuplicate
 
 from summerofcode.models import organization as soc_org_model
 
 
+# Number of organizations that are fetched from datastore in a single batch
+_ORG_BATCH_SIZE = 100
+
+
 # TODO(ljvderijk): General purpose task responses such as retry(), abort() and
 # error message can be defined in a parent class of this object.
 class ProposalDuplicatesTask(object):
@@ -93,9 +94,6 @@ class ProposalDuplicatesTask(object):
     pds_entity = duplicates_logic.getOrCreateStatusForProgram(program_entity)
 
     if pds_entity.status == 'idle':
-      # delete all old duplicates
-      duplicates_logic.deleteAllForProgram(program_entity)
-
       # pass these data along params as POST to the new task
       task_params = {'program_key': program_key}
       task_url = '/tasks/gsoc/proposal_duplicates/calculate'
@@ -133,13 +131,14 @@ class ProposalDuplicatesTask(object):
 
   def calculate(self, request, *args, **kwargs):
     """Calculates the duplicate proposals in a given program for
-    a student on a per Organization basis.
+    all the students at once.
+
+    Only the duplicates which have changed since the previous calculation
+    are updated.
 
     Expects the following to be present in the POST dict:
       program_key: Specifies the program key name for which to find the
                    duplicate proposals
-      org_cursor: Specifies the organization datastore cursor from which to
-                  start the processing of finding the duplicate proposals
 
     Args:
       request: Django Request object
@@ -158,75 +157,24 @@ class ProposalDuplicatesTask(object):
       return error_handler.logErrorAndReturnOK(
           'Invalid program specified: %s' % program_key)
 
-    # get the organization and update the cursor if possible
     query = soc_org_model.SOCOrganization.query(
         soc_org_model.SOCOrganization.status == org_model.Status.ACCEPTED,
         soc_org_model.SOCOrganization.program ==
             ndb.Key.from_old_key(program_entity.key()),
         soc_org_model.SOCOrganization.slot_allocation > 0)
 
-    # retrieve the org_cursor from POST data
-    org_cursor = post_dict.get('org_cursor')
-    start_cursor = (
-        datastore_query.Cursor(urlsafe=org_cursor) if org_cursor else None)
-
-    organizations, next_cursor, _ = query.fetch_page(
-        1, start_cursor=start_cursor)
-
-    if organizations:
-      organization = organizations[0]
-      # get all the proposals likely to be accepted in the program
-      accepted_proposals = (
-          proposal_logic.getProposalsToBeAcceptedForOrg(organization))
-
-      for accepted_proposal in accepted_proposals:
-        q = GSoCProposalDuplicate.all()
-        q.filter('student', accepted_proposal.parent_key())
-        proposal_duplicate = q.get()
-
-        if (proposal_duplicate and
-            accepted_proposal.key() not in proposal_duplicate.duplicates):
-          # non-counted (to-be) accepted proposal found
-          proposal_duplicate.duplicates = proposal_duplicate.duplicates + \
-                                          [accepted_proposal.key()]
-          proposal_duplicate.is_duplicate = \
-              len(proposal_duplicate.duplicates) >= 2
-          if organization.key.to_old_key() not in proposal_duplicate.orgs:
-            proposal_duplicate.orgs = (
-                proposal_duplicate.orgs + [organization.key.to_old_key()])
-        else:
-          pd_fields = {
-              'program': program_entity,
-              'student': accepted_proposal.parent_key(),
-              'orgs':[organization.key.to_old_key()],
-              'duplicates': [accepted_proposal.key()],
-              'is_duplicate': False
-              }
-          proposal_duplicate = GSoCProposalDuplicate(**pd_fields)
-
-        proposal_duplicate.put()
-
-      # Adds a new task that performs duplicate calculation for
-      # the next organization.
-      task_params = {
-          'program_key': program_key,
-          'org_cursor': next_cursor.urlsafe()
-          }
-      task_url = '/tasks/gsoc/proposal_duplicates/calculate'
+    # all the organizations are processed at once, so that the proposals
+    # to be accepted can be compared with the existing duplicates in memory
+    proposals_by_student = duplicates_logic.getProposalsToBeAcceptedByStudent(
+        query.iter(batch_size=_ORG_BATCH_SIZE))
+    duplicates_logic.updateDuplicatesForProgram(
+        program_entity, proposals_by_student)
 
-      new_task = taskqueue.Task(params=task_params, url=task_url)
-      new_task.add()
-    else:
-      # There aren't any more organizations to process. So delete
-      # all the proposals for which there are not more than one
-      # proposal for duplicates property.
-      duplicates_logic.deleteAllForProgram(program_entity, non_dupes_only=True)
-
-      # update the proposal duplicate status and its timestamp
-      pds_entity = duplicates_logic.getOrCreateStatusForProgram(program_entity)
-      pds_entity.status = 'idle'
-      pds_entity.calculated_on = datetime.datetime.now()
-      pds_entity.put()
+    # update the proposal duplicate status and its timestamp
+    pds_entity = duplicates_logic.getOrCreateStatusForProgram(program_entity)
+    pds_entity.status = 'idle'
+    pds_entity.calculated_on = datetime.datetime.now()
+    pds_entity.put()
 
     # return OK
     return http.HttpResponse()
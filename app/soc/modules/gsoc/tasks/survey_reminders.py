@@ -55,7 +55,10 @@ class SurveyReminderTask(object):
     return patterns
 
   def spawnRemindersForProjectSurvey(self, request, *args, **kwargs):
-    """Spawns tasks for each GSoCProject in the given Program.
+    """Sends out reminders for a batch of GSoCProjects in the given Program
+    and spawns a task for the next batch.
+
+    The reminders for all the projects of a batch are sent out in bulk.
 
     Expects the following to be present in the POST dict:
       program_key: Specifies the program key name for which to loop over all
@@ -88,6 +91,17 @@ class SurveyReminderTask(object):
       return error_handler.logErrorAndReturnOK(
           'Invalid program specified: %s' % program_key)
 
+    survey_model, record_model = _getSurveyModels(survey_type)
+    if not survey_model:
+      return error_handler.logErrorAndReturnOK(
+          '%s is an invalid survey_type' %survey_type)
+
+    survey = survey_model.get_by_key_name(survey_key)
+    if not survey:
+      # no existing survey found, log and return OK
+      return error_handler.logErrorAndReturnOK(
+          'Invalid survey specified %s:' % survey_key)
+
     q = GSoCProject.all()
     q.filter('status', 'accepted')
     q.filter('program', program_entity)
@@ -101,16 +115,14 @@ class SurveyReminderTask(object):
       # we are done, return OK
       return http.HttpResponse()
 
+    # reminders for the whole batch of projects are sent out together
+    contexts = []
     for project in projects:
-      task_params = {
-          'survey_key': survey_key,
-          'survey_type': survey_type,
-          'project_key': str(project.key())
-          }
-      task_url = '/tasks/gsoc/surveys/send_reminder/send'
-
-      new_task = taskqueue.Task(params=task_params, url=task_url)
-      new_task.add('mail')
+      context = _getReminderMailContext(
+          project, survey, survey_type, record_model)
+      if context:
+        contexts.append(context)
+    mail_dispatcher.sendMails(contexts)
 
     # pass along these params as POST to the new task
     task_params = {
@@ -154,13 +166,8 @@ class SurveyReminderTask(object):
           'Invalid sendSurveyReminderForProject data: %s' % post_dict)
 
     # set model depending on survey type specified in POST
-    if survey_type == 'project':
-      survey_model = ProjectSurvey
-      record_model = GSoCProjectSurveyRecord
-    elif survey_type == 'grading':
-      survey_model = GradingProjectSurvey
-      record_model = GSoCGradingProjectSurveyRecord
-    else:
+    survey_model, record_model = _getSurveyModels(survey_type)
+    if not survey_model:
       return error_handler.logErrorAndReturnOK(
           '%s is an invalid survey_type' %survey_type)
 
@@ -178,79 +185,116 @@ class SurveyReminderTask(object):
       return error_handler.logErrorAndReturnOK(
           'Invalid survey specified %s:' % survey_key)
 
-    # try to retrieve an existing record
-    q = record_model.all()
-    q.filter('project', project)
-    q.filter('survey', survey)
-    record = q.get()
-
-    if not record:
-      # send reminder email because we found no record
-      student = ndb.Key.from_old_key(project.parent_key()).get()
-      site_entity = site.singleton()
-
-      if survey_type == 'project':
-        url_name = 'gsoc_take_student_evaluation'
-
-        to_name = student.public_name
-        to_address = student.contact.email
-        mail_template = 'modules/gsoc/reminder/student_eval_reminder.html'
-      elif survey_type == 'grading':
-        url_name = 'gsoc_take_mentor_evaluation'
-
-        mentors = ndb.get_multi(map(ndb.Key.from_old_key, project.mentors))
-        to_address = [mentor.contact.email for mentor in mentors]
-        to_name = 'mentor(s) for project "%s"' % (project.title)
-        mail_template = (
-            'modules/gsoc/reminder/mentor_eval_reminder.html')
-
-      program = project.program
-      hostname = site.getHostname()
-      url_kwargs = {
-          'sponsor': program_logic.getSponsorKey(program).name(),
-          'program': program.link_id,
-          'survey': survey.link_id,
-          'user': student.profile_id,
-          'id': str(project.key().id()),
-          }
-      url_path_and_query = reverse(url_name, kwargs=url_kwargs)
-      survey_url = '%s://%s%s' % ('http', hostname, url_path_and_query)
-
-      # set the context for the mail template
-      mail_context = {
-          'student_name': student.public_name,
-          'project_title': project.title,
-          'survey_url': survey_url,
-          'survey_end': survey.survey_end,
-          'to_name': to_name,
-          'site_name': site_entity.site_name,
-          'sender_name': "The %s Team" % site_entity.site_name,
-      }
-
-      # set the sender
-      _, sender_address = mail_dispatcher.getDefaultMailSender()
-      mail_context['sender'] = sender_address
-      # set the receiver and subject
-      mail_context['to'] = to_address
-      mail_context['subject'] = (
-          'Evaluation "%s" Reminder' % survey.title)
-
-      # find all org admins for the project's organization
-      org_key = ndb.Key.from_old_key(
-          GSoCProject.org.get_value_for_datastore(project))
-      org_admins = profile_logic.getOrgAdmins(org_key)
+    context = _getReminderMailContext(
+        project, survey, survey_type, record_model)
+    if context:
+      # send out the email
+      mail_dispatcher.sendMail(context)
 
-      # collect email addresses for all found org admins
-      org_admin_addresses = []
+    # return OK
+    return http.HttpResponse()
 
-      for org_admin in org_admins:
-        org_admin_addresses.append(org_admin.contact.email)
 
-      if org_admin_addresses:
-        mail_context['cc'] = org_admin_addresses
+def _getSurveyModels(survey_type):
+  """Returns the models of surveys and their records of the specified type.
 
-      # send out the email
-      mail_dispatcher.sendMailFromTemplate(mail_template, mail_context)
+  Args:
+    survey_type: either project or grading depending on the type of Survey
 
-    # return OK
-    return http.HttpResponse()
+  Returns:
+    A tuple of the survey model and the record model or (None, None), if
+    the type is not valid.
+  """
+  if survey_type == 'project':
+    return ProjectSurvey, GSoCProjectSurveyRecord
+  elif survey_type == 'grading':
+    return GradingProjectSurvey, GSoCGradingProjectSurveyRecord
+  else:
+    return None, None
+
+
+def _getReminderMailContext(project, survey, survey_type, record_model):
+  """Returns the context of a reminder mail for the specified project
+  and survey.
+
+  Args:
+    project: GSoCProject entity.
+    survey: Survey entity to send a reminder for.
+    survey_type: either project or grading depending on the type of Survey
+    record_model: Model of the records of the survey.
+
+  Returns:
+    The context of the mail or None, if a record is already on file for
+    the survey and project.
+  """
+  # try to retrieve an existing record
+  q = record_model.all()
+  q.filter('project', project)
+  q.filter('survey', survey)
+  if q.get():
+    return None
+
+  student = ndb.Key.from_old_key(project.parent_key()).get()
+  site_entity = site.singleton()
+
+  if survey_type == 'project':
+    url_name = 'gsoc_take_student_evaluation'
+
+    to_name = student.public_name
+    to_address = student.contact.email
+    mail_template = 'modules/gsoc/reminder/student_eval_reminder.html'
+  elif survey_type == 'grading':
+    url_name = 'gsoc_take_mentor_evaluation'
+
+    mentors = ndb.get_multi(map(ndb.Key.from_old_key, project.mentors))
+    to_address = [mentor.contact.email for mentor in mentors]
+    to_name = 'mentor(s) for project "%s"' % (project.title)
+    mail_template = (
+        'modules/gsoc/reminder/mentor_eval_reminder.html')
+
+  program = project.program
+  hostname = site.getHostname()
+  url_kwargs = {
+      'sponsor': program_logic.getSponsorKey(program).name(),
+      'program': program.link_id,
+      'survey': survey.link_id,
+      'user': student.profile_id,
+      'id': str(project.key().id()),
+      }
+  url_path_and_query = reverse(url_name, kwargs=url_kwargs)
+  survey_url = '%s://%s%s' % ('http', hostname, url_path_and_query)
+
+  # set the context for the mail template
+  mail_context = {
+      'student_name': student.public_name,
+      'project_title': project.title,
+      'survey_url': survey_url,
+      'survey_end': survey.survey_end,
+      'to_name': to_name,
+      'site_name': site_entity.site_name,
+      'sender_name': "The %s Team" % site_entity.site_name,
+  }
+
+  # set the sender
+  _, sender_address = mail_dispatcher.getDefaultMailSender()
+  mail_context['sender'] = sender_address
+  # set the receiver and subject
+  mail_context['to'] = to_address
+  mail_context['subject'] = (
+      'Evaluation "%s" Reminder' % survey.title)
+
+  # find all org admins for the project's organization
+  org_key = ndb.Key.from_old_key(
+      GSoCProject.org.get_value_for_datastore(project))
+  org_admins = profile_logic.getOrgAdmins(org_key)
+
+  # collect email addresses for all found org admins
+  org_admin_addresses = []
+
+  for org_admin in org_admins:
+    org_admin_addresses.append(org_admin.contact.email)
+
+  if org_admin_addresses:
+    mail_context['cc'] = org_admin_addresses
+
+  return mail_dispatcher.getMailContextFromTemplate(mail_template, mail_context)
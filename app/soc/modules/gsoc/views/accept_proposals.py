@@ -57,7 +57,14 @@ class AcceptProposalsPage(base.GSoCRequestHandler):
     """Handles the POST request to (re)start conversion."""
 
     # pass along these params as POST to the new task
-    task_params = {'program_key': data.program.key().id_or_name()}
+    task_params = {
+        'program_key': data.program.key().id_or_name(),
+        }
+
+    # proposals for all organizations are converted in parallel only
+    # if it has been requested explicitly
+    if data.POST.get('pipeline') == 'yes':
+      task_params['pipeline'] = 'yes'
     task_url = '/tasks/gsoc/accept_proposals/main'
 
     # adds a new task
@@ -361,6 +361,8 @@ class ProjectList(Template):
         profile.put()
 
       db.run_in_transaction(withdraw_or_accept_project_txn)
+      proposal_logic.updateNumberOfAcceptedProposals(
+          org_key, -1 if withdraw else 1)
 
     return True
 
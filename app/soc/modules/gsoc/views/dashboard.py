@@ -44,7 +44,7 @@ from soc.views.helper.surveys import dictForSurveyModel
 from soc.modules.gsoc.logic import document as gsoc_document_logic
 from soc.modules.gsoc.logic.evaluations import evaluationRowAdder
 from soc.modules.gsoc.logic import project as project_logic
-from soc.modules.gsoc.logic.proposal import getProposalsToBeAcceptedForOrg
+from soc.modules.gsoc.logic.proposal import getProposalsToBeAcceptedForOrgs
 from soc.modules.gsoc.logic.survey_record import getEvalRecord
 from soc.modules.gsoc.models.grading_project_survey import GradingProjectSurvey
 from soc.modules.gsoc.models.grading_project_survey_record import \
@@ -67,6 +67,34 @@ from summerofcode.views.helper import urls
 BACKLINKS_TO_ADMIN = {'to': 'main', 'title': 'Main dashboard'}
 
 
+def _getOrganizationDependencies(entity):
+  """Returns dependencies of organization columns for the specified proposal
+  or project.
+
+  See lists.ListConfiguration._addColumn for specification.
+  """
+  org_key = type(entity).org.get_value_for_datastore(entity)
+  return [ndb.Key.from_old_key(org_key)]
+
+
+def _getStudentDependencies(entity):
+  """Returns dependencies of student columns for the specified proposal
+  or project.
+
+  See lists.ListConfiguration._addColumn for specification.
+  """
+  return [ndb.Key.from_old_key(entity.parent_key())]
+
+
+def _getMentorsDependencies(entity):
+  """Returns dependencies of mentors columns for the specified project.
+
+  See lists.ListConfiguration._addColumn for specification.
+  """
+  return map(ndb.Key.from_old_key,
+      GSoCProject.mentors.get_value_for_datastore(entity))
+
+
 def colorize(choice, yes, no):
   """Differentiate between yes and no status with green and red colors."""
   if choice:
@@ -400,7 +428,8 @@ class MyProposalsComponent(Component):
 
     list_config = lists.ListConfiguration()
     list_config.addSimpleColumn('title', 'Title')
-    list_config.addPlainTextColumn('org', 'Organization', getOrganization)
+    list_config.addPlainTextColumn('org', 'Organization', getOrganization,
+        dependencies=_getOrganizationDependencies)
     list_config.setRowAction(lambda e, *args:
         links.LINKER.userId(
             e.parent_key(), e.key().id(), url_names.PROPOSAL_REVIEW))
@@ -464,7 +493,8 @@ class MyProjectsComponent(Component):
 
     list_config = lists.ListConfiguration()
     list_config.addSimpleColumn('title', 'Title')
-    list_config.addPlainTextColumn('org', 'Organization Name', getOrganization)
+    list_config.addPlainTextColumn('org', 'Organization Name', getOrganization,
+        dependencies=_getOrganizationDependencies)
     list_config.setRowAction(
         lambda e, *args: links.LINKER.userId(
             e.parent_key(), e.key().id(), url_names.GSOC_PROJECT_DETAILS))
@@ -671,7 +701,8 @@ class OrgEvaluationsComponent(MyEvaluationsComponent):
       """Helper function to get value of student column."""
       return ndb.Key.from_old_key(entity.parent_key()).get().public_name
 
-    self._list_config.addPlainTextColumn('student', 'Student', getStudent)
+    self._list_config.addPlainTextColumn('student', 'Student', getStudent,
+        dependencies=_getStudentDependencies)
 
     def rowAction(ent, eval, *args):
       eval_ent = eval
@@ -816,7 +847,8 @@ class SubmittedProposalsComponent(Component):
       """Helper function to get value of student column."""
       return ndb.Key.from_old_key(entity.parent_key()).get().public_name
 
-    list_config.addPlainTextColumn('student', 'Student', getStudent)
+    list_config.addPlainTextColumn('student', 'Student', getStudent,
+        dependencies=_getStudentDependencies)
     list_config.addSimpleColumn('accept_as_project', 'Should accept')
 
     def getOrganization(entity, *args):
@@ -858,7 +890,8 @@ class SubmittedProposalsComponent(Component):
 
     hidden = len(data.mentor_for) < 2
     list_config.addPlainTextColumn(
-        'org', 'Organization', getOrganization, options=options, hidden=hidden)
+        'org', 'Organization', getOrganization, options=options, hidden=hidden,
+        dependencies=_getOrganizationDependencies)
 
     # hidden keys
     list_config.addPlainTextColumn(
@@ -1061,8 +1094,10 @@ class SubmittedProposalsComponent(Component):
 
     # Only fetch the data if we will display it
     if self.data.program.duplicates_visible:
-      for org in self.data.mentor_for:
-        accepted.extend([p.key() for p in getProposalsToBeAcceptedForOrg(org)])
+      proposals_by_org = getProposalsToBeAcceptedForOrgs(
+          self.data.mentor_for, keys_only=True)
+      for proposal_keys in proposals_by_org.itervalues():
+        accepted.extend(proposal_keys)
 
 
     # Only fetch the data if it is going to be displayed
@@ -1099,8 +1134,10 @@ class ProjectsIMentorComponent(Component):
       """Helper function to get value of student column."""
       return ndb.Key.from_old_key(entity.parent_key()).get().public_name
 
-    list_config.addPlainTextColumn('student', 'Student', getStudent)
-    list_config.addPlainTextColumn('org', 'Organization', getOrganization)
+    list_config.addPlainTextColumn('student', 'Student', getStudent,
+        dependencies=_getStudentDependencies)
+    list_config.addPlainTextColumn('org', 'Organization', getOrganization,
+        dependencies=_getOrganizationDependencies)
     list_config.setDefaultSort('title')
     list_config.setRowAction(
         lambda e, *args: links.LINKER.userId(
@@ -1534,10 +1571,13 @@ class StudentEvaluationComponent(Component):
     list_config.addPlainTextColumn(
         'evaluation', 'Evaluation',
         lambda ent, eval, *args: eval.capitalize() if eval else '')
-    list_config.addPlainTextColumn('student', 'Student', getStudent)
+    list_config.addPlainTextColumn('student', 'Student', getStudent,
+        dependencies=_getStudentDependencies)
     list_config.addSimpleColumn('title', 'Project Title')
-    list_config.addPlainTextColumn('org', 'Organization', getOrganization)
-    list_config.addPlainTextColumn('mentors', 'Mentors', getMentors)
+    list_config.addPlainTextColumn('org', 'Organization', getOrganization,
+        dependencies=_getOrganizationDependencies)
+    list_config.addPlainTextColumn('mentors', 'Mentors', getMentors,
+        dependencies=_getMentorsDependencies)
     list_config.addHtmlColumn(
         'status', 'Status', self._getStatus)
     list_config.addDateColumn(
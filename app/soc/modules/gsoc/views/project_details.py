@@ -28,6 +28,7 @@ from melange.models import profile as profile_model
 from melange.request import exception
 from melange.request import links
 
+from soc.tasks import cached_list as cached_list_task
 from soc.views.helper import blobstore as bs_helper
 from soc.views.helper import url_patterns
 from soc.views.helper.access_checker import isSet
@@ -216,7 +217,8 @@ class ProjectDetailsUpdate(base.GSoCRequestHandler):
         data=data.POST or None, instance=data.url_project)
 
     if project_details_form.is_valid():
-      project_details_form.save()
+      project = project_details_form.save()
+      cached_list_task.spawnUpdateCachedItemsTask(project.key())
       return True
     else:
       return False
@@ -551,6 +553,7 @@ class AssignMentors(base.GSoCRequestHandler):
       project.mentors = mentor_keys
 
       db.put(project)
+      cached_list_task.spawnUpdateCachedItemsTask(project_key)
 
     db.run_in_transaction(assign_mentor_txn)
 
@@ -19,6 +19,8 @@ import logging
 
 from google.appengine.ext import db
 
+from melange.utils import cache
+
 from soc.modules.seeder.logic.seeder import logic as seeder_logic
 from soc.modules.seeder.models.configuration_sheet import DataSeederConfigurationSheet
 
@@ -37,6 +39,9 @@ def seed_model(configuration_sheet_key):
   model = seeder_logic.getModel(data)
 
   db.put(model)
+  # batch puts bypass put methods of the models, which invalidate
+  # cached program wide entities
+  cache.incrementVersion(cache.PROGRAM_CACHE_NAMESPACE)
 
   processBackReferences(model, data)
 
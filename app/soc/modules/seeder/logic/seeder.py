@@ -24,6 +24,8 @@ from google.appengine.ext import ndb
 
 from mapreduce.control import start_map
 
+from melange.utils import cache
+
 from soc.modules.seeder.logic.models import logic as seeder_models_logic
 from soc.modules.seeder.logic.providers import logic as seeder_providers_logic
 from soc.modules.seeder.logic.providers.provider import Error as provider_error
@@ -390,6 +392,9 @@ class Logic(object):
 
     debug("\nsaving...\n")
     db.put(result)
+    # batch puts bypass put methods of the models, which invalidate
+    # cached program wide entities
+    cache.incrementVersion(cache.PROGRAM_CACHE_NAMESPACE)
     debug("saved...\n")
     return result
 
@@ -19,6 +19,7 @@ from melange.request import initialize
 from melange.request import links
 from melange.request import render
 
+from soc.tasks import cached_list
 from soc.tasks import mailer
 from soc.views import legacy
 from soc.views import site
@@ -42,6 +43,7 @@ class Callback(object):
   def registerViews(self):
     """Instantiates all view objects."""
     self.views.append(legacy.Legacy())
+    self.views.append(cached_list.CachedListTask())
     self.views.append(mailer.MailerTask())
     self.views.append(
         site.EditSitePage(
@@ -0,0 +1,77 @@
+# Copyright 2014 the Melange authors.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Task to update items of cached lists after entities are written."""
+
+from google.appengine.api import taskqueue
+from google.appengine.ext import db
+from google.appengine.ext import ndb
+
+from django.conf.urls import url as django_url
+
+from melange.utils import lists
+
+from soc.tasks import responses
+from soc.tasks.helper import error_handler
+
+
+UPDATE_CACHED_ITEMS_URL = '/tasks/lists/update_cached_items'
+
+
+def spawnUpdateCachedItemsTask(entity_key):
+  """Spawns a new task that updates items related to the specified entity
+  in all cached lists.
+
+  If called in a transaction, the task is enqueued only if the transaction
+  succeeds.
+
+  Args:
+    entity_key: db.Key or ndb.Key of the entity which has been written.
+  """
+  if isinstance(entity_key, db.Key):
+    entity_key = ndb.Key.from_old_key(entity_key)
+
+  # Setting a countdown because the entity might not be stored to
+  # all the replicas yet.
+  new_task = taskqueue.Task(
+      params={'entity_key': entity_key.urlsafe()},
+      url=UPDATE_CACHED_ITEMS_URL, countdown=5)
+  new_task.add(
+      transactional=db.is_in_transaction() or ndb.in_transaction())
+
+
+class CachedListTask(object):
+  """Request handler for tasks that update cached lists."""
+
+  def djangoURLPatterns(self):
+    """Returns the URL patterns for the tasks in this module."""
+    return [
+        django_url(r'^tasks/lists/update_cached_items$',
+                   self.updateCachedItems, name='update_cached_items_task'),
+    ]
+
+  def updateCachedItems(self, request):
+    """Updates items related to an entity in all cached lists.
+
+    The POST request should contain the following entries:
+      entity_key: URL safe representation of the entity key.
+    """
+    entity_key = request.POST.get('entity_key')
+
+    if not entity_key:
+      return error_handler.logErrorAndReturnOK('No entity key specified')
+
+    lists.updateCachedItems(ndb.Key(urlsafe=entity_key))
+
+    return responses.terminateTask()
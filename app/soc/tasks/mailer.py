@@ -19,12 +19,14 @@ import logging
 
 from google.appengine.api import datastore_errors
 from google.appengine.api import mail
+from google.appengine.api import memcache
 from google.appengine.api import taskqueue
 from google.appengine.ext import db
 from google.appengine.ext import ndb
 from google.appengine.runtime.apiproxy_errors import OverQuotaError
 from google.appengine.runtime.apiproxy_errors import DeadlineExceededError
 
+from django import http
 from django.conf.urls import url as django_url
 
 from melange.appengine import system
@@ -40,6 +42,29 @@ from soc.tasks.helper import error_handler
 
 SEND_MAIL_URL = '/tasks/mail/send_mail'
 
+# Maximal number of emails which are sent out by a single task.
+MAIL_BATCH_SIZE = 50
+
+# Maximal length of JSON encoded contexts of emails which are stored in
+# a single batch. Entities are limited to 1MB, so some space is left
+# for the other properties.
+MAX_BATCH_CONTEXTS_LENGTH = 900 * 1024
+
+# Maximal number of tasks which may be enqueued in a single transaction.
+MAX_TRANSACTIONAL_TASKS = 5
+
+# Number of attempts to send an email from a batch after which it is dropped.
+MAX_SEND_ATTEMPTS = 5
+
+# Names of the counters which track throughput of the mailer.
+COUNTER_NAMES = ['queued', 'sent', 'retried', 'dropped']
+
+_COUNTERS_NAMESPACE = 'mailer_counters'
+
+# Django META key of the header with the number of previous attempts
+# to run a task.
+_TASK_RETRY_COUNT_HEADER = 'HTTP_X_APPENGINE_TASKRETRYCOUNT'
+
 
 def getMailContext(to, subject, html, sender=None, bcc=None):
   """Constructs a mail context for the specified arguments.
@@ -101,6 +126,183 @@ def getSpawnMailTaskTxn(context, parent=None, transactional=True):
   return txn
 
 
+def _groupEncodedContexts(encoded_contexts):
+  """Splits the specified JSON encoded contexts into groups which can be
+  stored in a single EmailBatch entity.
+
+  Each group consists of at most MAIL_BATCH_SIZE contexts whose total length
+  does not exceed MAX_BATCH_CONTEXTS_LENGTH. A context which is longer than
+  that on its own forms a separate group.
+
+  Args:
+    encoded_contexts: List of JSON encoded contexts.
+
+  Returns:
+    A list of lists of JSON encoded contexts.
+  """
+  groups = []
+  group = []
+  group_length = 0
+  for encoded_context in encoded_contexts:
+    # two additional characters are needed for a separator between contexts
+    context_length = len(encoded_context) + 2
+    if group and (len(group) == MAIL_BATCH_SIZE or
+        group_length + context_length > MAX_BATCH_CONTEXTS_LENGTH):
+      groups.append(group)
+      group = []
+      group_length = 0
+    group.append(encoded_context)
+    group_length += context_length
+
+  if group:
+    groups.append(group)
+  return groups
+
+
+def _createEmailBatches(contexts, parent=None):
+  """Returns EmailBatch entities for the specified mails.
+
+  Mails without any recipient are skipped.
+
+  Args:
+    contexts: List of dictionaries which describe the emails to send.
+    parent: Optional db.Key of the parent of all the batches.
+
+  Returns:
+    A tuple whose first element is a list of EmailBatch entities which have
+    not been stored yet and second element is the number of emails in them.
+  """
+  encoded_contexts = []
+  for context in contexts:
+    if not (context.get('to') or context.get('bcc')):
+      logging.debug("Not sending email: '%s'", context)
+    else:
+      encoded_contexts.append(json.dumps(context))
+
+  batch_entities = [
+      db_email_model.EmailBatch(
+          parent=parent, contexts='[%s]' % ', '.join(group),
+          attempts=[0] * len(group))
+      for group in _groupEncodedContexts(encoded_contexts)]
+  return batch_entities, len(encoded_contexts)
+
+
+def _getSendBatchTask(batch_entity):
+  """Returns a task which sends out the emails of the specified batch."""
+  # Setting a countdown because the batch entities might not be stored to
+  # all the replicas yet.
+  return taskqueue.Task(
+      params={'batch_key': str(batch_entity.key())},
+      url=SEND_MAIL_URL, countdown=5)
+
+
+def spawnMailTasks(contexts):
+  """Spawns new Tasks that send out emails with the given dictionaries.
+
+  Unlike getSpawnMailTaskTxn, the messages are stored in groups of at most
+  MAIL_BATCH_SIZE, each of which is sent out by a single task, and the
+  tasks are enqueued in batches rather than one by one. The tasks are not
+  enqueued transactionally.
+
+  Args:
+    contexts: List of dictionaries which describe the emails to send.
+
+  Returns:
+    Number of emails for which tasks have been spawned.
+  """
+  batch_entities, number_of_mails = _createEmailBatches(contexts)
+
+  queue = taskqueue.Queue('mail')
+  for i in xrange(0, len(batch_entities), taskqueue.MAX_TASKS_PER_ADD):
+    batch = batch_entities[i:i + taskqueue.MAX_TASKS_PER_ADD]
+    db.put(batch)
+    queue.add([_getSendBatchTask(batch_entity) for batch_entity in batch])
+
+  return number_of_mails
+
+
+def getSpawnMailTasksTxn(contexts):
+  """Returns a function which spawns new Tasks that send out emails with
+  the given dictionaries.
+
+  The function must be run in a cross-group transaction. The messages are
+  stored in groups, like by spawnMailTasks, but the tasks are enqueued
+  transactionally, so that they are sent out only if the transaction
+  succeeds. All the groups belong to a single new entity group, but at most
+  MAX_TRANSACTIONAL_TASKS tasks may be enqueued in a single transaction,
+  so the function should be used only for a few messages.
+
+  Args:
+    contexts: List of dictionaries which describe the emails to send.
+
+  Returns:
+    A function to run in a transaction.
+
+  Raises:
+    ValueError: if the messages do not fit in MAX_TRANSACTIONAL_TASKS groups.
+  """
+  first_id, _ = db.allocate_ids(
+      db.Key.from_path(db_email_model.EmailBatch.kind(), 1), 1)
+  parent = db.Key.from_path(db_email_model.EmailBatch.kind(), first_id)
+  batch_entities, number_of_mails = _createEmailBatches(
+      contexts, parent=parent)
+  if len(batch_entities) > MAX_TRANSACTIONAL_TASKS:
+    raise ValueError(
+        'Too many emails to send in a transaction: %s' % number_of_mails)
+
+  def txn():
+    """Transaction to ensure that tasks get enqueued for stored mails."""
+    if batch_entities:
+      db.put(batch_entities)
+      taskqueue.Queue('mail').add(
+          [_getSendBatchTask(batch_entity) for batch_entity in batch_entities],
+          transactional=True)
+
+  return txn
+
+
+def _incrementCounters(**deltas):
+  """Increments the mailer throughput counters by the specified values.
+
+  Args:
+    deltas: Mapping of counter names to the values by which they are
+      incremented.
+  """
+  deltas = dict((name, delta) for name, delta in deltas.iteritems() if delta)
+  if deltas:
+    memcache.offset_multi(
+        deltas, namespace=_COUNTERS_NAMESPACE, initial_value=0)
+
+
+def getCounters():
+  """Returns the current values of the mailer throughput counters.
+
+  The counters are kept in memcache, so they may be reset at any time and
+  should only be used to monitor the throughput of the mailer. Emails are
+  counted as queued when their batch is processed for the first time, so
+  that the counters are not changed by transactions which fail to commit.
+
+  Returns:
+    A dict mapping each name in COUNTER_NAMES to its value.
+  """
+  values = memcache.get_multi(COUNTER_NAMES, namespace=_COUNTERS_NAMESPACE)
+  return dict((name, values.get(name, 0)) for name in COUNTER_NAMES)
+
+
+def _getEmailMessage(context):
+  """Constructs an EmailMessage for the specified JSON decoded context.
+
+  Args:
+    context: Dictionary which describes the email to send.
+
+  Returns:
+    mail.EmailMessage object.
+  """
+  # If we don't do this python will complain about kwargs not being strings.
+  return mail.EmailMessage(
+      **dict((str(key), value) for key, value in context.iteritems()))
+
+
 class MailerTask(object):
   """Request handler for mailer.
   """
@@ -111,16 +313,33 @@ class MailerTask(object):
     return [
         django_url(r'^tasks/mail/send_mail$', self.sendMail,
                    name='send_email_task'),
+        django_url(r'^tasks/mail/counters$', self.showCounters,
+                   name='mail_counters'),
     ]
 
+  def showCounters(self, request):
+    """Returns the current values of the mailer throughput counters
+    as a JSON object.
+
+    The URLs of the tasks are available only to the administrators.
+    """
+    return http.HttpResponse(
+        content=json.dumps(getCounters()), content_type='application/json')
+
   def sendMail(self, request):
     """Sends out an email that is stored in the datastore.
 
-    The POST request should contain the following entries:
+    The POST request should contain one of the following entries:
       mail_key: Datastore key for an Email entity.
+      batch_key: Datastore key for an EmailBatch entity.
     """
     post_dict = request.POST
 
+    batch_key = post_dict.get('batch_key', None)
+    if batch_key:
+      retry_count = request.META.get(_TASK_RETRY_COUNT_HEADER, '0')
+      return self._sendMailBatch(batch_key, first_attempt=retry_count == '0')
+
     mail_key = post_dict.get('mail_key', None)
 
     if not mail_key:
@@ -175,3 +394,73 @@ class MailerTask(object):
 
     # mail successfully sent
     return responses.terminateTask()
+
+  def _sendMailBatch(self, batch_key, first_attempt=False):
+    """Sends out all the emails from the specified batch.
+
+    Each email is sent out separately. The ones which could not be sent
+    due to a transient error are kept in the batch and the task is
+    repeated, unless they have already failed MAX_SEND_ATTEMPTS times.
+    The batch is deleted once it is empty.
+
+    The batch is not processed in a transaction, so an email may be sent
+    more than once, if the task fails before the batch is updated.
+
+    Args:
+      batch_key: Datastore key for an EmailBatch entity.
+      first_attempt: Whether the task is run for the first time, in which
+        case the emails of the batch are counted as queued.
+    """
+    batch = db_email_model.EmailBatch.get(batch_key)
+    if not batch:
+      return error_handler.logErrorAndReturnOK(
+          'No email batch found for key %s' % batch_key)
+
+    contexts = json.loads(batch.contexts)
+    attempts = batch.attempts or [0] * len(contexts)
+
+    remaining_contexts = []
+    remaining_attempts = []
+    counts = dict.fromkeys(COUNTER_NAMES, 0)
+    if first_attempt:
+      counts['queued'] = len(contexts)
+    for index, (context, attempt) in enumerate(zip(contexts, attempts)):
+      message = _getEmailMessage(context)
+      try:
+        message.check_initialized()
+        message.send()
+        counts['sent'] += 1
+      except OverQuotaError:
+        # no further emails can be sent now, so all of the remaining ones
+        # are kept for the next attempt
+        remaining_contexts.extend(contexts[index:])
+        remaining_attempts.extend(attempts[index:])
+        counts['retried'] += len(contexts) - index
+        break
+      except DeadlineExceededError:
+        if attempt + 1 < MAX_SEND_ATTEMPTS:
+          remaining_contexts.append(context)
+          remaining_attempts.append(attempt + 1)
+          counts['retried'] += 1
+        else:
+          logging.error('Dropping email after %d attempts: "%s"',
+              MAX_SEND_ATTEMPTS, context.get('subject'))
+          counts['dropped'] += 1
+      except mail.Error as e:
+        # the message is not going to be sent successfully ever
+        logging.exception(e)
+        logging.error('This message could not be sent: "%s"',
+            context.get('subject'))
+        counts['dropped'] += 1
+
+    _incrementCounters(**counts)
+    logging.info('Email batch %s: %s', batch_key, counts)
+
+    if not remaining_contexts:
+      batch.delete()
+      return responses.terminateTask()
+    else:
+      batch.contexts = json.dumps(remaining_contexts)
+      batch.attempts = remaining_attempts
+      batch.put()
+      return responses.repeatTask()
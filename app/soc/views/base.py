@@ -133,6 +133,10 @@ class RequestHandler(object):
     """
     context = self.jsonContext(data, check, mutator)
 
+    # responses which are not JSON, like exported lists, are sent as they are
+    if isinstance(context, http.HttpResponse):
+      return context
+
     if isinstance(context, unicode) or isinstance(context, str):
       json_formatted_context = context
     else:
@@ -39,6 +39,7 @@ addPostButton(button_id, caption, url, bounds, keys,
 addPostEditButton(button_id, caption, url='', keys=None, refresh='current')
 """
 
+import csv
 import datetime
 import json
 import logging
@@ -47,15 +48,32 @@ from google.appengine.datastore import datastore_query
 from google.appengine.ext import db
 from google.appengine.ext import ndb
 
+from django import http
 from django.utils import dateformat
 from django.utils import html
 
+from melange.utils import iterables
+
 from soc.views.template import Template
 
 DATETIME_FORMAT = 'Y-m-d H:i:s'
 DATE_FORMAT = 'Y-m-d'
 BIRTHDATE_FORMAT = 'd-m-Y'
 
+# Default number of entities fetched from datastore in a single batch when
+# data for raw query based lists is retrieved
+DEFAULT_BATCH_SIZE = 100
+
+# Formats in which the whole content of a list may be exported
+CSV_EXPORT = 'csv'
+JSON_EXPORT = 'json'
+
+# Mapping of the export formats to MIME types of the exported content
+EXPORT_FORMATS = {
+    CSV_EXPORT: 'text/csv',
+    JSON_EXPORT: 'application/json',
+    }
+
 # These together form the valid Column Types
 # #ifihadenums
 PLAIN_TEXT = 'plain_text'
@@ -213,6 +231,18 @@ def getListIndex(request):
   return int(idx) if idx.isdigit() else -1
 
 
+def getExportFormat(request):
+  """Returns the format in which the whole content of the requested list
+  is to be exported.
+
+  Returns:
+    One of the formats defined in EXPORT_FORMATS or None, if the content
+    of the list is not to be exported.
+  """
+  export_format = request.GET.get('export')
+  return export_format if export_format in EXPORT_FORMATS else None
+
+
 class Prefetcher(object):
   """Class used to prefetch objects on list data construction.
 
@@ -352,6 +382,93 @@ class ListModelPrefetcher(Prefetcher):
     return [prefetched_lf], {}
 
 
+class RowRenderer(object):
+  """Renders rows of a list according to a plan which is precomputed from
+  a list configuration.
+
+  All the work which does not depend on a particular entity, like creating
+  column types or looking up column models, is done only once, when the plan
+  is compiled. The configuration is not modified while rows are rendered.
+  """
+
+  def __init__(self, config):
+    """Compiles a rendering plan for the specified configuration.
+
+    Args:
+      config: A ListConfiguration object.
+    """
+    self._columns = [
+        (col_id, func,
+            ColumnTypeFactory.create(config._col_map[col_id]['column_type']))
+        for col_id, func in config._col_functions.iteritems()]
+
+    self._row_operation_func = config._row_operation_func
+    self._button_functions = config._button_functions.items()
+
+    self._row_buttons = []
+    for col_id, buttons in config._row_buttons.iteritems():
+      column_row_buttons = [
+          (button_id, button_config,
+              config._row_button_functions[col_id][button_id])
+          for button_id, button_config in buttons.iteritems()]
+      self._row_buttons.append((col_id, column_row_buttons))
+
+  def render(self, entity, *args, **kwargs):
+    """Renders a row for a single entity.
+
+    Args:
+      entity: The entity to render.
+      args: The args passed to the render functions defined in the config.
+      kwargs: The kwargs passed to the render functions defined in the config.
+
+    Returns:
+      A dict with the rendered row.
+    """
+    columns = {}
+    for col_id, func, column_type in self._columns:
+      value = func(entity, *args, **kwargs)
+      if value is None:
+        value = ''
+      columns[col_id] = column_type.safe(value)
+
+    row = {}
+    if self._row_operation_func:
+      # perform the row operation function to retrieve the link
+      link = self._row_operation_func(entity, *args, **kwargs)
+      if link:
+        row['link'] = link
+
+    buttons = {}
+    for button_id, func in self._button_functions:
+      # The function called here should return a dictionary with 'link' and
+      # an optional 'caption' as keys.
+      buttons[button_id] = func(entity, *args, **kwargs)
+
+    row_buttons = {}
+    for col_id, column_row_buttons in self._row_buttons:
+      buttons_def = {}
+      for button_id, button_config, func in column_row_buttons:
+        link = func(entity)
+        if link:
+          # each row gets its own copy of the button configuration
+          parameters = dict(button_config['parameters'], link=link)
+          buttons_def[button_id] = dict(button_config, parameters=parameters)
+      row_buttons[col_id] = {
+          'buttons_def': buttons_def,
+          }
+
+    operations = {
+        'row': row,
+        'buttons': buttons,
+        'row_buttons': row_buttons
+    }
+
+    return {
+      'columns': columns,
+      'operations': operations,
+    }
+
+
 class ListConfiguration(object):
   """Resembles the configuration of a list. This object is sent to the client
   on page load.
@@ -383,6 +500,7 @@ class ListConfiguration(object):
     self._col_model = []
     self._col_map = {}
     self._col_functions = {}
+    self._col_dependencies = {}
     self._row_num = 50
     self._row_list = [5, 10, 20, 50, 100, 500, 1000]
     self.autowidth = True
@@ -457,7 +575,7 @@ class ListConfiguration(object):
 
   def _addColumn(self, col_id, name, func, width=None, resizable=True,
                 hidden=False, searchhidden=True, options=None,
-                column_type=PLAIN_TEXT):
+                column_type=PLAIN_TEXT, dependencies=None):
     """Adds a column to the end of the list.
 
     Args:
@@ -475,6 +593,11 @@ class ListConfiguration(object):
       searchhidden: Whether this column should be searchable when hidden.
       options: An array of (regexp, display_value) tuples.
       column_type: One of the types specified in ColumnType class.
+      dependencies: A function which takes an entity as its only argument
+            and returns a list of ndb keys of the entities that are needed
+            by func to render this column for that entity. The entities for
+            all rows in a batch are fetched in a single call before the rows
+            are rendered, so that func can get them from the context cache.
     """
     if self._col_functions.get(col_id):
       logging.warning('Column with id %s is already defined', col_id)
@@ -508,6 +631,39 @@ class ListConfiguration(object):
     self._col_map[col_id] = model
     self._col_names.append(name)
     self._col_functions[col_id] = func
+    if dependencies:
+      self._col_dependencies[col_id] = dependencies
+
+  def compile(self):
+    """Compiles a plan to render rows of the list with the current
+    configuration.
+
+    Returns:
+      A RowRenderer object.
+    """
+    return RowRenderer(self)
+
+  def prefetchDependencies(self, entities):
+    """Fetches all the entities on which the columns depend for
+    the specified entities.
+
+    All the keys returned by dependencies functions of the columns are
+    fetched in a single batch, so that the subsequent lookups of the keys
+    done by the column functions are served from ndb context cache.
+
+    Args:
+      entities: A list of entities for which the rows will be rendered.
+
+    Returns:
+      A dict mapping the dependency keys to the fetched entities.
+    """
+    keys = set()
+    for dependencies in self._col_dependencies.itervalues():
+      for entity in entities:
+        keys.update(key for key in dependencies(entity) if key)
+
+    keys = list(keys)
+    return dict(zip(keys, ndb.get_multi(keys))) if keys else {}
 
   def addPlainTextColumn(self, col_id, name, func, **kwargs):
     """Adds a plain text column to the end of the list.
@@ -1143,6 +1299,7 @@ class ListContentResponse(object):
     """
     self._request = request
     self._config = config
+    self._row_renderer = config.compile()
 
     self.__rows = []
 
@@ -1159,59 +1316,100 @@ class ListContentResponse(object):
       args: The args passed to the render functions defined in the config.
       kwargs: The kwargs passed to the render functions defined in the config.
     """
-    columns = {}
-    for col_id, func in self._config._col_functions.iteritems():
-      col_model = self._config._col_map.get(col_id, {})
+    self.__rows.append(self._row_renderer.render(entity, *args, **kwargs))
+
+  def content(self):
+    """Returns the object that should be parsed to JSON.
+    """
+    data = {self.start: self.__rows}
+    return {'data': data,
+            'next': self.next}
+
+
+class ListExportResponse(ListContentResponse):
+  """Class that builds the response for a request to export the whole content
+  of a list.
+
+  Instead of being kept as a list of rows and returned as JSON, the rendered
+  rows are written directly to the body of an HTTP response which is sent to
+  the user as a file once all the rows are added. Nothing is stored, so there
+  is nothing to be cleaned up after the download.
+  """
+
+  def __init__(self, request, config, export_format):
+    """Initializes the export response.
+
+    Args:
+      request: The HTTPRequest containing the request for data.
+      config: A ListConfiguration object.
+      export_format: One of the formats defined in EXPORT_FORMATS.
+    """
+    super(ListExportResponse, self).__init__(request, config)
+
+    self._export_format = export_format
+    self._columns = [
+        (model['name'], config._col_functions[model['name']],
+            ColumnTypeFactory.create(model['column_type']))
+        for model in config._col_model]
+
+    self._has_rows = False
+
+    self._response = http.HttpResponse(
+        content_type=EXPORT_FORMATS[export_format])
+    self._response['Content-Disposition'] = (
+        'attachment; filename="list.%s"' % export_format)
+
+    if self._export_format == CSV_EXPORT:
+      self._writeCsvRow(config._col_names)
+    else:
+      self._response.write('[')
+
+  def _writeCsvRow(self, values):
+    """Writes a single CSV formatted row to the response."""
+    csv.writer(self._response).writerow(
+        [unicode(value).encode('utf-8') for value in values])
+
+  def addRow(self, entity, *args, **kwargs):
+    """Renders a row for a single entity and writes it to the response.
+
+    Args:
+      entity: The entity to render.
+      args: The args passed to the render functions defined in the config.
+      kwargs: The kwargs passed to the render functions defined in the config.
+    """
+    values = []
+    for _, func, column_type in self._columns:
       value = func(entity, *args, **kwargs)
       if value is None:
         value = ''
-      column_type = ColumnTypeFactory.create(col_model['column_type'])
-      columns[col_id] = column_type.safe(value)
-
-    row = {}
-    buttons = {}
-    row_buttons = {}
-
-    if self._config._row_operation_func:
-      # perform the row operation function to retrieve the link
-      link = self._config._row_operation_func(entity, *args, **kwargs)
-      if link:
-        row['link'] = link
+      elif not isinstance(column_type, PlainTextColumnType):
+        # plain text values are exported as they are, without HTML escaping
+        value = column_type.safe(value)
+      values.append(value)
 
-    for button_id, func in self._config._button_functions.iteritems():
-      # The function called here should return a dictionary with 'link' and
-      # an optional 'caption' as keys.
-      buttons[button_id] = func(entity, *args, **kwargs)
+    if self._export_format == CSV_EXPORT:
+      self._writeCsvRow(values)
+    else:
+      if self._has_rows:
+        self._response.write(',')
+      row = dict((col_id, value) for (col_id, _, _), value
+          in zip(self._columns, values))
+      self._response.write(json.dumps(row, default=unicode))
 
-    for col_id, buttons in self._config._row_buttons.iteritems():
-      row_buttons[col_id] = {
-          'buttons_def': {},
-          }
-      for button_id, button_config in buttons.iteritems():
-        func = self._config._row_button_functions[col_id][button_id]
-        link = func(entity)
-        if link:
-          button_config['parameters']['link'] = link
-          row_buttons[col_id]['buttons_def'][button_id] = button_config
+    self._has_rows = True
 
-    operations = {
-        'row': row,
-        'buttons': buttons,
-        'row_buttons': row_buttons
-    }
+  def finish(self):
+    """Writes the end of the exported content.
 
-    data = {
-      'columns': columns,
-      'operations': operations,
-    }
-    self.__rows.append(data)
+    No more rows can be added after this method is called.
+    """
+    if self._export_format == JSON_EXPORT:
+      self._response.write(']')
+    self.next = 'done'
 
   def content(self):
-    """Returns the object that should be parsed to JSON.
-    """
-    data = {self.start: self.__rows}
-    return {'data': data,
-            'next': self.next}
+    """Returns the response which sends the exported content to the user."""
+    return self._response
 
 
 def collectKeys(prop, data):
@@ -1375,7 +1573,7 @@ class RawQueryContentResponseBuilder(object):
 
   def __init__(self, request, config, query, starter,
                ender=None, skipper=None, prefetcher=None,
-               row_adder=None):
+               row_adder=None, batch_size=DEFAULT_BATCH_SIZE):
     """Initializes the fields needed to built a response.
 
     Args:
@@ -1388,6 +1586,8 @@ class RawQueryContentResponseBuilder(object):
       skipper: The function used to determine whether to skip a value.
       prefetcher: A Prefetcher implementation that can be used
           for increased performance.
+      batch_size: Maximal number of entities that are fetched from datastore
+          in a single batch. If None, all entities are fetched at once.
     """
     if not ender:
       ender = lambda entity, is_last, next_cursor: (
@@ -1410,6 +1610,7 @@ class RawQueryContentResponseBuilder(object):
     self._skipper = skipper
     self._prefetcher = prefetcher
     self._row_adder = row_adder
+    self._batch_size = batch_size
 
   def build(self, *args, **kwargs):
     """Returns a ListContentResponse containing the data as indicated by the
@@ -1420,9 +1621,17 @@ class RawQueryContentResponseBuilder(object):
     The next variable will be defined as the key of the last entity returned,
     empty if there are no entities to return.
 
+    Entities are retrieved in batches of at most batch_size entities. The query
+    is run asynchronously, so that the next batch is fetched from datastore
+    while rows for the current one are prefetched and rendered.
+
     Args and Kwargs passed into this method will be passed along to
     _addEntity() method.
     """
+    export_format = getExportFormat(self._request)
+    if export_format:
+      return self.export(export_format, *args, **kwargs)
+
     content_response = ListContentResponse(self._request, self._config)
 
     start = content_response.start
@@ -1438,21 +1647,22 @@ class RawQueryContentResponseBuilder(object):
       return content_response
 
     count = content_response.limit + 1
-    entities = self._query.fetch(count)
-
-    is_last = len(entities) != count
-
-    extra_args, extra_kwargs = self._prefetcher.prefetch(entities)
-    args = list(args) + list(extra_args)
-    kwargs.update(extra_kwargs)
-
-    for entity in entities[0:content_response.limit]:
-      if self._skipper(entity, start):
-        continue
-      self._row_adder(content_response, entity, *args, **kwargs)
-
-    if entities:
-      content_response.next = self._ender(entities[-1], is_last, start)
+    batch_size = min(self._batch_size or count, count)
+    entities = self._query.run(limit=count, batch_size=batch_size)
+
+    fetched = 0
+    last_entity = None
+    for batch in iterables.iterBatches(entities, batch_size):
+      # the extra entity is only fetched to determine if it is the last batch
+      rows = batch[:max(content_response.limit - fetched, 0)]
+      fetched += len(batch)
+      last_entity = batch[-1]
+      self._addRows(content_response, rows, start, args, kwargs)
+
+    is_last = fetched != count
+
+    if fetched:
+      content_response.next = self._ender(last_entity, is_last, start)
     else:
       content_response.next = self._ender(None, True, start)
 
@@ -1467,9 +1677,17 @@ class RawQueryContentResponseBuilder(object):
     The next variable will be defined as the key of the last entity returned,
     empty if there are no entities to return.
 
+    Entities are retrieved in pages of at most batch_size entities. The next
+    page is requested asynchronously before rows for the current one are
+    prefetched and rendered, so that both operations overlap.
+
     Args and Kwargs passed into this method will be passed along to
     _addEntity() method.
     """
+    export_format = getExportFormat(self._request)
+    if export_format:
+      return self.export(export_format, *args, **kwargs)
+
     content_response = ListContentResponse(self._request, self._config)
 
     start = content_response.start
@@ -1479,26 +1697,91 @@ class RawQueryContentResponseBuilder(object):
       # return empty response
       return content_response
 
-    count = content_response.limit
+    remaining = content_response.limit
+    batch_size = self._batch_size or remaining
     cursor = datastore_query.Cursor(urlsafe=start) if start else None
 
-    entities, next_cursor, _ = self._query.fetch_page(
-        count, start_cursor=cursor)
+    future = self._query.fetch_page_async(
+        min(batch_size, remaining), start_cursor=cursor)
+
+    fetched = 0
+    next_cursor = None
+    more = False
+    while future:
+      entities, next_cursor, more = future.get_result()
+      fetched += len(entities)
+      remaining -= len(entities)
+
+      # start fetching the next page before the current one is processed
+      if entities and more and next_cursor and remaining > 0:
+        future = self._query.fetch_page_async(
+            min(batch_size, remaining), start_cursor=next_cursor)
+      else:
+        future = None
 
-    is_last = next_cursor is None
+      self._addRows(content_response, entities, start, args, kwargs)
 
-    extra_args, extra_kwargs = self._prefetcher.prefetch(entities)
-    args = list(args) + list(extra_args)
-    kwargs.update(extra_kwargs)
+    is_last = not more or next_cursor is None
 
-    for entity in entities:
-      if self._skipper(entity, start):
-        continue
-      self._row_adder(content_response, entity, *args, **kwargs)
-
-    if entities:
+    if fetched:
       content_response.next = self._ender(None, is_last, next_cursor)
     else:
       content_response.next = self._ender(None, True, None)
 
     return content_response
+
+  def export(self, export_format, *args, **kwargs):
+    """Returns a ListExportResponse containing all the data as indicated by
+    the query.
+
+    The whole query is iterated within this request, regardless of the start
+    and limit parameters. Entities are retrieved in batches and the next batch
+    is fetched asynchronously while rows for the current one are rendered.
+
+    Args and Kwargs passed into this method will be passed along to
+    _addEntity() method.
+
+    Args:
+      export_format: One of the formats defined in EXPORT_FORMATS.
+    """
+    export_response = ListExportResponse(
+        self._request, self._config, export_format)
+
+    batch_size = self._batch_size or DEFAULT_BATCH_SIZE
+    if isinstance(self._query, ndb.Query):
+      entities = self._query.iter(batch_size=batch_size)
+    else:
+      entities = self._query.run(batch_size=batch_size)
+
+    for batch in iterables.iterBatches(entities, batch_size):
+      self._addRows(export_response, batch, '', args, kwargs)
+
+    export_response.finish()
+    return export_response
+
+  def _addRows(self, content_response, entities, start, args, kwargs):
+    """Adds rows for the specified entities to the specified response.
+
+    Dependencies of the list columns and data of the prefetcher are retrieved
+    for all the entities at once before any rows are added.
+
+    Args:
+      content_response: ListContentResponse to which the rows are added.
+      entities: List of entities for which to add rows.
+      start: The start value of the request for data.
+      args: List of positional arguments passed to the row adder.
+      kwargs: Dict of keyword arguments passed to the row adder.
+    """
+    if not entities:
+      return
+
+    self._config.prefetchDependencies(entities)
+    extra_args, extra_kwargs = self._prefetcher.prefetch(entities)
+    row_args = list(args) + list(extra_args)
+    row_kwargs = dict(kwargs)
+    row_kwargs.update(extra_kwargs)
+
+    for entity in entities:
+      if self._skipper(entity, start):
+        continue
+      self._row_adder(content_response, entity, *row_args, **row_kwargs)
@@ -23,8 +23,8 @@ from django.core import urlresolvers
 
 from melange import types
 from melange.appengine import system
+from melange.logic import identity as identity_logic
 from melange.logic import profile as profile_logic
-from melange.logic import settings as settings_logic
 from melange.logic import user as ndb_user_logic
 from melange.models import connection as connection_model
 from melange.models import profile as ndb_profile
@@ -36,7 +36,6 @@ from melange.views.helper import urls
 
 from soc.logic import program as program_logic
 from soc.logic import site as site_logic
-from soc.logic import user as user_logic
 from soc.models import document as document_model
 from soc.models import program as program_model
 from soc.models import site as site_model
@@ -224,6 +223,8 @@ class RequestData(object):
     self._redirect = self._unset
     self._site = self._unset
     self._sponsor = self._unset
+    self._program_sponsor = self._unset
+    self._identity = self._unset
     self._user = self._unset
     self._ndb_user = self._unset
     self._profile = self._unset
@@ -346,31 +347,46 @@ class RequestData(object):
         # to also be provided at some point of request's life cycle.
         sponsor_key = program_logic.getSponsorKey(self.program)
 
-      self._sponsor = sponsor_model.Sponsor.get(sponsor_key)
+      # the sponsor of the program may have already been fetched together
+      # with other program wide fields
+      if (self._isSet(self._program_sponsor) and self._program_sponsor and
+          self._program_sponsor.key() == sponsor_key):
+        self._sponsor = self._program_sponsor
+      else:
+        self._sponsor = sponsor_model.Sponsor.get(sponsor_key)
 
     return self._sponsor
 
+  def _getIdentity(self):
+    """Returns identity of the currently logged in user.
+
+    Users and their profiles for the program specified in the URL are
+    resolved together, so that all of them are fetched in a single database
+    round-trip. Profiles are not fetched for requests which do not specify
+    a program, as most of them do not need any profile.
+    """
+    if not self._isSet(self._identity):
+      if self.kwargs.get('sponsor') and self.kwargs.get('program'):
+        program_key = self._getProgramKey()
+      else:
+        program_key = None
+      self._identity = identity_logic.getCurrentIdentity(
+          program_key=program_key, models=self.models, use_cache=True)
+    return self._identity
+
   @property
   def user(self):
     """Returns the user field."""
     if not self._isSet(self._user):
-      self._user = user_logic.current()
-
-      # developer may view the page as another user
-      if self._user and user_logic.isDeveloper(user=self._user):
-        settings = settings_logic.getUserSettings(
-            ndb.Key.from_old_key(self._user.key()))
-        if settings.view_as is not None:
-          user = user_model.User.get(settings.view_as.to_old_key())
-          if user:
-            self._user = user
-          else:
-            # TODO(daniel): use main LINKER object when merged
-            linker = links.Linker()
-            user_settings_url = linker.user(
-                self._user, urls.UrlNames.USER_SETTINGS)
-            raise exception.BadRequest(
-                message=VIEW_AS_USER_DOES_NOT_EXIST % user_settings_url)
+      identity = self._getIdentity()
+      if identity.view_as_missing and identity.view_as_user:
+        # TODO(daniel): use main LINKER object when merged
+        linker = links.Linker()
+        user_settings_url = linker.user(
+            identity.view_as_user, urls.UrlNames.USER_SETTINGS)
+        raise exception.BadRequest(
+            message=VIEW_AS_USER_DOES_NOT_EXIST % user_settings_url)
+      self._user = identity.user
 
     return self._user
 
@@ -378,21 +394,13 @@ class RequestData(object):
   def ndb_user(self):
     """Returns the ndb_user field."""
     if not self._isSet(self._ndb_user):
-      self._ndb_user = ndb_user_logic.getByCurrentAccount()
-      # TODO(daniel): add support for "Logged in as" feature
-
-      # developer may view the page as another user
-      if self._ndb_user and users.is_current_user_admin():
-        settings = settings_logic.getUserSettings(self._ndb_user.key)
-        if settings.view_as is not None:
-          user = settings.view_as.get()
-          if user:
-            self._ndb_user = user
-          else:
-            user_settings_url = links.LINKER.user(
-                self._ndb_user, urls.UrlNames.USER_SETTINGS)
-            raise exception.BadRequest(
-                message=VIEW_AS_USER_DOES_NOT_EXIST % user_settings_url)
+      identity = self._getIdentity()
+      if identity.view_as_missing and identity.view_as_ndb_user:
+        user_settings_url = links.LINKER.user(
+            identity.view_as_ndb_user, urls.UrlNames.USER_SETTINGS)
+        raise exception.BadRequest(
+            message=VIEW_AS_USER_DOES_NOT_EXIST % user_settings_url)
+      self._ndb_user = identity.ndb_user
     return self._ndb_user
 
   @property
@@ -401,6 +409,8 @@ class RequestData(object):
     if not self._isSet(self._profile):
       if not self.user or not self.program:
         self._profile = None
+      elif self._getIdentity().program_key == self.program.key():
+        self._profile = self._getIdentity().profile
       else:
         key_name = '%s/%s' % (self.program.key().name(), self.user.link_id)
         self._profile = self.models.profile_model.get_by_key_name(
@@ -413,6 +423,8 @@ class RequestData(object):
     if not self._isSet(self._ndb_profile):
       if not self.ndb_user or not self.program:
         self._ndb_profile = None
+      elif self._getIdentity().program_key == self.program.key():
+        self._ndb_profile = self._getIdentity().ndb_profile
       else:
         sponsor_id = program_model.getSponsorId(self.program.key())
         program_id = program_model.getProgramId(self.program.key())
@@ -739,20 +751,33 @@ class RequestData(object):
       raise exception.BadRequest(
           message='The request does not contain full profile data.')
 
-  def _getProgramWideFields(self):
-    """Fetches program wide fields in a single database round-trip."""
-    keys = []
+  def _getProgramKey(self):
+    """Returns key of the program for the request without fetching
+    the program itself.
 
-    # add program's key
-    if self.kwargs.get('sponsor') and self.kwargs.get('program'):
+    The program is specified in the URL or, if it is not, the active program
+    of the site is used.
+    """
+    if self._isSet(self._program) and self._program:
+      return self._program.key()
+    elif self.kwargs.get('sponsor') and self.kwargs.get('program'):
       program_key_name = "%s/%s" % (
           self.kwargs['sponsor'], self.kwargs['program'])
-      program_key = db.Key.from_path(
+      return db.Key.from_path(
           self.models.program_model.kind(), program_key_name)
     else:
-      program_key = site_model.Site.active_program.get_value_for_datastore(
+      return site_model.Site.active_program.get_value_for_datastore(
           self.site)
-      program_key_name = program_key.name()
+
+  def _getProgramWideFields(self):
+    """Fetches program wide fields from the cache or, if they are not cached,
+    in a single database round-trip.
+    """
+    keys = []
+
+    # add program's key
+    program_key = self._getProgramKey()
+    program_key_name = program_key.name()
     keys.append(program_key)
 
     # add timeline's key
@@ -764,7 +789,8 @@ class RequestData(object):
         self.models.program_model.prefix, program_key_name)
     keys.append(db.Key.from_path('OrgAppSurvey', org_app_key_name))
 
-    self._program, self._program_timeline, self._org_app = db.get(keys)
+    (self._program, self._program_timeline, self._org_app,
+        self._program_sponsor) = program_logic.getProgramWideEntities(*keys)
 
     # raise an exception if no program is found
     if not self._program:
@@ -17,6 +17,7 @@
 from google.appengine.ext import db
 
 from melange.request import access
+from melange.utils import cache
 
 
 class CreateProgramPage(object):
@@ -55,6 +56,9 @@ class CreateProgramPage(object):
       program = form.create(key_name=key_name, commit=False)
 
       db.put([timeline, program])
+      # batch puts bypass put methods of the models, which invalidate
+      # cached program wide entities
+      cache.incrementVersion(cache.PROGRAM_CACHE_NAMESPACE)
 
       # TODO(nathaniel): Make this .program() call unnecessary.
       data.redirect.program(program=program)
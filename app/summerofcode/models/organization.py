@@ -45,6 +45,10 @@ class SOCOrganization(org_model.Organization):
   #: if the total number of slots was unlimited.
   slot_request_max = ndb.IntegerProperty(default=0)
 
+  #: Number of proposals which have been accepted for the organization.
+  #: It is None, if the number has not been counted yet.
+  number_of_accepted_proposals = ndb.IntegerProperty(indexed=False)
+
   #: Maximal number of points that can be given to a proposal by mentors.
   max_score = ndb.IntegerProperty(default=5)
 
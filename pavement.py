@@ -120,7 +120,8 @@ BUILD_BUNCH = easy.Bunch(
     overrides_files=OVERRIDES_FILES,
     skip_closure=False,
     skip_docs=False,
-    skip_pylint=False)
+    skip_pylint=False,
+    skip_template_bundle=False)
 
 PYLINT_APP_FOLDER_MODULES = [
     'codein',
@@ -280,6 +281,7 @@ def pylint(options):
     ('app-folder=', 'a', 'App folder directory (default /app)'),
     ('skip-pylint', 's', 'Skip PyLint checker'),
     ('skip-docs', '', 'Skip documentation creation'),
+    ('skip-template-bundle', '', 'Skip building the template bundle'),
     ('ignore-pylint', 'i', 'Ignore results of PyLint (but run it anyway)'),
     ('verbose-pylint', 'v', 'Make PyLint run verbosely'),
 ])
@@ -310,6 +312,10 @@ def build(options):
   # Make the necessary symlinks between the app and build directories.
   build_symlinks(options)
 
+  # Bundle all the templates, so that they are loaded from a single file
+  if not options.skip_template_bundle:
+    build_template_bundle(options)
+
   # Handle overrides
   overrides(options)
 
@@ -350,6 +356,18 @@ def build_symlinks(options):
         lambda: symlink(target, link.abspath()))
 
 
+@easy.task
+@easy.cmdopts([
+    ('app-build=', 'b', 'App build directory (default /build)'),
+])
+def build_template_bundle(options):
+  """Build the bundle of all the templates in the build folder."""
+  bundle_path = path.path(options.app_build) / 'templates.bundle'
+  easy.sh('%s %s %s' % (
+      sys.executable, PROJECT_DIR / 'scripts' / 'build_template_bundle.py',
+      bundle_path))
+
+
 @easy.task
 def build_css(options):
   """Compiles the css files into one."""
@@ -0,0 +1,134 @@
+#!/usr/bin/env python
+#
+# Copyright 2014 the Melange authors.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""benchmark_startup.py [-n RUNS] [PATH ...]
+
+A script to measure cold start time of an instance with and without lazy
+registration of callback modules.
+
+Each run starts a fresh interpreter which sets up the core the same way as
+main.real_main does and resolves the specified path, as the first request
+served by a new instance would. The reported time includes all imports
+done by the interpreter.
+
+Arguments:
+  PATH: paths to resolve, without the leading slash, e.g.
+      tasks/mail/send_mail (default) or gsoc/homepage/google/gsoc2014
+"""
+
+import os
+import subprocess
+import sys
+import time
+from optparse import OptionParser
+
+
+HERE = os.path.normpath(os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                     '..'))
+APPENGINE_LOCATION = os.path.join(HERE, 'thirdparty', 'google_appengine')
+EXTRA_PATHS = [
+    os.path.join(APPENGINE_LOCATION, 'lib', 'django-1.5'),
+    os.path.join(APPENGINE_LOCATION, 'lib', 'yaml', 'lib'),
+    os.path.join(APPENGINE_LOCATION, 'lib', 'antlr3'),
+    APPENGINE_LOCATION,
+    os.path.join(HERE, 'app'),
+    ]
+
+DEFAULT_PATHS = ['tasks/mail/send_mail']
+
+MODES = ['eager', 'lazy']
+
+
+def startInstance(mode, path):
+  """Sets up the core of a new instance and resolves the specified path.
+
+  Args:
+    mode: 'lazy' if callback modules should be registered lazily,
+        'eager' otherwise.
+    path: the path to resolve.
+  """
+  sys.path[0:0] = EXTRA_PATHS
+
+  from google.appengine.ext import testbed
+  instance_testbed = testbed.Testbed()
+  instance_testbed.activate()
+  instance_testbed.init_datastore_v3_stub()
+  instance_testbed.init_memcache_stub()
+
+  import gae_django  # pylint: disable=unused-import
+
+  from django.core import urlresolvers
+
+  from soc.modules import callback
+  from soc.modules import core
+
+  import settings
+
+  callback.registerCore(core.Core())
+  if mode == 'lazy':
+    callback.getCore().registerLazyModuleCallbacks(
+        settings.CALLBACK_MODULE_NAMES, settings.CALLBACK_MODULE_URL_PREFIXES)
+  else:
+    callback.getCore().registerModuleCallbacks(settings.CALLBACK_MODULE_NAMES)
+  callback.getCore().initialize()
+
+  urlresolvers.resolve('/' + path)
+
+
+def measure(mode, path, runs):
+  """Measures cold start time of instances in the specified mode.
+
+  Args:
+    mode: 'lazy' if callback modules should be registered lazily,
+        'eager' otherwise.
+    path: the path to resolve.
+    runs: the number of instances to start.
+
+  Returns:
+    A sorted list of start times in seconds.
+  """
+  times = []
+  for _ in range(runs):
+    start = time.time()
+    subprocess.check_call(
+        [sys.executable, os.path.abspath(__file__), '--child', mode, path])
+    times.append(time.time() - start)
+  return sorted(times)
+
+
+def main():
+  parser = OptionParser(usage=__doc__)
+  parser.add_option('-n', '--runs', dest='runs', type='int', default=5,
+                    help='number of instances started for each mode')
+  parser.add_option('--child', dest='child', choices=MODES,
+                    help=('start a single instance in the specified mode; '
+                          'used internally'))
+  options, args = parser.parse_args()
+
+  if options.child:
+    startInstance(options.child, args[0])
+    return
+
+  for path in args or DEFAULT_PATHS:
+    print '/%s' % path
+    for mode in MODES:
+      times = measure(mode, path, options.runs)
+      print '  %-5s min %.3fs  median %.3fs  max %.3fs' % (
+          mode, times[0], times[len(times) / 2], times[-1])
+
+
+if __name__ == '__main__':
+  main()
@@ -0,0 +1,168 @@
+#!/usr/bin/env python
+#
+# Copyright 2014 the Melange authors.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""benchmark_templates.py [-n REQUESTS]
+
+A script to measure time spent on loading templates of the heaviest pages
+with different configurations of template loaders.
+
+Templates of a page are the ones referenced by its view modules together
+with all the templates they extend or include. For each configuration, the
+first request and the average of the following requests are reported,
+as all the templates of the page are loaded for each request.
+"""
+
+import os
+import re
+import sys
+import tempfile
+import time
+from optparse import OptionParser
+
+
+HERE = os.path.normpath(os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                     '..'))
+APPENGINE_LOCATION = os.path.join(HERE, 'thirdparty', 'google_appengine')
+APP_LOCATION = os.path.join(HERE, 'app')
+EXTRA_PATHS = [
+    os.path.join(APPENGINE_LOCATION, 'lib', 'django-1.5'),
+    APPENGINE_LOCATION,
+    APP_LOCATION,
+    ]
+
+# Names of the pages together with paths of their view modules.
+PAGES = [
+    ('GSoC dashboard', ['soc/modules/gsoc/views/dashboard.py']),
+    ('GSoC proposal review', ['soc/modules/gsoc/views/proposal_review.py']),
+    ]
+
+_FILE_SYSTEM_LOADERS = (
+    'django.template.loaders.filesystem.Loader',
+    'django.template.loaders.app_directories.Loader',
+    )
+
+LOADER_CONFIGURATIONS = [
+    ('uncached', _FILE_SYSTEM_LOADERS),
+    ('cached', (
+        ('django.template.loaders.cached.Loader', _FILE_SYSTEM_LOADERS),)),
+    ('bundle', (
+        ('django.template.loaders.cached.Loader',
+            ('melange.utils.template_loader.BundleLoader',) +
+            _FILE_SYSTEM_LOADERS),)),
+    ]
+
+_TEMPLATE_PATH_PATTERN = re.compile(r"""['"]([\w/]+\.html)['"]""")
+
+_TEMPLATE_REFERENCE_PATTERN = re.compile(
+    r"""{%\s*(?:extends|include)\s+['"]([^'"]+)['"]""")
+
+
+def getPageTemplates(view_modules):
+  """Returns names of all the templates of a page.
+
+  Args:
+    view_modules: List of paths of the view modules of the page.
+
+  Returns:
+    A sorted list of template names.
+  """
+  from django import template
+  from django.template import loader
+
+  file_system_loader = loader.find_template_loader(_FILE_SYSTEM_LOADERS[0])
+
+  template_names = set()
+  for view_module in view_modules:
+    with open(os.path.join(APP_LOCATION, view_module)) as view_file:
+      template_names.update(_TEMPLATE_PATH_PATTERN.findall(view_file.read()))
+
+  templates_to_visit = list(template_names)
+  while templates_to_visit:
+    template_name = templates_to_visit.pop()
+    try:
+      source, _ = file_system_loader.load_template_source(template_name)
+    except template.TemplateDoesNotExist:
+      # the string only looks like a name of a template
+      template_names.remove(template_name)
+      continue
+
+    for template_name in _TEMPLATE_REFERENCE_PATTERN.findall(source):
+      if template_name not in template_names:
+        template_names.add(template_name)
+        templates_to_visit.append(template_name)
+  return sorted(template_names)
+
+
+def loadTemplates(template_names):
+  """Loads all the specified templates and returns the time it took.
+
+  Args:
+    template_names: List of names of templates to load.
+
+  Returns:
+    Time in seconds.
+  """
+  from django.template import loader
+
+  start = time.time()
+  for template_name in template_names:
+    loader.get_template(template_name)
+  return time.time() - start
+
+
+def main():
+  parser = OptionParser(usage=__doc__)
+  parser.add_option('-n', '--requests', dest='requests', type='int',
+                    default=20, help='number of requests for each page')
+  options, _ = parser.parse_args()
+
+  sys.path[0:0] = EXTRA_PATHS
+  os.environ.setdefault('SERVER_SOFTWARE', 'Benchmark')
+  os.environ['DJANGO_SETTINGS_MODULE'] = 'settings'
+
+  from django.conf import settings
+  from django.template import loader
+
+  from melange.utils import template_loader
+
+  bundle_file, settings.TEMPLATE_BUNDLE_PATH = tempfile.mkstemp()
+  os.close(bundle_file)
+  try:
+    template_loader.buildBundle(
+        settings.TEMPLATE_DIRS, settings.TEMPLATE_BUNDLE_PATH)
+
+    for page_name, view_modules in PAGES:
+      template_names = getPageTemplates(view_modules)
+      print '%s (%d templates)' % (page_name, len(template_names))
+
+      for configuration_name, template_loaders in LOADER_CONFIGURATIONS:
+        # start with no loaders, as a new instance would
+        settings.TEMPLATE_LOADERS = template_loaders
+        loader.template_source_loaders = None
+
+        first_request = loadTemplates(template_names)
+        other_requests = [
+            loadTemplates(template_names)
+            for _ in range(options.requests - 1)]
+        average = sum(other_requests) / max(len(other_requests), 1)
+        print '  %-8s first request %.4fs  other requests %.4fs' % (
+            configuration_name, first_request, average)
+  finally:
+    os.remove(settings.TEMPLATE_BUNDLE_PATH)
+
+
+if __name__ == '__main__':
+  main()
@@ -0,0 +1,62 @@
+#!/usr/bin/env python
+#
+# Copyright 2014 the Melange authors.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""build_template_bundle.py [BUNDLE_PATH]
+
+A script to build a bundle of all the templates from TEMPLATE_DIRS of
+the application, so that they are loaded from a single file by instances.
+All the templates are parsed and the ones which are invalid are reported
+as warnings and skipped, so that they do not fail the build.
+
+Arguments:
+  BUNDLE_PATH: the path of the bundle to write
+      (default settings.TEMPLATE_BUNDLE_PATH)
+"""
+
+import os
+import sys
+
+
+HERE = os.path.normpath(os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                     '..'))
+APPENGINE_LOCATION = os.path.join(HERE, 'thirdparty', 'google_appengine')
+EXTRA_PATHS = [
+    os.path.join(APPENGINE_LOCATION, 'lib', 'django-1.5'),
+    APPENGINE_LOCATION,
+    os.path.join(HERE, 'app'),
+    ]
+
+
+def main(args):
+  sys.path[0:0] = EXTRA_PATHS
+  os.environ.setdefault('SERVER_SOFTWARE', 'Build')
+  os.environ['DJANGO_SETTINGS_MODULE'] = 'settings'
+
+  from django.conf import settings
+
+  from melange.utils import template_loader
+
+  bundle_path = args[0] if args else settings.TEMPLATE_BUNDLE_PATH
+  errors = template_loader.buildBundle(settings.TEMPLATE_DIRS, bundle_path)
+  for template_name, error in errors:
+    print >> sys.stderr, 'WARNING: skipped %s: %s' % (template_name, error)
+
+  print 'Template bundle written to %s' % bundle_path
+  return 0
+
+
+if __name__ == '__main__':
+  sys.exit(main(sys.argv[1:]))
@@ -147,3 +147,81 @@ class AddFilterToQueryTest(unittest.TestCase):
     self.assertSetEqual(
         set(entity.key() for entity in query.fetch(10)),
         set([self.key2, self.key3]))
+
+
+class GetQueryFilterTest(unittest.TestCase):
+  """Unit tests for getQueryFilter function."""
+
+  class TestModel(db.Model):
+    """Test db model class."""
+    foo = db.IntegerProperty()
+    bar = db.StringListProperty()
+    owner = db.ReferenceProperty()
+
+  class TestNDBModel(ndb.Model):
+    """Test ndb model class."""
+    foo = ndb.IntegerProperty()
+    bar = ndb.StringProperty(repeated=True)
+    owner = ndb.KeyProperty()
+
+  def setUp(self):
+    """See unittest.TestCase.setUp for specification."""
+    self.owner = GetQueryFilterTest.TestModel(foo=0).put()
+    self.entities = []
+    self.ndb_entities = []
+    for i in range(4):
+      owner = self.owner if i % 2 else None
+      self.entities.append(GetQueryFilterTest.TestModel(
+          foo=i, bar=['a%s' % i, 'b'], owner=owner))
+      self.ndb_entities.append(GetQueryFilterTest.TestNDBModel(
+          foo=i, bar=['a%s' % i, 'b'],
+          owner=ndb.Key.from_old_key(owner) if owner else None))
+    db.put(self.entities)
+    ndb.put_multi(self.ndb_entities)
+
+  def _assertMatchesDatastore(self, query, entities, fetched_keys):
+    """Asserts that in-memory evaluation of a query gives the same results
+    as datastore.
+    """
+    query_filter = melange_db.getQueryFilter(query)
+    self.assertIsNotNone(query_filter)
+    for entity in entities:
+      key = entity.key if isinstance(entity, ndb.Model) else entity.key()
+      self.assertEqual(key in fetched_keys, query_filter.matches(entity))
+
+  def testForDBQuery(self):
+    """Tests that filters of db queries are evaluated correctly."""
+    model = GetQueryFilterTest.TestModel
+    queries = [
+        model.all().filter('foo', 2),
+        model.all().filter('foo >=', 1).filter('foo <', 3),
+        model.all().filter('bar', 'a1'),
+        model.all().filter('bar', 'b').filter('owner', self.owner),
+        model.all().filter('__key__', self.entities[3].key()),
+        ]
+    for query in queries:
+      fetched_keys = set(entity.key() for entity in query.fetch(10))
+      self._assertMatchesDatastore(query, self.entities, fetched_keys)
+
+  def testForNDBQuery(self):
+    """Tests that filters of ndb queries are evaluated correctly."""
+    model = GetQueryFilterTest.TestNDBModel
+    owner = ndb.Key.from_old_key(self.owner)
+    queries = [
+        model.query(model.foo == 2),
+        model.query(model.foo >= 1, model.foo < 3),
+        model.query(model.bar == 'a1'),
+        model.query(model.bar == 'b', model.owner == owner),
+        ]
+    for query in queries:
+      fetched_keys = set(query.fetch(10, keys_only=True))
+      self._assertMatchesDatastore(query, self.ndb_entities, fetched_keys)
+
+  def testForUnsupportedQueries(self):
+    """Tests that None is returned for queries with disjunctions."""
+    query = GetQueryFilterTest.TestModel.all().filter('foo IN', [1, 2])
+    self.assertIsNone(melange_db.getQueryFilter(query))
+
+    model = GetQueryFilterTest.TestNDBModel
+    query = model.query(model.foo.IN([1, 2]))
+    self.assertIsNone(melange_db.getQueryFilter(query))
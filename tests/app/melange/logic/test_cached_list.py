@@ -17,6 +17,8 @@
 import datetime
 import unittest
 
+from google.appengine.ext import ndb
+
 from melange import key_column_id_const
 from melange.logic import cached_list as cached_list_logic
 from melange.models import cached_list as cached_list_model
@@ -41,9 +43,9 @@ class TestCacheItems(unittest.TestCase):
     new_item3 = {KEY: 'three', 'name': 'baz'}
     cached_list_logic.setCacheItems(
         'foo_list', [new_item1, new_item2, new_item3])
-    cached_list = cached_list_model.CachedList.query().get()
-    self.assertIn(new_item1, cached_list.list_data)
-    self.assertIn(new_item2, cached_list.list_data)
+    cached_items = cached_list_logic.getCachedItems('foo_list')
+    self.assertIn(new_item1, cached_items)
+    self.assertIn(new_item2, cached_items)
 
   def testUpdatingAfterCaching(self):
     """Tests whether cached list state is updated."""
@@ -72,8 +74,36 @@ class TestCacheItems(unittest.TestCase):
     expected_list = [item1, item2, item3]
 
     cached_list_logic.setCacheItems('test_list', list_with_duplicates)
+    self.assertListEqual(
+        cached_list_logic.getCachedItems('test_list'), expected_list)
+
+  def testItemsAreStoredInPages(self):
+    """Tests that items are split into pages of the specified size."""
+    items = [{KEY: i} for i in range(cached_list_logic.PAGE_SIZE * 2 + 1)]
+    cached_list_logic.setCacheItems('test_list', items)
+
+    cached_list = cached_list_model.CachedList.get_by_id('test_list')
+    self.assertEqual(cached_list.no_of_items, len(items))
+    self.assertEqual(cached_list.no_of_pages, 3)
+    self.assertListEqual(cached_list.list_data, [])
+
+    pages = cached_list_model.CachedListPage.query(
+        ancestor=cached_list.key).fetch(10)
+    self.assertEqual(len(pages), 3)
+
+  def testStalePagesAreRemoved(self):
+    """Tests that pages are removed when a list shrinks."""
+    items = [{KEY: i} for i in range(cached_list_logic.PAGE_SIZE * 2 + 1)]
+    cached_list_logic.setCacheItems('test_list', items)
+    cached_list_logic.setCacheItems('test_list', items[:1])
+
     cached_list = cached_list_model.CachedList.get_by_id('test_list')
-    self.assertListEqual(cached_list.list_data, expected_list)
+    self.assertEqual(cached_list.no_of_pages, 1)
+    pages = cached_list_model.CachedListPage.query(
+        ancestor=cached_list.key).fetch(10)
+    self.assertEqual(len(pages), 1)
+    self.assertListEqual(
+        cached_list_logic.getCachedItems('test_list'), items[:1])
 
 
 class TestGetCachedItems(unittest.TestCase):
@@ -125,6 +155,42 @@ class TestGetCachedItems(unittest.TestCase):
       cached_list_logic.getCachedItems('none_existent', 0, 1)
 
 
+class TestGetCachedItemsFromPages(unittest.TestCase):
+  """Tests getCachedItems function for lists stored in pages."""
+
+  def setUp(self):
+    self.items = [
+        {KEY: i} for i in range(cached_list_logic.PAGE_SIZE * 3 + 7)]
+    cached_list_logic.setCacheItems('test_list', self.items)
+
+  def testRetrievingAllItems(self):
+    """Tests that all items are returned when no limit is specified."""
+    self.assertListEqual(
+        self.items, cached_list_logic.getCachedItems('test_list'))
+
+  def testRetrievingItemsAcrossPages(self):
+    """Tests that a slice which spans more pages is returned."""
+    start = cached_list_logic.PAGE_SIZE - 5
+    cached_items = cached_list_logic.getCachedItems('test_list', start, 10)
+    self.assertListEqual(self.items[start:start + 10], cached_items)
+
+  def testRetrievingFromLastPage(self):
+    """Tests that items from the last, incomplete page are returned."""
+    start = cached_list_logic.PAGE_SIZE * 3
+    cached_items = cached_list_logic.getCachedItems('test_list', start, 100)
+    self.assertListEqual(self.items[start:], cached_items)
+
+  def testRetrievingWithOverSpecifiedStart(self):
+    cached_items = cached_list_logic.getCachedItems(
+        'test_list', len(self.items), 3)
+    self.assertListEqual([], cached_items)
+
+  def testGetNumberOfItems(self):
+    """Tests getNumberOfItems function."""
+    self.assertEqual(
+        len(self.items), cached_list_logic.getNumberOfItems('test_list'))
+
+
 class TestIsCachedListExists(unittest.TestCase):
   """Unit tests for isCachedListExists function."""
 
@@ -201,4 +267,211 @@ class TestCreateEmptyProcessingList(unittest.TestCase):
     cached_list_logic.createEmptyProcessingList('empty_processing_list')
     test_list = cached_list_model.CachedList.get_by_id('empty_processing_list')
     self.assertListEqual([], test_list.list_data)
+    self.assertEqual(0, test_list.no_of_items)
     self.assertTrue(test_list.is_processing)
+
+
+class TestGetCachedListState(unittest.TestCase):
+  """Unit tests for getCachedListState function."""
+
+  def setUp(self):
+    self.items = [{KEY: i} for i in range(10)]
+    cached_list_logic.setCacheItems('valid_list', self.items)
+
+    seeder_logic.seed(cached_list_model.CachedList, {
+        'id': 'invalid_list',
+        'valid_through': datetime.datetime.min,
+        'is_processing': True,
+        })
+
+  def testForNonExistentList(self):
+    """Tests that state of a non-existent list is returned."""
+    state = cached_list_logic.getCachedListState('non_existent')
+    self.assertFalse(state.exists)
+    self.assertFalse(state.is_valid)
+    self.assertFalse(state.is_processing)
+    self.assertIsNone(state.items)
+
+  def testForValidList(self):
+    """Tests that items are returned for a valid list."""
+    state = cached_list_logic.getCachedListState('valid_list', 2, 5)
+    self.assertTrue(state.exists)
+    self.assertTrue(state.is_valid)
+    self.assertFalse(state.is_processing)
+    self.assertEqual(len(self.items), state.no_of_items)
+    self.assertListEqual(self.items[2:7], state.items)
+
+  def testForInvalidList(self):
+    """Tests that items are not returned for an invalid list."""
+    state = cached_list_logic.getCachedListState('invalid_list')
+    self.assertTrue(state.exists)
+    self.assertFalse(state.is_valid)
+    self.assertTrue(state.is_processing)
+    self.assertIsNone(state.items)
+
+
+class TestStartProcessing(unittest.TestCase):
+  """Unit tests for startProcessing function."""
+
+  def testForNonExistentList(self):
+    """Tests that an empty processing list is created."""
+    self.assertTrue(cached_list_logic.startProcessing('new_list'))
+    cached_list = cached_list_model.CachedList.get_by_id('new_list')
+    self.assertTrue(cached_list.is_processing)
+    self.assertEqual(0, cached_list.no_of_items)
+
+  def testForNotProcessingList(self):
+    """Tests that an existing list is set to processing state."""
+    seeder_logic.seed(cached_list_model.CachedList,
+        {'id': 'test_list', 'is_processing': False})
+    self.assertTrue(cached_list_logic.startProcessing('test_list'))
+    cached_list = cached_list_model.CachedList.get_by_id('test_list')
+    self.assertTrue(cached_list.is_processing)
+
+  def testForProcessingList(self):
+    """Tests that False is returned if the list is already processing."""
+    seeder_logic.seed(cached_list_model.CachedList,
+        {'id': 'test_list', 'is_processing': True})
+    self.assertFalse(cached_list_logic.startProcessing('test_list'))
+
+
+class TestGetCachedListStateWithStaleness(unittest.TestCase):
+  """Unit tests for getCachedListState function for expired lists."""
+
+  def setUp(self):
+    self.items = [{KEY: i} for i in range(10)]
+    cached_list_logic.setCacheItems('test_list', self.items)
+
+    # make the list expire an hour ago
+    cached_list = cached_list_model.CachedList.get_by_id('test_list')
+    cached_list.valid_through = (
+        datetime.datetime.now() - datetime.timedelta(hours=1))
+    cached_list.put()
+
+  def testWithoutStaleness(self):
+    """Tests that items are not returned if staleness is not allowed."""
+    state = cached_list_logic.getCachedListState('test_list')
+    self.assertFalse(state.is_valid)
+    self.assertIsNone(state.items)
+
+  def testWithinStaleness(self):
+    """Tests that items are returned within the allowed staleness."""
+    state = cached_list_logic.getCachedListState(
+        'test_list', max_staleness=datetime.timedelta(hours=2))
+    self.assertFalse(state.is_valid)
+    self.assertListEqual(self.items, state.items)
+
+  def testBeyondStaleness(self):
+    """Tests that items are not returned beyond the allowed staleness."""
+    state = cached_list_logic.getCachedListState(
+        'test_list', max_staleness=datetime.timedelta(minutes=30))
+    self.assertFalse(state.is_valid)
+    self.assertIsNone(state.items)
+
+
+class TestUpdateCachedItem(unittest.TestCase):
+  """Unit tests for updateCachedItem function."""
+
+  def setUp(self):
+    self.items = [
+        {KEY: i, 'name': 'foo %s' % i}
+        for i in range(cached_list_logic.PAGE_SIZE + 10)]
+    cached_list_logic.setCacheItems('test_list', self.items)
+
+  def testForNonExistentList(self):
+    """Tests that False is returned for a non-existent list."""
+    self.assertFalse(cached_list_logic.updateCachedItem(
+        'non_existent', 1, {KEY: 1, 'name': 'bar'}))
+
+  def testReplaceItem(self):
+    """Tests that an existing item is replaced."""
+    new_item = {KEY: 3, 'name': 'bar'}
+    self.assertTrue(
+        cached_list_logic.updateCachedItem('test_list', 3, new_item))
+
+    cached_items = cached_list_logic.getCachedItems('test_list')
+    self.assertEqual(len(self.items), len(cached_items))
+    self.assertEqual(new_item, cached_items[3])
+
+  def testAppendItem(self):
+    """Tests that a new item is appended to the list."""
+    new_item = {KEY: 'new', 'name': 'bar'}
+    self.assertTrue(
+        cached_list_logic.updateCachedItem('test_list', 'new', new_item))
+
+    cached_items = cached_list_logic.getCachedItems('test_list')
+    self.assertListEqual(self.items + [new_item], cached_items)
+
+  def testRemoveItem(self):
+    """Tests that an item is removed from the list."""
+    self.assertTrue(cached_list_logic.updateCachedItem('test_list', 0))
+
+    cached_items = cached_list_logic.getCachedItems('test_list')
+    self.assertListEqual(self.items[1:], cached_items)
+
+  def testRetrievingAfterRemoval(self):
+    """Tests that items are retrieved across pages after one of them shrank."""
+    cached_list_logic.updateCachedItem('test_list', 0)
+
+    cached_list = cached_list_model.CachedList.get_by_id('test_list')
+    self.assertListEqual(
+        cached_list.page_sizes, [cached_list_logic.PAGE_SIZE - 1, 10])
+
+    cached_items = cached_list_logic.getCachedItems(
+        'test_list', start=cached_list_logic.PAGE_SIZE - 2, limit=3)
+    self.assertListEqual(
+        self.items[cached_list_logic.PAGE_SIZE - 1:
+                   cached_list_logic.PAGE_SIZE + 2],
+        cached_items)
+
+  def testAppendItemToFullPage(self):
+    """Tests that a new page is created when the last one is full."""
+    items = self.items[:cached_list_logic.PAGE_SIZE]
+    cached_list_logic.setCacheItems('full_list', items)
+
+    new_item = {KEY: 'new', 'name': 'bar'}
+    self.assertTrue(
+        cached_list_logic.updateCachedItem('full_list', 'new', new_item))
+
+    cached_list = cached_list_model.CachedList.get_by_id('full_list')
+    self.assertEqual(cached_list.no_of_pages, 2)
+    self.assertEqual(cached_list.no_of_items, len(items) + 1)
+    self.assertListEqual(
+        items + [new_item], cached_list_logic.getCachedItems('full_list'))
+
+  def testListWithoutIndexIsRewritten(self):
+    """Tests that pages of a list are indexed when it is updated for
+    the first time after they were written without an index."""
+    cached_list = cached_list_model.CachedList.get_by_id('test_list')
+    cached_list.page_sizes = []
+    cached_list.put()
+    pages = cached_list_model.CachedListPage.query(
+        ancestor=cached_list.key).fetch(10)
+    for page in pages:
+      page.item_keys = []
+    ndb.put_multi(pages)
+
+    new_item = {KEY: 3, 'name': 'bar'}
+    self.assertTrue(
+        cached_list_logic.updateCachedItem('test_list', 3, new_item))
+
+    cached_list = cached_list_model.CachedList.get_by_id('test_list')
+    self.assertListEqual(
+        cached_list.page_sizes, [cached_list_logic.PAGE_SIZE, 10])
+    cached_items = cached_list_logic.getCachedItems('test_list')
+    self.assertEqual(len(self.items), len(cached_items))
+    self.assertEqual(new_item, cached_items[3])
+
+  def testUnchangedItem(self):
+    """Tests that False is returned if the list is not changed."""
+    self.assertFalse(
+        cached_list_logic.updateCachedItem('test_list', 3, self.items[3]))
+    self.assertFalse(cached_list_logic.updateCachedItem('test_list', 'none'))
+
+  def testValidityIsNotChanged(self):
+    """Tests that validity of the list is not changed."""
+    valid_through = cached_list_model.CachedList.get_by_id(
+        'test_list').valid_through
+    cached_list_logic.updateCachedItem('test_list', 0)
+    self.assertEqual(valid_through, cached_list_model.CachedList.get_by_id(
+        'test_list').valid_through)
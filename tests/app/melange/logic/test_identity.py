@@ -0,0 +1,203 @@
+# Copyright 2014 the Melange authors.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Tests for identity logic."""
+
+import os
+import unittest
+
+from google.appengine.api import users
+from google.appengine.ext import ndb
+
+from melange.logic import identity as identity_logic
+from melange.models import settings as settings_model
+from melange.models import user as user_model
+
+from soc.models import profile as db_profile_model
+from soc.models import user as db_user_model
+from soc.modules.seeder.logic.seeder import logic as seeder_logic
+
+from tests import profile_utils
+from tests import program_utils
+
+
+TEST_ACCOUNT_ID = 'test_account_id'
+TEST_EMAIL = 'test@example.com'
+TEST_USER_ID = 'test_user'
+
+
+class GetCurrentIdentityTest(unittest.TestCase):
+  """Unit tests for getCurrentIdentity function."""
+
+  def setUp(self):
+    """See unittest.TestCase.setUp for specification."""
+    self.program = program_utils.seedProgram()
+
+  def testForNonLoggedInAccount(self):
+    """Tests that empty identity is returned when nobody is logged in."""
+    profile_utils.signInToGoogleAccount('', '')
+
+    identity = identity_logic.getCurrentIdentity(
+        program_key=self.program.key())
+    self.assertIsNone(identity.user)
+    self.assertIsNone(identity.ndb_user)
+    self.assertIsNone(identity.profile)
+    self.assertIsNone(identity.ndb_profile)
+
+  def testForLoggedInAccountWithNoUserEntity(self):
+    """Tests that no user is returned for a logged-in user with no entity."""
+    profile_utils.signInToGoogleAccount(TEST_EMAIL, TEST_ACCOUNT_ID)
+
+    identity = identity_logic.getCurrentIdentity(
+        program_key=self.program.key())
+    self.assertIsNone(identity.ndb_user)
+    self.assertIsNone(identity.ndb_profile)
+
+  def testUserAndProfileResolved(self):
+    """Tests that user and profile for the program are resolved."""
+    user = profile_utils.seedNDBUser(account_id=TEST_ACCOUNT_ID)
+    profile = profile_utils.seedNDBProfile(self.program.key(), user=user)
+    profile_utils.signInToGoogleAccount(TEST_EMAIL, TEST_ACCOUNT_ID)
+
+    identity = identity_logic.getCurrentIdentity(
+        program_key=self.program.key())
+    self.assertEqual(identity.ndb_user.key, user.key)
+    self.assertEqual(identity.ndb_profile.key, profile.key)
+    self.assertEqual(identity.program_key, self.program.key())
+
+    # profiles are not resolved when no program is specified
+    identity = identity_logic.getCurrentIdentity()
+    self.assertEqual(identity.ndb_user.key, user.key)
+    self.assertIsNone(identity.ndb_profile)
+    self.assertIsNone(identity.program_key)
+
+  def testCachedUserKeyForDeletedUser(self):
+    """Tests that the cached key of a deleted user is not used."""
+    user = profile_utils.seedNDBUser(account_id=TEST_ACCOUNT_ID)
+    profile_utils.signInToGoogleAccount(TEST_EMAIL, TEST_ACCOUNT_ID)
+
+    identity = identity_logic.getCurrentIdentity(use_cache=True)
+    self.assertEqual(identity.ndb_user.key, user.key)
+
+    # the user is deleted and a new one is created for the same account
+    user.key.delete()
+    other_user = profile_utils.seedNDBUser(account_id=TEST_ACCOUNT_ID)
+
+    identity = identity_logic.getCurrentIdentity(use_cache=True)
+    self.assertEqual(identity.ndb_user.key, other_user.key)
+
+  def _seedDbUserAndProfile(self):
+    """Seeds db user and profile for the test account and the program."""
+    db_user = seeder_logic.seed(db_user_model.User, {
+        'key_name': TEST_USER_ID,
+        'link_id': TEST_USER_ID,
+        'account': users.User(email=TEST_EMAIL),
+        'user_id': TEST_ACCOUNT_ID,
+        'status': 'valid',
+        })
+    db_profile = seeder_logic.seed(db_profile_model.Profile, {
+        'key_name': '%s/%s' % (self.program.key().name(), TEST_USER_ID),
+        'parent': db_user,
+        'link_id': TEST_USER_ID,
+        'scope': self.program,
+        'program': self.program,
+        'user': db_user,
+        'status': 'active',
+        })
+    return db_user, db_profile
+
+  def testDbUserAndProfileResolved(self):
+    """Tests that db user and profile are resolved together with ndb ones."""
+    db_user, db_profile = self._seedDbUserAndProfile()
+    user = profile_utils.seedNDBUser(
+        user_id=TEST_USER_ID, account_id=TEST_ACCOUNT_ID)
+    profile = profile_utils.seedNDBProfile(self.program.key(), user=user)
+    profile_utils.signInToGoogleAccount(TEST_EMAIL, TEST_ACCOUNT_ID)
+
+    identity = identity_logic.getCurrentIdentity(
+        program_key=self.program.key())
+    self.assertEqual(identity.user.key(), db_user.key())
+    self.assertEqual(identity.profile.key(), db_profile.key())
+    self.assertEqual(identity.ndb_user.key, user.key)
+    self.assertEqual(identity.ndb_profile.key, profile.key)
+
+  def testDbUserWithoutNdbUser(self):
+    """Tests that db user and profile are resolved for a user who has
+    no ndb entity.
+    """
+    db_user, db_profile = self._seedDbUserAndProfile()
+    profile_utils.signInToGoogleAccount(TEST_EMAIL, TEST_ACCOUNT_ID)
+
+    identity = identity_logic.getCurrentIdentity(
+        program_key=self.program.key())
+    self.assertEqual(identity.user.key(), db_user.key())
+    self.assertEqual(identity.profile.key(), db_profile.key())
+    self.assertIsNone(identity.ndb_user)
+    self.assertIsNone(identity.ndb_profile)
+
+
+class ViewAsTest(unittest.TestCase):
+  """Unit tests for getCurrentIdentity function for developers who view
+  the site as another user.
+  """
+
+  def setUp(self):
+    """See unittest.TestCase.setUp for specification."""
+    self.program = program_utils.seedProgram()
+    self.developer = profile_utils.seedNDBUser(account_id=TEST_ACCOUNT_ID)
+    profile_utils.signInToGoogleAccount(TEST_EMAIL, TEST_ACCOUNT_ID)
+    profile_utils.loginNDB(self.developer, is_admin=True)
+
+  def tearDown(self):
+    """See unittest.TestCase.tearDown for specification."""
+    os.environ['USER_IS_ADMIN'] = '0'
+
+  def _viewAs(self, user_key):
+    """Sets the developer to view the site as the specified user."""
+    settings_model.UserSettings(
+        parent=self.developer.key, view_as=user_key).put()
+
+  def testViewedUserResolved(self):
+    """Tests that the viewed user and their profile are resolved."""
+    other_user = profile_utils.seedNDBUser()
+    other_profile = profile_utils.seedNDBProfile(
+        self.program.key(), user=other_user)
+    self._viewAs(other_user.key)
+
+    identity = identity_logic.getCurrentIdentity(
+        program_key=self.program.key())
+    self.assertEqual(identity.ndb_user.key, other_user.key)
+    self.assertEqual(identity.ndb_profile.key, other_profile.key)
+    self.assertEqual(identity.view_as_ndb_user.key, self.developer.key)
+    self.assertFalse(identity.view_as_missing)
+
+  def testViewedUserMissing(self):
+    """Tests that missing viewed user is reported."""
+    self._viewAs(ndb.Key(user_model.User._get_kind(), 'missing_user'))
+
+    identity = identity_logic.getCurrentIdentity(
+        program_key=self.program.key())
+    self.assertTrue(identity.view_as_missing)
+    self.assertEqual(identity.view_as_ndb_user.key, self.developer.key)
+
+  def testNoViewAsForNonAdmin(self):
+    """Tests that the site is not viewed as another user by non-admins."""
+    os.environ['USER_IS_ADMIN'] = '0'
+    self._viewAs(profile_utils.seedNDBUser().key)
+
+    identity = identity_logic.getCurrentIdentity(
+        program_key=self.program.key())
+    self.assertEqual(identity.ndb_user.key, self.developer.key)
+    self.assertIsNone(identity.view_as_ndb_user)
+    self.assertFalse(identity.view_as_missing)
@@ -0,0 +1,176 @@
+# Copyright 2014 the Melange authors.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Tests for melange.request.url_resolver."""
+
+import unittest
+
+from django.conf import urls
+from django.core import urlresolvers
+
+from melange.request import url_resolver
+
+
+def _homepageView(request):
+  """Dummy view for the homepage pattern."""
+
+
+def _profileView(request):
+  """Dummy view for the profile pattern."""
+
+
+def _taskView(request):
+  """Dummy view for the task pattern."""
+
+
+def _catchAllView(request):
+  """Dummy view for the catch all pattern."""
+
+
+class GetLiteralPrefixTest(unittest.TestCase):
+  """Unit tests for getLiteralPrefix function."""
+
+  def testLiteralPrefix(self):
+    """Tests that literal prefixes are returned."""
+    self.assertEqual(
+        url_resolver.getLiteralPrefix(r'^gsoc/homepage/(?P<program>\w+)$'),
+        'gsoc/homepage/')
+    self.assertEqual(
+        url_resolver.getLiteralPrefix(r'^tasks/gsoc/accept$'),
+        'tasks/gsoc/accept')
+    self.assertEqual(url_resolver.getLiteralPrefix(r'^$'), '')
+
+  def testOptionalCharacter(self):
+    """Tests that optional characters are not part of the prefix."""
+    self.assertEqual(url_resolver.getLiteralPrefix(r'^gsoc/?$'), 'gsoc')
+    self.assertEqual(url_resolver.getLiteralPrefix(r'^gci/a*'), 'gci/')
+
+  def testUnanchoredExpression(self):
+    """Tests that expressions which are not anchored have no prefix."""
+    self.assertEqual(url_resolver.getLiteralPrefix(r'gsoc/homepage$'), '')
+    self.assertEqual(url_resolver.getLiteralPrefix(r'(^gsoc/)'), '')
+
+  def testTopLevelAlternative(self):
+    """Tests that expressions with top-level alternatives have no prefix."""
+    self.assertEqual(
+        url_resolver.getLiteralPrefix(r'^gsoc/homepage|^gci/homepage$'), '')
+    self.assertEqual(
+        url_resolver.getLiteralPrefix(r'^gsoc/(a|b)/c|^d$'), '')
+
+    # alternatives which are escaped or nested do not matter
+    self.assertEqual(
+        url_resolver.getLiteralPrefix(r'^gsoc/(homepage|profile)$'), 'gsoc/')
+    self.assertEqual(
+        url_resolver.getLiteralPrefix(r'^gsoc/[|]/a\|b$'), 'gsoc/')
+
+
+class PrefixIndexedURLResolverTest(unittest.TestCase):
+  """Unit tests for PrefixIndexedURLResolver class."""
+
+  def setUp(self):
+    """See unittest.TestCase.setUp for specification."""
+    self.resolver = url_resolver.PrefixIndexedURLResolver(urls.patterns(None,
+        urls.url(r'^gsoc/homepage/(?P<program>\w+)$', _homepageView,
+            name='gsoc_homepage'),
+        urls.url(r'^gsoc/profile/(?P<program>\w+)$', _profileView,
+            name='gsoc_profile'),
+        urls.url(r'^tasks/gsoc/(?P<task>\w+)$', _taskView, name='gsoc_task'),
+        urls.url(r'^(?P<page>\w+)/homepage/(?P<program>\w+)$', _catchAllView,
+            name='catch_all'),
+        ))
+
+  def testPathsResolved(self):
+    """Tests that paths are resolved to the matching patterns."""
+    match = self.resolver.resolve('gsoc/homepage/gsoc2014')
+    self.assertEqual(match.func, _homepageView)
+    self.assertEqual(match.kwargs, {'program': 'gsoc2014'})
+
+    match = self.resolver.resolve('gsoc/profile/gsoc2014')
+    self.assertEqual(match.func, _profileView)
+
+    match = self.resolver.resolve('tasks/gsoc/accept')
+    self.assertEqual(match.func, _taskView)
+    self.assertEqual(match.kwargs, {'task': 'accept'})
+
+  def testPatternsWithoutPrefixResolved(self):
+    """Tests that patterns without literal prefixes are tried, too."""
+    match = self.resolver.resolve('gci/homepage/gci2014')
+    self.assertEqual(match.func, _catchAllView)
+
+  def testUnknownPathNotResolved(self):
+    """Tests that Resolver404 is raised for paths with no pattern."""
+    with self.assertRaises(urlresolvers.Resolver404):
+      self.resolver.resolve('gsoc/unknown/gsoc2014')
+
+  def testReverse(self):
+    """Tests that reverse lookups take all the patterns into account."""
+    self.assertEqual(
+        self.resolver.reverse('gsoc_homepage', program='gsoc2014'),
+        'gsoc/homepage/gsoc2014')
+    self.assertEqual(
+        self.resolver.reverse('gsoc_task', task='accept'),
+        'tasks/gsoc/accept')
+
+
+class LazyURLResolverTest(unittest.TestCase):
+  """Unit tests for LazyURLResolver class."""
+
+  def setUp(self):
+    """See unittest.TestCase.setUp for specification."""
+    self.module_patterns = {
+        'gsoc': urls.patterns(None,
+            urls.url(r'^gsoc/homepage/(?P<program>\w+)$', _homepageView,
+                name='gsoc_homepage')),
+        'tasks': urls.patterns(None,
+            urls.url(r'^tasks/gsoc/(?P<task>\w+)$', _taskView,
+                name='gsoc_task')),
+        'other': urls.patterns(None,
+            urls.url(r'^(?P<page>\w+)/homepage/(?P<program>\w+)$',
+                _catchAllView, name='catch_all')),
+        }
+    self.loaded_modules = set()
+
+    def getPatterns(module_names):
+      self.loaded_modules.update(module_names)
+      patterns = []
+      for module_name in module_names:
+        patterns.extend(self.module_patterns[module_name])
+      return patterns
+
+    self.resolver = url_resolver.LazyURLResolver(
+        [('gsoc', ('gsoc/',)), ('tasks', ('tasks/',)), ('other', ())],
+        getPatterns)
+
+  def testOnlyClaimingModulesLoaded(self):
+    """Tests that only modules which claim the path are loaded."""
+    match = self.resolver.resolve('tasks/gsoc/accept')
+    self.assertEqual(match.func, _taskView)
+    self.assertSetEqual(self.loaded_modules, set(['tasks']))
+
+    match = self.resolver.resolve('gsoc/homepage/gsoc2014')
+    self.assertEqual(match.func, _homepageView)
+    self.assertSetEqual(self.loaded_modules, set(['gsoc', 'tasks']))
+
+  def testUnclaimedPathLoadsAllModules(self):
+    """Tests that all modules are loaded for paths with no claiming module."""
+    match = self.resolver.resolve('gci/homepage/gci2014')
+    self.assertEqual(match.func, _catchAllView)
+    self.assertSetEqual(self.loaded_modules, set(['gsoc', 'tasks', 'other']))
+
+  def testReverse(self):
+    """Tests that reverse lookups take all the modules into account."""
+    self.assertEqual(
+        self.resolver.reverse('gsoc_task', task='accept'),
+        'tasks/gsoc/accept')
+    self.assertSetEqual(self.loaded_modules, set(['gsoc', 'tasks', 'other']))
@@ -0,0 +1,88 @@
+# Copyright 2014 the Melange authors.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Tests for cache utility functions."""
+
+import unittest
+
+from melange.utils import cache
+
+
+TEST_NAMESPACE = 'test_namespace'
+
+
+class InstanceCacheTest(unittest.TestCase):
+  """Unit tests for InstanceCache class."""
+
+  def testValueIsCached(self):
+    """Tests that a value is returned after it is cached."""
+    instance_cache = cache.InstanceCache(60)
+    instance_cache.set('key', 'value')
+    self.assertEqual(instance_cache.get('key'), 'value')
+
+  def testMissingValue(self):
+    """Tests that None is returned for values which are not cached."""
+    instance_cache = cache.InstanceCache(60)
+    self.assertIsNone(instance_cache.get('key'))
+
+  def testValueExpires(self):
+    """Tests that None is returned for values which have expired."""
+    instance_cache = cache.InstanceCache(-1)
+    instance_cache.set('key', 'value')
+    self.assertIsNone(instance_cache.get('key'))
+
+  def testValueIsDeleted(self):
+    """Tests that None is returned for values which have been deleted."""
+    instance_cache = cache.InstanceCache(60)
+    instance_cache.set('key', 'value')
+    instance_cache.delete('key')
+    self.assertIsNone(instance_cache.get('key'))
+
+  def testClearInstanceCaches(self):
+    """Tests that clearInstanceCaches removes values from all caches."""
+    instance_caches = [cache.InstanceCache(60) for _ in range(2)]
+    for instance_cache in instance_caches:
+      instance_cache.set('key', 'value')
+
+    cache.clearInstanceCaches()
+    for instance_cache in instance_caches:
+      self.assertIsNone(instance_cache.get('key'))
+
+
+class VersionTest(unittest.TestCase):
+  """Unit tests for getVersion and incrementVersion functions."""
+
+  def testVersionIsStable(self):
+    """Tests that the same version is returned until it is incremented."""
+    version = cache.getVersion(TEST_NAMESPACE)
+    self.assertEqual(version, cache.getVersion(TEST_NAMESPACE))
+
+  def testVersionIsIncremented(self):
+    """Tests that a new version is returned after it is incremented."""
+    version = cache.getVersion(TEST_NAMESPACE)
+    cache.incrementVersion(TEST_NAMESPACE)
+    self.assertNotEqual(version, cache.getVersion(TEST_NAMESPACE))
+
+  def testInstanceCacheIsCleared(self):
+    """Tests that instance caches of the namespace are cleared when its
+    version is incremented.
+    """
+    namespace_cache = cache.InstanceCache(60, namespace=TEST_NAMESPACE)
+    namespace_cache.set('key', 'value')
+    other_cache = cache.InstanceCache(60)
+    other_cache.set('key', 'value')
+
+    cache.incrementVersion(TEST_NAMESPACE)
+    self.assertIsNone(namespace_cache.get('key'))
+    self.assertEqual(other_cache.get('key'), 'value')
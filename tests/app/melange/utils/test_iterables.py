@@ -0,0 +1,43 @@
+# Copyright 2014 the Melange authors.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Tests for iterable utility functions."""
+
+import unittest
+
+from melange.utils import iterables
+
+
+class IterBatchesTest(unittest.TestCase):
+  """Unit tests for iterBatches function."""
+
+  def testEvenlyDivided(self):
+    """Tests that items are split into batches of the specified size."""
+    batches = list(iterables.iterBatches(range(6), 3))
+    self.assertListEqual(batches, [[0, 1, 2], [3, 4, 5]])
+
+  def testLastBatchIsShorter(self):
+    """Tests that the last batch contains the remaining items."""
+    batches = list(iterables.iterBatches(range(5), 2))
+    self.assertListEqual(batches, [[0, 1], [2, 3], [4]])
+
+  def testNoItems(self):
+    """Tests that no batches are returned for no items."""
+    self.assertListEqual(list(iterables.iterBatches([], 2)), [])
+
+  def testIterator(self):
+    """Tests that items of an iterator are consumed lazily."""
+    batches = iterables.iterBatches(iter(range(3)), 2)
+    self.assertListEqual(next(batches), [0, 1])
+    self.assertListEqual(next(batches), [2])
@@ -14,11 +14,18 @@
 
 """Tests for functions in the lists module."""
 
+import datetime
+import httplib
+import pickle
 import unittest
 
 from google.appengine.ext import db
 from google.appengine.ext import ndb
 
+from melange import key_column_id_const
+from melange.logic import cached_list as cached_list_logic
+from melange.models import cached_list as cached_list_model
+from melange.request import exception
 from melange.utils import lists
 
 from tests import org_utils
@@ -403,10 +410,207 @@ class TestDatastoreReaderForNDB(unittest.TestCase):
     self.assertEqual(list_data.next_key, expected_next_key)
 
 
+CACHE_TEST_LIST_ID = 'test_list_cache'
+
 class TestCacheReader(unittest.TestCase):
   """Unit tests for CacheReader class"""
-  # TODO:(Aruna)complete this class
-  pass
+
+  def setUp(self):
+    self.query = TestNDBModel.query()
+    self.data_id = lists.getDataId(self.query)
+    self.items = [
+        {key_column_id_const.KEY_COLUMN_ID: 'id %s' % i} for i in range(10)]
+    cached_list_logic.setCacheItems(self.data_id, self.items)
+
+    self.list_reader = lists.CacheReader()
+    self.test_list = lists.List(
+        CACHE_TEST_LIST_ID, 0, TestNDBModel, [], lists.DatastoreReaderForNDB(),
+        cache_reader=self.list_reader)
+    lists.LISTS[CACHE_TEST_LIST_ID] = self.test_list
+
+  def tearDown(self):
+    del lists.LISTS[CACHE_TEST_LIST_ID]
+
+  def _expireList(self):
+    """Makes the cached list expire an hour ago and sets it to processing
+    state, so that no caching process is started by the tests.
+    """
+    cached_list = cached_list_model.CachedList.get_by_id(self.data_id)
+    cached_list.valid_through = (
+        datetime.datetime.now() - datetime.timedelta(hours=1))
+    cached_list.is_processing = True
+    cached_list.put()
+
+  def testGetListDataInBatches(self):
+    """Tests that list data is read in batches."""
+    list_data = self.list_reader.getListData(
+        CACHE_TEST_LIST_ID, self.query, limit=6)
+    self.assertListEqual(self.items[:6], list_data.data)
+    self.assertEqual('6', list_data.next_key)
+
+    list_data = self.list_reader.getListData(
+        CACHE_TEST_LIST_ID, self.query, start=list_data.next_key, limit=6)
+    self.assertListEqual(self.items[6:], list_data.data)
+    self.assertEqual(lists.FINAL_BATCH, list_data.next_key)
+
+  def testGetListDataForExpiredList(self):
+    """Tests that no data is returned for an expired list."""
+    self._expireList()
+    list_data = self.list_reader.getListData(CACHE_TEST_LIST_ID, self.query)
+    self.assertIsNone(list_data)
+
+  def testGetListDataForStaleList(self):
+    """Tests that stale data is returned within the allowed staleness."""
+    self._expireList()
+    self.test_list.max_staleness = datetime.timedelta(hours=2)
+    list_data = self.list_reader.getListData(CACHE_TEST_LIST_ID, self.query)
+    self.assertListEqual(self.items, list_data.data)
+    self.assertEqual(lists.FINAL_BATCH, list_data.next_key)
+
+
+LIST_TEST_LIST_ID = 'test_list'
+
+class TestList(unittest.TestCase):
+  """Unit tests for List class."""
+
+  def setUp(self):
+    for i in range(10):
+      TestNDBModel(name='name %s' % i, value=i, id='id %s' % i).put()
+
+    self.query = TestNDBModel.query()
+    self.data_id = lists.getDataId(self.query)
+    self.items = [
+        {key_column_id_const.KEY_COLUMN_ID: 'id %s' % i} for i in range(10)]
+    cached_list_logic.setCacheItems(self.data_id, self.items)
+
+    key = lists.NdbKeyColumn(key_column_id_const.KEY_COLUMN_ID, 'Key')
+    self.test_list = lists.List(
+        LIST_TEST_LIST_ID, 0, TestNDBModel, [key],
+        lists.DatastoreReaderForNDB(), cache_reader=lists.CacheReader())
+    lists.LISTS[LIST_TEST_LIST_ID] = self.test_list
+
+  def tearDown(self):
+    del lists.LISTS[LIST_TEST_LIST_ID]
+
+  def _invalidateList(self):
+    """Makes the cached list expire an hour ago and sets it to processing
+    state, so that no caching process is started by the tests.
+    """
+    cached_list = cached_list_model.CachedList.get_by_id(self.data_id)
+    cached_list.valid_through = (
+        datetime.datetime.now() - datetime.timedelta(hours=1))
+    cached_list.is_processing = True
+    cached_list.put()
+
+  def testCacheKeyContinuedFromCache(self):
+    """Tests that batches read from cache are continued from cache."""
+    list_data = self.test_list.getListData(self.query, limit=6)
+    self.assertListEqual(self.items[:6], list_data.data)
+    self.assertEqual(lists.CACHE_KEY_PREFIX + '6', list_data.next_key)
+
+    list_data = self.test_list.getListData(
+        self.query, start=list_data.next_key, limit=6)
+    self.assertListEqual(self.items[6:], list_data.data)
+    self.assertEqual(lists.FINAL_BATCH, list_data.next_key)
+
+  def testCacheKeyForExpiredList(self):
+    """Tests that batches read from cache are not continued, if the cached
+    list becomes invalid.
+    """
+    list_data = self.test_list.getListData(self.query, limit=6)
+    self._invalidateList()
+
+    with self.assertRaises(exception.UserError) as context:
+      self.test_list.getListData(
+          self.query, start=list_data.next_key, limit=6)
+    self.assertEqual(context.exception.status, httplib.BAD_REQUEST)
+
+  def testDatastoreKeyContinuedFromDatastore(self):
+    """Tests that batches read from datastore are continued from datastore,
+    even if the list is cached in the meantime.
+    """
+    self._invalidateList()
+    list_data = self.test_list.getListData(self.query, limit=6)
+    self.assertTrue(
+        list_data.next_key.startswith(lists.DATASTORE_KEY_PREFIX))
+
+    cached_list_logic.setCacheItems(self.data_id, [])
+
+    list_data = self.test_list.getListData(
+        self.query, start=list_data.next_key, limit=6)
+    self.assertListEqual(
+        [{key_column_id_const.KEY_COLUMN_ID: 'id %s' % i}
+            for i in range(6, 10)],
+        list_data.data)
+    self.assertEqual(lists.FINAL_BATCH, list_data.next_key)
+
+  def testUnknownKeyRestarted(self):
+    """Tests that batches with keys of no reader start from the first item."""
+    list_data = self.test_list.getListData(self.query, start='6', limit=6)
+    self.assertListEqual(self.items[:6], list_data.data)
+
+
+UPDATE_TEST_LIST_ID = 'test_list_update'
+
+class TestUpdateCachedItems(unittest.TestCase):
+  """Unit tests for updateCachedItems function."""
+
+  def setUp(self):
+    for i in range(3):
+      TestNDBModel(name='name %s' % i, value=i, id='id %s' % i).put()
+
+    key = lists.NdbKeyColumn(key_column_id_const.KEY_COLUMN_ID, 'Key')
+    name = lists.SimpleColumn('name', 'Name')
+    test_list = lists.List(
+        UPDATE_TEST_LIST_ID, 0, TestNDBModel, [key, name],
+        lists.DatastoreReaderForNDB(), cache_reader=lists.CacheReader())
+    lists.LISTS[UPDATE_TEST_LIST_ID] = test_list
+
+    self.query = TestNDBModel.query(TestNDBModel.value < 5)
+    self.data_id = lists.getDataId(self.query)
+    cached_list_logic.startProcessing(
+        self.data_id, list_id=UPDATE_TEST_LIST_ID,
+        query_pickle=pickle.dumps(self.query))
+    cached_list_logic.setCacheItems(self.data_id, [
+        {key_column_id_const.KEY_COLUMN_ID: 'id %s' % i, 'name': 'name %s' % i}
+        for i in range(3)])
+
+  def tearDown(self):
+    del lists.LISTS[UPDATE_TEST_LIST_ID]
+
+  def testItemIsUpdated(self):
+    """Tests that an item of an updated entity is updated."""
+    entity = TestNDBModel.get_by_id('id 1')
+    entity.name = 'updated'
+    entity.put()
+
+    lists.updateCachedItems(entity.key)
+
+    cached_items = cached_list_logic.getCachedItems(self.data_id)
+    self.assertEqual('updated', cached_items[1]['name'])
+
+  def testItemIsAdded(self):
+    """Tests that an item of a new entity is added."""
+    entity = TestNDBModel(name='new', value=3, id='id 3')
+    entity.put()
+
+    lists.updateCachedItems(entity.key)
+
+    cached_items = cached_list_logic.getCachedItems(self.data_id)
+    self.assertEqual(4, len(cached_items))
+    self.assertEqual('new', cached_items[3]['name'])
+
+  def testItemIsRemoved(self):
+    """Tests that an item of an entity which does not match is removed."""
+    entity = TestNDBModel.get_by_id('id 0')
+    entity.value = 10
+    entity.put()
+
+    lists.updateCachedItems(entity.key)
+
+    cached_items = cached_list_logic.getCachedItems(self.data_id)
+    self.assertEqual(2, len(cached_items))
+    self.assertNotIn('name 0', [item['name'] for item in cached_items])
 
 
 class TestGetDataId(unittest.TestCase):
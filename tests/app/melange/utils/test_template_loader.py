@@ -0,0 +1,101 @@
+# Copyright 2014 the Melange authors.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Tests for template loader utility functions."""
+
+import os
+import shutil
+import tempfile
+import unittest
+
+from django import template
+
+from melange.utils import template_loader
+
+
+TEST_TEMPLATE_NAME = 'modules/test/template.html'
+TEST_TEMPLATE_SOURCE = u'<p>{{ value }}</p>'
+
+TEST_INVALID_TEMPLATE_NAME = 'invalid.html'
+TEST_INVALID_TEMPLATE_SOURCE = u'{% if value %}'
+
+
+class BundleLoaderTest(unittest.TestCase):
+  """Unit tests for BundleLoader class and buildBundle function."""
+
+  def setUp(self):
+    """See unittest.TestCase.setUp for specification."""
+    self.template_dir = tempfile.mkdtemp()
+    os.makedirs(os.path.join(self.template_dir, 'modules', 'test'))
+    with open(os.path.join(self.template_dir, TEST_TEMPLATE_NAME), 'w') as f:
+      f.write(TEST_TEMPLATE_SOURCE)
+
+    self.bundle_path = os.path.join(self.template_dir, 'templates.bundle')
+
+  def tearDown(self):
+    """See unittest.TestCase.tearDown for specification."""
+    shutil.rmtree(self.template_dir)
+
+  def testTemplateLoaded(self):
+    """Tests that templates are loaded from the bundle."""
+    errors = template_loader.buildBundle([self.template_dir], self.bundle_path)
+    self.assertListEqual(errors, [])
+
+    loader = template_loader.BundleLoader(bundle_path=self.bundle_path)
+    source, _ = loader.load_template_source(TEST_TEMPLATE_NAME)
+    self.assertEqual(source, TEST_TEMPLATE_SOURCE)
+
+  def testMissingTemplate(self):
+    """Tests that templates which are not bundled are not loaded."""
+    template_loader.buildBundle([self.template_dir], self.bundle_path)
+
+    loader = template_loader.BundleLoader(bundle_path=self.bundle_path)
+    with self.assertRaises(template.TemplateDoesNotExist):
+      loader.load_template_source('missing.html')
+
+  def testMissingBundle(self):
+    """Tests that no templates are loaded if there is no bundle."""
+    loader = template_loader.BundleLoader(
+        bundle_path=os.path.join(self.template_dir, 'missing.bundle'))
+    with self.assertRaises(template.TemplateDoesNotExist):
+      loader.load_template_source(TEST_TEMPLATE_NAME)
+
+  def testInvalidTemplateReported(self):
+    """Tests that templates which cannot be parsed are reported."""
+    invalid_template_path = os.path.join(
+        self.template_dir, TEST_INVALID_TEMPLATE_NAME)
+    with open(invalid_template_path, 'w') as f:
+      f.write(TEST_INVALID_TEMPLATE_SOURCE)
+
+    errors = template_loader.buildBundle([self.template_dir], self.bundle_path)
+    self.assertListEqual(
+        [template_name for template_name, _ in errors],
+        [TEST_INVALID_TEMPLATE_NAME])
+
+  def testInvalidTemplateSkipped(self):
+    """Tests that templates which cannot be parsed are not bundled."""
+    invalid_template_path = os.path.join(
+        self.template_dir, TEST_INVALID_TEMPLATE_NAME)
+    with open(invalid_template_path, 'w') as f:
+      f.write(TEST_INVALID_TEMPLATE_SOURCE)
+
+    template_loader.buildBundle([self.template_dir], self.bundle_path)
+
+    loader = template_loader.BundleLoader(bundle_path=self.bundle_path)
+    with self.assertRaises(template.TemplateDoesNotExist):
+      loader.load_template_source(TEST_INVALID_TEMPLATE_NAME)
+
+    # valid templates are still bundled
+    source, _ = loader.load_template_source(TEST_TEMPLATE_NAME)
+    self.assertEqual(source, TEST_TEMPLATE_SOURCE)
@@ -0,0 +1,143 @@
+# Copyright 2014 the Melange authors.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Tests for soc.logic.mail_dispatcher."""
+
+from google.appengine.ext import db
+from google.appengine.ext import testbed
+
+from soc.logic import mail_dispatcher
+from soc.models import email as email_model
+from soc.tasks import mailer
+
+from tests import test_utils
+
+
+TEST_SENDER = 'test@example.com'
+
+TEST_NUMBER_OF_MAILS = mailer.MAIL_BATCH_SIZE + 1
+
+
+class SendMailsTest(test_utils.DjangoTestCase):
+  """Unit tests for sendMails function."""
+
+  def setUp(self):
+    """See unittest.TestCase.setUp for specification."""
+    self.init()
+
+  def testMailsAreSentInBatches(self):
+    """Tests that emails are stored and sent out in batches."""
+    contexts = [
+        mailer.getMailContext(
+            'test%s@example.com' % i, 'Subject %s' % i, 'Content',
+            sender=TEST_SENDER)
+        for i in range(TEST_NUMBER_OF_MAILS)]
+    mail_dispatcher.sendMails(contexts)
+
+    # emails are stored in two batches
+    self.assertEqual(email_model.EmailBatch.all().count(), 2)
+
+    for i in range(TEST_NUMBER_OF_MAILS):
+      self.assertEmailSent(to='test%s@example.com' % i)
+
+    # all batches are deleted after the emails have been sent
+    self.assertEqual(email_model.EmailBatch.all().count(), 0)
+    counters = mailer.getCounters()
+    self.assertEqual(counters['queued'], TEST_NUMBER_OF_MAILS)
+    self.assertEqual(counters['sent'], TEST_NUMBER_OF_MAILS)
+
+  def testLongMailsAreSentInSmallerBatches(self):
+    """Tests that batches of long emails do not exceed the maximal length."""
+    content = 'x' * (mailer.MAX_BATCH_CONTEXTS_LENGTH / 3)
+    contexts = [
+        mailer.getMailContext(
+            'test%s@example.com' % i, 'Subject %s' % i, content,
+            sender=TEST_SENDER)
+        for i in range(4)]
+    mail_dispatcher.sendMails(contexts)
+
+    batches = email_model.EmailBatch.all().fetch(1000)
+    self.assertEqual(len(batches), 2)
+    for batch in batches:
+      self.assertLessEqual(
+          len(batch.contexts), mailer.MAX_BATCH_CONTEXTS_LENGTH)
+
+    for i in range(4):
+      self.assertEmailSent(to='test%s@example.com' % i)
+
+
+class GetSendMailsTxnTest(test_utils.DjangoTestCase):
+  """Unit tests for getSendMailsTxn function."""
+
+  def setUp(self):
+    """See unittest.TestCase.setUp for specification."""
+    self.init()
+    self.contexts = [
+        mailer.getMailContext(
+            'test%s@example.com' % i, 'Subject %s' % i, 'Content',
+            sender=TEST_SENDER)
+        for i in range(2)]
+
+  def testMailsSentIfTransactionSucceeds(self):
+    """Tests that emails are sent out if the transaction succeeds."""
+    mail_txn = mail_dispatcher.getSendMailsTxn(self.contexts)
+    db.run_in_transaction_options(
+        db.create_transaction_options(xg=True), mail_txn)
+
+    for i in range(2):
+      self.assertEmailSent(to='test%s@example.com' % i)
+
+  def testMailsNotSentIfTransactionFails(self):
+    """Tests that no emails are sent out if the transaction fails."""
+    mail_txn = mail_dispatcher.getSendMailsTxn(self.contexts)
+
+    def failingTxn():
+      mail_txn()
+      raise db.Rollback()
+
+    db.run_in_transaction_options(
+        db.create_transaction_options(xg=True), failingTxn)
+
+    self.assertEqual(email_model.EmailBatch.all().count(), 0)
+    self.executeTasks(mailer.SEND_MAIL_URL, 'mail')
+    mail_stub = self.testbed.get_stub(testbed.MAIL_SERVICE_NAME)
+    self.assertListEqual([], mail_stub.get_sent_messages())
+    self.assertEqual(mailer.getCounters()['queued'], 0)
+
+  def testLongMailsStoredInSingleEntityGroup(self):
+    """Tests that all batches belong to a single entity group."""
+    content = 'x' * (mailer.MAX_BATCH_CONTEXTS_LENGTH / 2)
+    contexts = [
+        mailer.getMailContext(
+            'test%s@example.com' % i, 'Subject %s' % i, content,
+            sender=TEST_SENDER)
+        for i in range(3)]
+    mail_txn = mail_dispatcher.getSendMailsTxn(contexts)
+    db.run_in_transaction_options(
+        db.create_transaction_options(xg=True), mail_txn)
+
+    batches = email_model.EmailBatch.all().fetch(1000)
+    self.assertEqual(len(batches), 3)
+    self.assertEqual(len(set(batch.parent_key() for batch in batches)), 1)
+
+  def testTooManyMails(self):
+    """Tests that error is raised for too many emails for a transaction."""
+    contexts = [
+        mailer.getMailContext(
+            'test%s@example.com' % i, 'Subject %s' % i, 'Content',
+            sender=TEST_SENDER)
+        for i in range(
+            mailer.MAIL_BATCH_SIZE * mailer.MAX_TRANSACTIONAL_TASKS + 1)]
+    with self.assertRaises(ValueError):
+      mail_dispatcher.getSendMailsTxn(contexts)
@@ -0,0 +1,68 @@
+# Copyright 2014 the Melange authors.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Tests for soc.logic.program."""
+
+import unittest
+
+from google.appengine.ext import db
+
+from soc.logic import program as program_logic
+
+from tests import program_utils
+
+
+class GetProgramWideEntitiesTest(unittest.TestCase):
+  """Unit tests for getProgramWideEntities function."""
+
+  def setUp(self):
+    """See unittest.TestCase.setUp for specification."""
+    self.program = program_utils.seedGSoCProgram()
+    self.keys = [
+        self.program.key(), self.program.timeline.key(),
+        db.Key.from_path('OrgAppSurvey', 'gsoc_program/%s/orgapp' % (
+            self.program.key().name()))]
+
+  def testEntitiesAreReturned(self):
+    """Tests that the program and the related entities are returned."""
+    program, timeline, org_app, sponsor = (
+        program_logic.getProgramWideEntities(*self.keys))
+    self.assertEqual(program.key(), self.program.key())
+    self.assertEqual(timeline.key(), self.program.timeline.key())
+    self.assertIsNone(org_app)
+    self.assertEqual(sponsor.key(), self.program.sponsor.key())
+
+  def testEntitiesAreCached(self):
+    """Tests that cached entities are returned until a program is saved."""
+    program_logic.getProgramWideEntities(*self.keys)
+
+    # the change is not visible, because the entity is not put by the model
+    self.program.name = 'Changed Name'
+    db.put(self.program)
+    program = program_logic.getProgramWideEntities(*self.keys)[0]
+    self.assertNotEqual(program.name, 'Changed Name')
+
+    self.program.put()
+    program = program_logic.getProgramWideEntities(*self.keys)[0]
+    self.assertEqual(program.name, 'Changed Name')
+
+  def testMissingProgramIsNotCached(self):
+    """Tests that a missing program is returned once it is saved."""
+    db.delete(self.program)
+    self.assertIsNone(program_logic.getProgramWideEntities(*self.keys)[0])
+
+    # the entity is not put by the model
+    db.put(self.program)
+    program = program_logic.getProgramWideEntities(*self.keys)[0]
+    self.assertEqual(program.key(), self.program.key())
@@ -14,9 +14,14 @@
 
 """Tests for app.soc.logic.site."""
 
+import mock
 import os
 import unittest
 
+from google.appengine.ext import db
+
+from melange.utils import cache
+
 from soc.logic import site
 from soc.models import site as site_model
 from soc.views.helper import request_data
@@ -76,3 +81,53 @@ class SiteFunctionsTest(unittest.TestCase):
         del os.environ['HTTP_HOST']
       else:
         os.environ['HTTP_HOST'] = self.default_host
+
+
+class SingletonTest(unittest.TestCase):
+  """Unit tests for singleton function."""
+
+  def testSiteIsCreated(self):
+    """Tests that the site entity is created if it does not exist."""
+    settings = site.singleton()
+    self.assertEqual(settings.key().name(), 'site')
+    self.assertIsNotNone(site_model.Site.get_by_key_name('site'))
+
+  def testSiteIsCached(self):
+    """Tests that the site entity is not retrieved from the datastore after
+    it is cached.
+    """
+    site_model.Site(key_name='site', site_name='Cached Site').put()
+    self.assertEqual(site.singleton().site_name, 'Cached Site')
+
+    # the change is not visible, because the entity is not put by the model
+    db.put(site_model.Site(key_name='site', site_name='Other Site'))
+    self.assertEqual(site.singleton().site_name, 'Cached Site')
+
+    site.invalidateSingleton()
+    self.assertEqual(site.singleton().site_name, 'Other Site')
+
+  def testCacheIsInvalidatedOnPut(self):
+    """Tests that the cached site entity is invalidated when it is updated."""
+    settings = site.singleton()
+    settings.site_name = 'Updated Site'
+    settings.put()
+
+    self.assertEqual(site.singleton().site_name, 'Updated Site')
+
+  def testCopiesAreReturned(self):
+    """Tests that modifications of returned entities are not cached."""
+    settings = site.singleton()
+    settings.site_name = 'Modified Site'
+
+    self.assertNotEqual(site.singleton().site_name, 'Modified Site')
+
+  def testVersionIsNotReadWhenCached(self):
+    """Tests that the version of the site cache is not read from memcache
+    while the entity is cached by the instance.
+    """
+    site.singleton()
+
+    with mock.patch.object(cache, 'getVersion') as get_version:
+      site.singleton()
+      self.assertFalse(get_version.called)
+
@@ -0,0 +1,65 @@
+# Copyright 2014 the Melange authors.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+"""Tests for soc.mapreduce.populate_gci_ranker."""
+
+from soc.mapreduce import populate_gci_ranker
+
+from soc.modules.gci.logic import ranking as ranking_logic
+from soc.modules.gci.models.score import GCIScore
+
+from tests import profile_utils
+from tests import test_utils
+
+
+_UPDATE_RANKER_URL = '/tasks/gci/ranking/update_ranker'
+
+class ProcessTest(test_utils.GCIDjangoTestCase):
+  """Unit tests for process function."""
+
+  def setUp(self):
+    """See unittest.TestCase.setUp for specification."""
+    super(ProcessTest, self).setUp()
+    self.init()
+
+  def _seedScore(self, points):
+    """Seeds a score with the specified points for a new student."""
+    student = profile_utils.seedNDBStudent(self.program)
+    score = GCIScore(parent=student.key.to_old_key(), program=self.program,
+        points=points)
+    score.put()
+    return score
+
+  def testScoresArePopulated(self):
+    """Tests that scores are stored in the ranker of their program."""
+    first_score = self._seedScore(5)
+    second_score = self._seedScore(2)
+
+    list(populate_gci_ranker.process(first_score))
+    list(populate_gci_ranker.process(second_score))
+    self.executeTasks(_UPDATE_RANKER_URL, [ranking_logic.RANKER_QUEUE_NAME])
+
+    self.assertEqual(ranking_logic.getNumberOfRankedStudents(self.program), 2)
+    self.assertEqual(ranking_logic.getRank(first_score), 1)
+    self.assertEqual(ranking_logic.getRank(second_score), 2)
+
+  def testScoreWithoutPointsIsSkipped(self):
+    """Tests that scores without any points are not stored in the ranker."""
+    score = self._seedScore(0)
+
+    list(populate_gci_ranker.process(score))
+    self.executeTasks(_UPDATE_RANKER_URL, [ranking_logic.RANKER_QUEUE_NAME])
+
+    self.assertEqual(ranking_logic.getNumberOfRankedStudents(self.program), 0)
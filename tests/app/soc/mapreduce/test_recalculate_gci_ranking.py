@@ -0,0 +1,176 @@
+# Copyright 2014 the Melange authors.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Tests for soc.mapreduce.recalculate_gci_ranking."""
+
+from google.appengine.ext import ndb
+
+from soc.mapreduce import recalculate_gci_ranking
+
+from soc.modules.gci.logic import org_score as org_score_logic
+from soc.modules.gci.logic import ranking as ranking_logic
+from soc.modules.gci.models import task as task_model
+from soc.modules.gci.models.profile import GCIStudentInfo
+from soc.modules.gci.models.score import GCIOrgScore
+from soc.modules.gci.models.score import GCIScore
+from soc.modules.seeder.logic.seeder import logic as seeder_logic
+
+from tests import profile_utils
+from tests import program_utils
+from tests import task_utils
+from tests import test_utils
+
+
+class RecalculateRankingPipelineTest(test_utils.GCIDjangoTestCase):
+  """Unit tests for RecalculateRankingPipeline class."""
+
+  def setUp(self):
+    """See unittest.TestCase.setUp for specification."""
+    super(RecalculateRankingPipelineTest, self).setUp()
+    self.init()
+
+    mentor = profile_utils.seedNDBProfile(
+        self.program.key(), mentor_for=[ndb.Key.from_old_key(self.org.key())])
+    self.mentor_keys = [mentor.key.to_old_key()]
+
+  def _seedTask(self, student, status=task_model.CLOSED,
+      difficulty_level=task_model.DifficultyLevel.EASY):
+    """Seeds a task of self.org assigned to the specified student."""
+    return task_utils.seedTask(
+        self.program, self.org, self.mentor_keys,
+        student=student.key.to_old_key(), status=status,
+        difficulty_level=difficulty_level)
+
+  def _recalculate(self):
+    """Runs the pipeline for self.program to completion."""
+    recalculate_gci_ranking.RecalculateRankingPipeline(
+        self.program.key().name()).start()
+    self.executeMapReduceJobs()
+
+  def testScoresRecalculated(self):
+    """Tests that scores are calculated from closed tasks of students."""
+    student = profile_utils.seedNDBStudent(self.program)
+    tasks = [
+        self._seedTask(student),
+        self._seedTask(student,
+            difficulty_level=task_model.DifficultyLevel.HARD),
+        ]
+    # tasks which are not closed do not count
+    self._seedTask(student, status=task_model.CLAIMED,
+        difficulty_level=task_model.DifficultyLevel.HARD)
+
+    self._recalculate()
+
+    score = ranking_logic.get(student.key.to_old_key())
+    self.assertEqual(score.points, 5)
+    self.assertSetEqual(
+        set(score.tasks), set(task.key() for task in tasks))
+
+    org_scores = org_score_logic.queryForAncestor(
+        student.key.to_old_key()).fetch(1000)
+    self.assertEqual(len(org_scores), 1)
+    self.assertEqual(
+        GCIOrgScore.org.get_value_for_datastore(org_scores[0]),
+        self.org.key())
+    self.assertEqual(org_scores[0].number_of_tasks, 2)
+
+    student = student.key.get()
+    self.assertEqual(student.student_data.number_of_completed_tasks, 2)
+
+  def testOldScoresCleared(self):
+    """Tests that students with no closed tasks do not keep old scores."""
+    student = profile_utils.seedNDBStudent(self.program)
+    task = self._seedTask(student, status=task_model.CLAIMED)
+    GCIScore(parent=student.key.to_old_key(), program=self.program,
+        points=4, tasks=[task.key()]).put()
+    GCIOrgScore(parent=student.key.to_old_key(), org=self.org,
+        tasks=[task.key()], number_of_tasks=1).put()
+
+    self._recalculate()
+
+    self.assertIsNone(ranking_logic.get(student.key.to_old_key()))
+    self.assertListEqual(org_score_logic.queryForAncestor(
+        student.key.to_old_key()).fetch(1000), [])
+
+  def testRecalculatedTwice(self):
+    """Tests that recalculating again does not duplicate scores."""
+    student = profile_utils.seedNDBStudent(self.program)
+    self._seedTask(student)
+
+    self._recalculate()
+    self._recalculate()
+
+    scores = GCIScore.all().ancestor(student.key.to_old_key()).fetch(1000)
+    self.assertEqual(len(scores), 1)
+    self.assertEqual(scores[0].points, 1)
+
+  def testTaskClosedIsSet(self):
+    """Tests that students with closed tasks are marked so."""
+    student = profile_utils.seedNDBStudent(self.program)
+    properties = {
+        'parent': student.key.to_old_key(),
+        'task_closed': False,
+        }
+    student_info = seeder_logic.seed(GCIStudentInfo, properties)
+    self._seedTask(student)
+
+    self._recalculate()
+
+    student_info = GCIStudentInfo.get(student_info.key())
+    self.assertTrue(student_info.task_closed)
+
+  def testTasksOfOtherProgramsAreIgnored(self):
+    """Tests that closed tasks of other programs are not counted."""
+    student = profile_utils.seedNDBStudent(self.program)
+    self._seedTask(student)
+
+    other_program = program_utils.seedGCIProgram()
+    task_utils.seedTask(
+        other_program, self.org, self.mentor_keys,
+        student=student.key.to_old_key(), status=task_model.CLOSED)
+
+    self._recalculate()
+
+    score = ranking_logic.get(student.key.to_old_key())
+    self.assertEqual(score.points, 1)
+
+  def testOldScoresReplaced(self):
+    """Tests that scores written before the recalculation are replaced
+    by the recalculated ones.
+    """
+    student = profile_utils.seedNDBStudent(self.program)
+    task = self._seedTask(student)
+    GCIScore(parent=student.key.to_old_key(), program=self.program,
+        points=4, tasks=[task.key()]).put()
+
+    self._recalculate()
+
+    scores = GCIScore.all().ancestor(student.key.to_old_key()).fetch(1000)
+    self.assertEqual(len(scores), 1)
+    self.assertEqual(scores[0].points, 1)
+
+  def testRankerIsRebuilt(self):
+    """Tests that the ranker keeps the recalculated scores only."""
+    student = profile_utils.seedNDBStudent(self.program)
+    self._seedTask(student)
+
+    other_student = profile_utils.seedNDBStudent(self.program)
+    ranking_logic.setRankerScore(
+        self.program, other_student.key.to_old_key(), 3)
+
+    self._recalculate()
+
+    self.assertListEqual(
+        ranking_logic.getRankerScoreNames(self.program),
+        [str(student.key.to_old_key())])
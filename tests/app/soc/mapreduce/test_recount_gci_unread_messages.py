@@ -0,0 +1,59 @@
+# Copyright 2014 the Melange authors.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Tests for soc.mapreduce.recount_gci_unread_messages."""
+
+import unittest
+
+from google.appengine.ext import ndb
+
+from soc.mapreduce import recount_gci_unread_messages
+
+from tests import program_utils
+from tests.utils import conversation_utils
+
+
+class ProcessTest(unittest.TestCase):
+  """Unit tests for process function."""
+
+  def setUp(self):
+    """See unittest.TestCase.setUp for specification."""
+    program = program_utils.seedGCIProgram()
+    self.conv_utils = conversation_utils.GCIConversationHelper(
+        ndb.Key.from_old_key(program.key()))
+
+    user_key = self.conv_utils.createUser(return_key=True)
+    self.conversation = self.conv_utils.createConversation(
+        subject='Subject', content='Message', users=[user_key])
+    self.conv_utils.addMessage(conversation=self.conversation.key)
+
+    # the entity is stored without a number of unread messages,
+    # like the ones created before the numbers were maintained
+    self.conv_user = self.conv_utils.conversation_user_model_class.query(
+        ancestor=self.conversation.key).get()
+    self.conv_user.num_unread_messages = None
+    self.conv_user.put()
+
+  def testUnreadMessagesAreCounted(self):
+    """Tests that the number of unread messages is stored."""
+    list(recount_gci_unread_messages.process(self.conv_user.key.to_old_key()))
+    self.assertEqual(2, self.conv_user.key.get().num_unread_messages)
+
+  def testWrongNumberIsCorrected(self):
+    """Tests that a number of unread messages which has drifted is fixed."""
+    self.conv_user.num_unread_messages = 5
+    self.conv_user.put()
+
+    list(recount_gci_unread_messages.process(self.conv_user.key.to_old_key()))
+    self.assertEqual(2, self.conv_user.key.get().num_unread_messages)
@@ -0,0 +1,59 @@
+# Copyright 2014 the Melange authors.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+"""Tests for soc.mapreduce.set_gci_org_score_number_of_tasks."""
+
+from google.appengine.ext import ndb
+
+from soc.mapreduce import set_gci_org_score_number_of_tasks
+
+from soc.modules.gci.logic import org_score as org_score_logic
+from soc.modules.gci.models.score import GCIOrgScore
+
+from tests import profile_utils
+from tests import task_utils
+from tests import test_utils
+
+
+class ProcessTest(test_utils.GCIDjangoTestCase):
+  """Unit tests for process function."""
+
+  def setUp(self):
+    """See unittest.TestCase.setUp for specification."""
+    super(ProcessTest, self).setUp()
+    self.init()
+
+  def testNumberOfTasksIsSet(self):
+    """Tests that number of tasks is set for a score without it."""
+    mentor = profile_utils.seedNDBProfile(
+        self.program.key(), mentor_for=[ndb.Key.from_old_key(self.org.key())])
+    student = profile_utils.seedNDBStudent(self.program)
+    tasks = [
+        task_utils.seedTask(
+            self.program, self.org, [mentor.key.to_old_key()],
+            student=student.key.to_old_key())
+        for _ in range(2)]
+
+    # the score is stored with the default value of the property
+    org_score = GCIOrgScore(parent=student.key.to_old_key(), org=self.org,
+        tasks=[task.key() for task in tasks])
+    org_score.put()
+
+    list(set_gci_org_score_number_of_tasks.process(org_score.key()))
+
+    org_score = GCIOrgScore.get(org_score.key())
+    self.assertEqual(org_score.number_of_tasks, 2)
+    self.assertListEqual(
+        org_score_logic.getPossibleWinners(self.org), [student.key.get()])
@@ -29,6 +29,7 @@ from tests import program_utils
 from tests.utils import conversation_utils
 
 from soc.modules.gci.logic import conversation as gciconversation_logic
+from soc.modules.gci.models import conversation as gciconversation_model
 
 
 class GCIConversationTest(unittest.TestCase):
@@ -340,6 +341,89 @@ class GCIConversationTest(unittest.TestCase):
         program=self.program_key, user=self.user_keys[1])
     self.assertEqual(expected, actual)
 
+  def testUnreadMessageCountsAreMaintained(self):
+    """Tests that the numbers of unread messages are updated when messages are
+    created or read and users are added to or removed from conversations.
+    """
+    # The first user has one unread message in the first conversation
+    self.assertEqual(
+        1, gciconversation_logic.numUnreadMessagesForProgramAndUser(
+            program=self.program_key, user=self.user_keys[0]))
+
+    gciconversation_logic.createMessage(
+        conversation=self.conv_a.key, user=self.user_keys[1], content='Hi')
+
+    conv_user = (
+        gciconversation_logic.queryConversationUserForConversationAndUser(
+            self.conv_a.key, self.user_keys[0]).get())
+    self.assertEqual(2, conv_user.num_unread_messages)
+    self.assertEqual(
+        2, gciconversation_logic.numUnreadMessagesForProgramAndUser(
+            program=self.program_key, user=self.user_keys[0]))
+
+    gciconversation_logic.markAllReadForConversationAndUser(
+        conversation=self.conv_a.key, user=self.user_keys[0])
+
+    conv_user = conv_user.key.get()
+    self.assertEqual(0, conv_user.num_unread_messages)
+    self.assertEqual(
+        0, gciconversation_logic.numUnreadMessagesForProgramAndUser(
+            program=self.program_key, user=self.user_keys[0]))
+
+    # The third user has one unread message in the second conversation
+    self.assertEqual(
+        1, gciconversation_logic.numUnreadMessagesForProgramAndUser(
+            program=self.program_key, user=self.user_keys[2]))
+
+    # all the messages are unread for a user who is added to a conversation
+    conv_user = gciconversation_logic.addUserToConversation(
+        conversation=self.conv_a.key, user=self.user_keys[2])
+    self.assertEqual(2, conv_user.num_unread_messages)
+    self.assertEqual(
+        3, gciconversation_logic.numUnreadMessagesForProgramAndUser(
+            program=self.program_key, user=self.user_keys[2]))
+
+    gciconversation_logic.removeUserFromConversation(
+        conversation=self.conv_a.key, user=self.user_keys[2])
+    self.assertEqual(
+        1, gciconversation_logic.numUnreadMessagesForProgramAndUser(
+            program=self.program_key, user=self.user_keys[2]))
+
+  def testUncountedUnreadMessagesAreRecounted(self):
+    """Tests that unread messages are recounted and stored for conversation
+    users for which they have not been counted yet.
+    """
+    conv_user = (
+        gciconversation_logic.queryConversationUserForConversationAndUser(
+            self.conv_a.key, self.user_keys[0]).get())
+    conv_user.num_unread_messages = None
+    conv_user.put()
+
+    self.assertEqual(
+        1, gciconversation_logic.numUnreadMessagesForProgramAndUser(
+            program=self.program_key, user=self.user_keys[0]))
+    self.assertEqual(1, conv_user.key.get().num_unread_messages)
+
+  def testInterleavedUnreadMessageUpdates(self):
+    """Tests that no update of the number of unread messages is lost when
+    two updates of the same entity are interleaved.
+    """
+    gciconversation_logic.markAllReadForConversationAndUser(
+        conversation=self.conv_a.key, user=self.user_keys[0])
+    conv_user = (
+        gciconversation_logic.queryConversationUserForConversationAndUser(
+            self.conv_a.key, self.user_keys[0]).get())
+
+    # both updates read the entity before any of them writes it
+    sent_on = datetime.utcnow()
+    futures = [
+        gciconversation_logic._countUnreadMessage([conv_user.key], sent_on)
+        for _ in range(2)]
+    for future in futures:
+      future.get_result()
+
+    self.assertEqual(2, conv_user.key.get().num_unread_messages)
+
   def testCreateMessage(self):
     """Test that createMessage correctly creates a new message and updates
     the conversation's last_message_on time.
@@ -390,6 +474,26 @@ class GCIConversationTest(unittest.TestCase):
             conversation=conversation.key)))
     self.assertEqual(expected_keys, actual_keys)
 
+  def testAddUsersToConversation(self):
+    """Tests that addUsersToConversation adds the users to the conversation,
+    but only if they are not already involved.
+    """
+    conversation = self.conv_utils.createConversation(subject='A Subject')
+    gciconversation_logic.addUserToConversation(
+        conversation=conversation.key, user=self.user_keys[0])
+
+    gciconversation_logic.addUsersToConversation(
+        conversation.key, [self.user_keys[0], self.user_keys[1]])
+    # the same batch may be added again without creating duplicates
+    gciconversation_logic.addUsersToConversation(
+        conversation.key, [self.user_keys[0], self.user_keys[1]])
+
+    conv_users = gciconversation_model.GCIConversationUser.query(
+        ancestor=conversation.key).fetch()
+    self.assertEqual(
+        sorted([self.user_keys[0], self.user_keys[1]]),
+        sorted(conv_user.user for conv_user in conv_users))
+
   def testRemoveUserFromConversation(self):
     """Test that removeUserFromConversation removes the user from the
     conversation.
@@ -0,0 +1,85 @@
+# Copyright 2014 the Melange authors.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Tests for GCI ranking logic."""
+
+import unittest
+
+from soc.modules.gci.logic import ranking as ranking_logic
+from soc.modules.gci.models.score import GCIScore
+
+from tests import profile_utils
+from tests import program_utils
+
+
+class GetScoresPageTest(unittest.TestCase):
+  """Unit tests for getScoresPage function."""
+
+  def setUp(self):
+    """See unittest.TestCase.setUp for specification."""
+    self.program = program_utils.seedGCIProgram()
+
+    # two students are tied at the second position
+    self.scores = [self._seedScore(points) for points in [7, 4, 4, 1]]
+
+  def _seedScore(self, points):
+    """Seeds a score with the specified points for a new student and stores
+    it in the ranker.
+    """
+    student = profile_utils.seedNDBStudent(self.program)
+    score = GCIScore(parent=student.key.to_old_key(), program=self.program,
+        points=points)
+    score.put()
+    ranking_logic.setRankerScore(
+        self.program, score.parent_key(), score.points)
+    return score
+
+  def _getKeys(self, scores):
+    """Returns the keys of the specified scores."""
+    return [score.key() for score in scores]
+
+  def testFirstPage(self):
+    """Tests that the first page starts with the highest score."""
+    scores = ranking_logic.getScoresPage(self.program, 2)
+    self.assertListEqual(
+        [score.points for score in scores], [7, 4])
+
+  def testPageStartsInTie(self):
+    """Tests that a page which starts in a tie skips the tied scores which
+    have been returned on the previous page.
+    """
+    first_page = ranking_logic.getScoresPage(self.program, 2)
+    second_page = ranking_logic.getScoresPage(self.program, 2, offset=2)
+
+    self.assertListEqual([score.points for score in second_page], [4, 1])
+    self.assertSetEqual(
+        set(self._getKeys(first_page + second_page)),
+        set(self._getKeys(self.scores)))
+
+  def testOffsetAfterLastScore(self):
+    """Tests that no scores are returned after the last ranked score."""
+    self.assertListEqual(
+        ranking_logic.getScoresPage(self.program, 2, offset=4), [])
+
+  def testScoresWithoutPointsAreNotReturned(self):
+    """Tests that scores without any points are not returned."""
+    self._seedScore(0)
+    scores = ranking_logic.getScoresPage(self.program, 10)
+    self.assertEqual(len(scores), 4)
+
+  def testNoRanker(self):
+    """Tests that no scores are returned for a program without a ranker."""
+    other_program = program_utils.seedGCIProgram()
+    self.assertListEqual(
+        ranking_logic.getScoresPage(other_program, 2), [])
@@ -322,3 +322,31 @@ class UpdateConversationsTest(
         gciconversation_logic.queryForProgramAndUser(
             program=self.program_key, user=user_winner_key)))
     self.assertEqual(expected_keys, actual_keys)
+
+  def testRefreshConversationParticipantsPipeline(self):
+    """Tests that RefreshConversationParticipantsPipeline adds users who fit
+    the criteria of a conversation and removes the ones who do not.
+    """
+    user_mentor_key = self.conv_utils.createUser(
+        return_key=True, roles=[conversation_utils.MENTOR])
+    user_student_key = self.conv_utils.createUser(
+        return_key=True, roles=[conversation_utils.STUDENT])
+    creator_key = self.conv_utils.createUser(return_key=True)
+
+    # Conversation for program mentors which includes a student
+    conversation = self.conv_utils.createConversation(
+        subject='', creator=creator_key, users=[user_student_key])
+    conversation.recipients_type = conversation_model.PROGRAM
+    conversation.include_mentors = True
+    conversation.put()
+
+    update_conversations.startRefreshingConversationParticipants(
+        conversation.key)
+    self.executeMapReduceJobs()
+
+    expected_keys = set([creator_key, user_mentor_key])
+    actual_keys = set(
+        conv_user.user for conv_user in
+        gciconversation_logic.queryConversationUserForConversation(
+            conversation.key))
+    self.assertEqual(expected_keys, actual_keys)
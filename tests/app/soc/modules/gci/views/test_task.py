@@ -460,6 +460,7 @@ class TaskViewTest(test_utils.GCIDjangoTestCase, test_utils.TaskQueueTestCase):
         task.org).get()
     self.assertIsNotNone(org_score)
     self.assertEqual(org_score.numberOfTasks(), 1)
+    self.assertEqual(org_score.number_of_tasks, 1)
     self.assertEqual(org_score.tasks[0], task.key())
 
     # check if number_of_completed_tasks has been updated
@@ -133,6 +133,57 @@ class ProposalTest(unittest.TestCase):
     actual = proposal_logic.getProposalsToBeAcceptedForOrg(organization)
     self.assertEqual(actual, expected)
 
+  def testGetProposalKeysToBeAcceptedForOrg(self):
+    """Tests that only keys of GSoCProposals to be accepted are returned
+    if keys_only is set.
+    """
+    expected = [self.happy_accepted_proposals[1].key()]
+    actual = proposal_logic.getProposalsToBeAcceptedForOrg(
+        self.happy_organization, keys_only=True)
+    self.assertEqual(actual, expected)
+
+  def testGetProposalsToBeAcceptedForOrgs(self):
+    """Tests that GSoCProposals to be accepted are returned for each of
+    the specified organizations.
+    """
+    actual = proposal_logic.getProposalsToBeAcceptedForOrgs(
+        [self.foo_organization, self.happy_organization], keys_only=True)
+    expected = {
+        self.foo_organization.key: [],
+        self.happy_organization.key: [self.happy_accepted_proposals[1].key()],
+        }
+    self.assertDictEqual(actual, expected)
+
+  def testGetNumberOfAcceptedProposals(self):
+    """Tests that the number of accepted proposals is counted until it
+    is set for the organization.
+    """
+    number = proposal_logic.getNumberOfAcceptedProposals(self.bar_organization)
+    self.assertEqual(number, len(self.bar_accepted_proposals))
+
+    # the number is not stored by reads
+    organization = self.bar_organization.key.get()
+    self.assertIsNone(organization.number_of_accepted_proposals)
+
+    # the number is not updated before it is set
+    proposal_logic.updateNumberOfAcceptedProposals(organization.key, 1)
+    organization = self.bar_organization.key.get()
+    self.assertIsNone(organization.number_of_accepted_proposals)
+
+  def testSetNumberOfAcceptedProposals(self):
+    """Tests that the number is maintained after it is set."""
+    proposal_logic.setNumberOfAcceptedProposals(self.bar_organization.key)
+    organization = self.bar_organization.key.get()
+    self.assertEqual(
+        organization.number_of_accepted_proposals,
+        len(self.bar_accepted_proposals))
+
+    proposal_logic.updateNumberOfAcceptedProposals(organization.key, 1)
+    organization = self.bar_organization.key.get()
+    self.assertEqual(
+        proposal_logic.getNumberOfAcceptedProposals(organization),
+        len(self.bar_accepted_proposals) + 1)
+
   def testHasMentorProposalAssigned(self):
     """Unit test for proposal_logic.hasMentorProposalAssigned function."""
     # seed a new mentor
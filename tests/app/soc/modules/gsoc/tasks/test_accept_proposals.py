@@ -18,11 +18,16 @@ import httplib
 import urllib
 
 from google.appengine.ext import ndb
+from google.appengine.ext import testbed
 
 from melange.models import organization as org_model
 
+from soc.tasks import mailer
+
+from soc.modules.gsoc.logic import accept_proposals as conversion_logic
 from soc.modules.gsoc.models import project as project_model
 from soc.modules.gsoc.models import proposal as proposal_model
+from soc.modules.gsoc.tasks import accept_proposals
 
 from summerofcode.models import organization as soc_org_model
 
@@ -231,6 +236,71 @@ class AcceptProposalsTest(
         self.student2.key.to_old_key())
     self.assertEqual(projects.count(), 0)
 
+  def testAcceptProposalsForOrgPipeline(self):
+    """Tests that the pipeline converts all proposals for an organization."""
+    program_utils.seedGSoCProgramMessages(program_key=self.gsoc.key())
+
+    program_key = self.gsoc.key().name()
+    conversion_logic.startConversion(self.gsoc, 1)
+
+    org_pipeline = accept_proposals.AcceptProposalsForOrgPipeline(
+        program_key, self.org.key.id())
+    org_pipeline.run(program_key, self.org.key.id())
+
+    # assert post status of proposals
+    self.assertEqual(
+        self.student1_proposals[0].status, proposal_model.STATUS_ACCEPTED)
+    self.assertEqual(
+        self.student1_proposals[1].status, proposal_model.STATUS_REJECTED)
+    for proposal in self.student2_proposals:
+      self.assertEqual(proposal.status, proposal_model.STATUS_REJECTED)
+
+    # assert the students got proper emails
+    self.assertEmailSent(
+        to=self.student1.contact.email, subject='Congratulations!')
+    self.assertEmailSent(
+        to=self.student2.contact.email,
+        subject='Thank you for applying to %s' % self.gsoc.name)
+
+    # assert progress has been recorded
+    status = conversion_logic.getOrCreateStatusForProgram(self.gsoc)
+    self.assertEqual(status.nr_converted_projects, 1)
+    self.assertEqual(status.nr_rejected_proposals, 4)
+    self.assertEqual(status.nr_processed_organizations, 1)
+
+  def testAcceptProposalsForOrgPipelineRetried(self):
+    """Tests that a retried pipeline does not convert proposals again and
+    records the organization only once.
+    """
+    program_utils.seedGSoCProgramMessages(program_key=self.gsoc.key())
+
+    program_key = self.gsoc.key().name()
+    conversion_logic.startConversion(self.gsoc, 1)
+
+    org_pipeline = accept_proposals.AcceptProposalsForOrgPipeline(
+        program_key, self.org.key.id())
+    org_pipeline.run(program_key, self.org.key.id())
+    self.executeTasks(mailer.SEND_MAIL_URL, ['mail'])
+    mail_stub = self.testbed.get_stub(testbed.MAIL_SERVICE_NAME)
+    nr_sent_mails = len(mail_stub.get_sent_messages())
+
+    org_pipeline.run(program_key, self.org.key.id())
+
+    # no more mails are sent out
+    self.executeTasks(mailer.SEND_MAIL_URL, ['mail'])
+    self.assertEqual(len(mail_stub.get_sent_messages()), nr_sent_mails)
+
+    # no more projects are created
+    projects = project_model.GSoCProject.all().ancestor(
+        self.student1.key.to_old_key())
+    self.assertEqual(projects.count(), 1)
+
+    # progress has been recorded once
+    status = conversion_logic.getOrCreateStatusForProgram(self.gsoc)
+    self.assertEqual(status.nr_converted_projects, 1)
+    self.assertEqual(status.nr_rejected_proposals, 4)
+    self.assertEqual(status.nr_processed_organizations, 1)
+
 
 TEST_NUMBER_OF_ORGS = 5
 
@@ -204,7 +204,9 @@ class GradingSurveyGroupTest(
 
     self.assertEqual(response.status_code, httplib.OK)
     self.assertTasksInQueue(n=1, url=self.UPDATE_PROJECTS_URL)
-    self.assertTasksInQueue(n=1, url=self.SEND_URL)
+    # mails are sent out in bulk rather than by separate tasks
+    self.assertTasksInQueue(n=0, url=self.SEND_URL)
+    self.assertEmailSent(to=self.student.contact.email)
 
     project = project_model.GSoCProject.all().get()
     self.assertFalse(project is None)
@@ -149,9 +149,9 @@ class ProposalDuplicatesTest(GSoCDjangoTestCase, TaskQueueTestCase):
     self.assertTasksInQueue(n=0)
     self.assertEqual(GSoCProposalDuplicate.all().count(1), 0)
 
-  def testCalculateDuplicatesForSingleOrg(self):
-    """Test that calculates properly creates GSoCProposalDuplicate entities for
-    a single organization.
+  def testCalculateDuplicates(self):
+    """Test that calculate creates GSoCProposalDuplicate entities only for
+    students with duplicates and terminates after going through all orgs.
     """
     # skip the initialization step
     status = duplicates_logic.getOrCreateStatusForProgram(self.program)
@@ -162,59 +162,7 @@ class ProposalDuplicatesTest(GSoCDjangoTestCase, TaskQueueTestCase):
 
     response = self.post(self.CALCULATE_URL, post_data)
 
-    # must have enqueued itself again successfully
-    self.assertEqual(response.status_code, httplib.OK)
-    self.assertTasksInQueue(n=1)
-    self.assertTasksInQueue(n=1, url=self.CALCULATE_URL)
-
-    # the new task should have a query cursor present
-    params = self.get_tasks()[0]['params']
-    self.assertTrue(params.has_key('org_cursor'))
-    self.assertEqual(params['program_key'],
-                     urllib.quote_plus(self.program.key().id_or_name()))
-
-    # 2 duplicates should have been created since there are 2 students
-    duplicates = GSoCProposalDuplicate.all().fetch(1000)
-    self.assertEqual(len(duplicates), 2)
-    for dup in duplicates:
-      student_key = GSoCProposalDuplicate.student.get_value_for_datastore(dup)
-      if student_key == self.student1.key.to_old_key():
-        self.assertTrue(dup.is_duplicate)
-      else:
-        self.assertFalse(dup.is_duplicate)
-
-    status = duplicates_logic.getOrCreateStatusForProgram(self.program)
-    self.assertEqual(status.status, 'processing')
-
-
-  def testCalculateDuplicatesTerminates(self):
-    """Test that calculates terminates properly after going through all orgs.
-    """
-    # skip the initialization step
-    status = duplicates_logic.getOrCreateStatusForProgram(self.gsoc)
-    status.status = 'processing'
-    status.put()
-
-    post_data = {'program_key': self.gsoc.key().id_or_name()}
-
-    response = self.post(self.CALCULATE_URL, post_data)
-
-    # must have enqueued itself again successfully
-    self.assertEqual(response.status_code, httplib.OK)
-    self.assertTasksInQueue(n=1)
-    self.assertTasksInQueue(n=1, url=self.CALCULATE_URL)
-
-    # this data should be used for the second iteration
-    params = self.get_tasks()[0]['params']
-    for key, value in params.iteritems():
-      params[key] = urllib.unquote_plus(value)
-
-    # clean the queue
-    self.clear_task_queue()
-
-    response = self.post(self.CALCULATE_URL, params)
-
-    # only 1 org in test data so task should terminate now
+    # all the organizations are processed in a single task
     self.assertEqual(response.status_code, httplib.OK)
     self.assertTasksInQueue(n=0)
 
@@ -227,6 +175,27 @@ class ProposalDuplicatesTest(GSoCDjangoTestCase, TaskQueueTestCase):
     student_key = GSoCProposalDuplicate.student.get_value_for_datastore(dup)
     self.assertEqual(student_key, self.student1.key.to_old_key())
     self.assertEqual(len(dup.duplicates), _FIRST_STUDENT_NUMBER_OF_DUPLICATES)
+    self.assertListEqual(dup.orgs, [self.org.key.to_old_key()])
 
     status = duplicates_logic.getOrCreateStatusForProgram(self.program)
     self.assertEqual(status.status, 'idle')
+
+  def testCalculateUpdatesOnlyChangedDuplicates(self):
+    """Test that calculate does not write unchanged duplicates and removes
+    the ones which are not duplicates anymore.
+    """
+    post_data = {'program_key': self.program.key().id_or_name()}
+    self.post(self.CALCULATE_URL, post_data)
+    dup = GSoCProposalDuplicate.all().get()
+
+    # a duplicate for the second student is obsolete
+    obsolete_dup = GSoCProposalDuplicate(
+        program=self.program, student=self.student2.key.to_old_key(),
+        is_duplicate=True)
+    obsolete_dup.put()
+
+    self.post(self.CALCULATE_URL, post_data)
+
+    duplicates = GSoCProposalDuplicate.all().fetch(1000)
+    self.assertEqual(len(duplicates), 1)
+    self.assertEqual(duplicates[0].key(), dup.key())
@@ -14,6 +14,8 @@
 
 """Test for sending Survey reminders."""
 
+from soc.tasks import mailer
+
 from soc.modules.gsoc.models.grading_project_survey import GradingProjectSurvey
 from soc.modules.gsoc.models.project_survey import ProjectSurvey
 
@@ -80,7 +82,10 @@ class SurveyRemindersTest(
     self.assertResponseOK(response)
     self.assertTasksInQueue(n=2)
     self.assertTasksInQueue(n=1, url=self.SPAWN_URL)
-    self.assertTasksInQueue(n=1, url=self.SEND_URL)
+    # reminders are sent out in bulk rather than by separate tasks
+    self.assertTasksInQueue(n=0, url=self.SEND_URL)
+    self.assertTasksInQueue(n=1, url=mailer.SEND_MAIL_URL)
+    self.assertEmailSent(to=self.student.contact.email)
 
   def testSpawnSurveyRemindersForGradingSurvey(self):
     """Test spawning reminder tasks for a GradingProjectSurvey."""
@@ -95,7 +100,10 @@ class SurveyRemindersTest(
     self.assertResponseOK(response)
     self.assertTasksInQueue(n=2)
     self.assertTasksInQueue(n=1, url=self.SPAWN_URL)
-    self.assertTasksInQueue(n=1, url=self.SEND_URL)
+    # reminders are sent out in bulk rather than by separate tasks
+    self.assertTasksInQueue(n=0, url=self.SEND_URL)
+    self.assertTasksInQueue(n=1, url=mailer.SEND_MAIL_URL)
+    self.assertEmailSent(to=self.mentor.contact.email)
 
   def testSendSurveyReminderForProjectSurvey(self):
     """Test sending out a reminder for a ProjectSurvey."""
@@ -154,8 +162,9 @@ class SurveyRemindersTest(
     self.assertTasksInQueue(n=2)
     self.assertTasksInQueue(n=1, url=self.SPAWN_URL)
     # We have two projects in datastore and one is withdrawn, so we expect
-    # to spawn the task for only one project.
-    self.assertTasksInQueue(n=1, url=self.SEND_URL)
+    # to send a reminder for only one project.
+    self.assertTasksInQueue(n=0, url=self.SEND_URL)
+    self.assertTasksInQueue(n=1, url=mailer.SEND_MAIL_URL)
 
   def testDoesNotGradingProjectSurveyReminderForWithdrawnProject(self):
     """Test withdrawn projects don't spawn reminder tasks for
@@ -180,5 +189,6 @@ class SurveyRemindersTest(
     self.assertTasksInQueue(n=2)
     self.assertTasksInQueue(n=1, url=self.SPAWN_URL)
     # We have two projects in datastore and one is withdrawn, so we expect
-    # to spawn the task for only one project.
-    self.assertTasksInQueue(n=1, url=self.SEND_URL)
+    # to send a reminder for only one project.
+    self.assertTasksInQueue(n=0, url=self.SEND_URL)
+    self.assertTasksInQueue(n=1, url=mailer.SEND_MAIL_URL)
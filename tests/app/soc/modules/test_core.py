@@ -0,0 +1,200 @@
+# Copyright 2014 the Melange authors.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+"""Tests for soc.modules.core."""
+
+import itertools
+import unittest
+
+from django.core import urlresolvers
+from django.utils import regex_helper
+
+import settings
+
+from melange.request import url_resolver
+
+from soc.modules import core
+
+
+TEST_MODULE_NAMES = ['melange.callback', 'codein.callback']
+
+TEST_URL_PREFIXES = {
+    'melange.callback': ['site/settings/'],
+    }
+
+
+class RegisterLazyModuleCallbacksTest(unittest.TestCase):
+  """Unit tests for registerLazyModuleCallbacks function."""
+
+  def testCallbacksAreNotImported(self):
+    """Tests that callbacks are registered without being imported."""
+    test_core = core.Core()
+    test_core.registerLazyModuleCallbacks(TEST_MODULE_NAMES, TEST_URL_PREFIXES)
+
+    self.assertListEqual(test_core.lazy_callbacks, [
+        ('melange.callback', ('site/settings/',)),
+        ('codein.callback', ()),
+        ])
+    self.assertListEqual(test_core.registered_callbacks, [])
+
+  def testLazyResolverIsReturned(self):
+    """Tests that patterns are served by a lazy resolver."""
+    test_core = core.Core()
+    test_core.registerLazyModuleCallbacks(TEST_MODULE_NAMES, TEST_URL_PREFIXES)
+
+    patterns = test_core.getPatterns()
+    self.assertEqual(len(patterns), 1)
+    self.assertIsInstance(patterns[0], url_resolver.LazyURLResolver)
+    self.assertListEqual(test_core.registered_callbacks, [])
+
+
+class GetLazyModulePatternsTest(unittest.TestCase):
+  """Unit tests for getLazyModulePatterns function."""
+
+  def setUp(self):
+    """See unittest.TestCase.setUp for specification."""
+    self.core = core.Core()
+    self.core.registerLazyModuleCallbacks(TEST_MODULE_NAMES, TEST_URL_PREFIXES)
+
+  def testOnlySpecifiedCallbacksAreRegistered(self):
+    """Tests that only the specified callbacks are registered."""
+    patterns = self.core.getLazyModulePatterns(['melange.callback'])
+
+    self.assertEqual(len(self.core.registered_callbacks), 1)
+    self.assertEqual(
+        self.core.registered_callbacks[0].__module__, 'melange.callback')
+    self.assertListEqual(patterns, list(self.core.sitemap))
+
+  def testCallbacksAreRegisteredOnce(self):
+    """Tests that patterns of registered callbacks are reused."""
+    patterns = self.core.getLazyModulePatterns(['melange.callback'])
+    sitemap = list(self.core.sitemap)
+
+    self.assertListEqual(
+        self.core.getLazyModulePatterns(['melange.callback']), patterns)
+    self.assertEqual(len(self.core.registered_callbacks), 1)
+    self.assertListEqual(self.core.sitemap, sitemap)
+
+  def testPatternsAreInSpecifiedOrder(self):
+    """Tests that patterns are returned in the order of the modules."""
+    melange_patterns = self.core.getLazyModulePatterns(['melange.callback'])
+    codein_patterns = self.core.getLazyModulePatterns(['codein.callback'])
+
+    self.assertListEqual(
+        self.core.getLazyModulePatterns(
+            ['codein.callback', 'melange.callback']),
+        codein_patterns + melange_patterns)
+
+
+class CallbackModuleURLPrefixesTest(unittest.TestCase):
+  """Tests that URL prefixes declared in settings cover all the patterns
+  of the callback modules, so that lazily registered modules resolve all
+  their paths to the same views as eagerly registered ones.
+  """
+
+  def testAllModulesDeclarePrefixes(self):
+    """Tests that prefixes are declared for all the callback modules."""
+    self.assertSetEqual(
+        set(settings.CALLBACK_MODULE_NAMES),
+        set(settings.CALLBACK_MODULE_URL_PREFIXES))
+
+  def testPathsResolvedToSameViews(self):
+    """Tests that sample paths of all the patterns of each module are
+    resolved to the same views by the eager and the lazy resolvers.
+    """
+    eager_core = core.Core()
+    eager_core.registerModuleCallbacks(settings.CALLBACK_MODULE_NAMES)
+    eager_core.initialize()
+    eager_resolver, = eager_core.getPatterns()
+
+    lazy_core = core.Core()
+    lazy_core.registerLazyModuleCallbacks(
+        settings.CALLBACK_MODULE_NAMES, settings.CALLBACK_MODULE_URL_PREFIXES)
+    lazy_resolver, = lazy_core.getPatterns()
+
+    # patterns are collected by a separate core, so that the lazy resolver
+    # has to import the modules by itself
+    patterns_core = core.Core()
+    patterns_core.registerLazyModuleCallbacks(
+        settings.CALLBACK_MODULE_NAMES, settings.CALLBACK_MODULE_URL_PREFIXES)
+
+    patterns_without_samples = []
+    different_views = []
+    for module_name in settings.CALLBACK_MODULE_NAMES:
+      for pattern in patterns_core.getLazyModulePatterns([module_name]):
+        paths = _getSamplePaths(pattern)
+        if not paths:
+          patterns_without_samples.append(pattern.regex.pattern)
+
+        for path in paths:
+          eager_view = _resolveView(eager_resolver, path)
+          lazy_view = _resolveView(lazy_resolver, path)
+          if eager_view != lazy_view:
+            different_views.append((module_name, path, eager_view, lazy_view))
+
+    self.assertListEqual(patterns_without_samples, [])
+    self.assertListEqual(different_views, [])
+
+
+# Values which are tried for the groups of patterns to create sample paths.
+_SAMPLE_VALUES = ['test', '1', 'test/test', 'test/test/test']
+
+def _getSamplePaths(pattern):
+  """Returns sample paths which are matched by the specified pattern.
+
+  Args:
+    pattern: URL pattern.
+
+  Returns:
+    A list of paths, one for each alternative form of the pattern for which
+    the groups could be filled in with sample values.
+  """
+  paths = []
+  for format_string, params in regex_helper.normalize(pattern.regex.pattern):
+    for values in itertools.product(_SAMPLE_VALUES, repeat=len(params)):
+      path = format_string % dict(zip(params, values))
+      if pattern.regex.match(path):
+        paths.append(path)
+        break
+  return paths
+
+
+def _resolveView(resolver, path):
+  """Returns a description of the view to which the specified path is
+  resolved by the specified resolver.
+
+  Views of different cores are different instances, so they are described
+  by their classes and methods, URL names and arguments.
+
+  Args:
+    resolver: URL resolver.
+    path: Path to resolve.
+
+  Returns:
+    A tuple describing the view or None, if the path is not resolved.
+  """
+  try:
+    match = resolver.resolve(path)
+  except urlresolvers.Resolver404:
+    return None
+  view = match.func
+  if hasattr(view, 'im_self'):
+    # request handler methods of task classes
+    view_name = '%s.%s' % (view.im_self.__class__.__name__, view.__name__)
+  elif hasattr(view, '__name__'):
+    view_name = '%s.%s' % (view.__module__, view.__name__)
+  else:
+    view_name = view.__class__.__name__
+  return view_name, match.url_name, match.args, match.kwargs
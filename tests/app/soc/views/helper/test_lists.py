@@ -14,11 +14,17 @@
 
 """Tests for lists helper functions."""
 
+import csv
 import datetime
+import json
 import math
 import sys
 import unittest
 
+from google.appengine.ext import db
+from google.appengine.ext import ndb
+
+from django import http
 from django.utils import dateformat
 from django.utils import html
 
@@ -215,3 +221,238 @@ class DateColumnTypeTest(unittest.TestCase):
     self.assertEqual(
         dateformat.format(date, lists.DATE_FORMAT),
         self.column_type.safe(date))
+
+
+class TestReferencedModel(ndb.Model):
+  """Model of entities referenced by list entities in tests."""
+  name = ndb.StringProperty()
+
+
+class TestListModel(ndb.Model):
+  """Model of list entities in tests."""
+  reference = ndb.KeyProperty()
+
+
+class TestDbListModel(db.Model):
+  """Model of db list entities in tests."""
+  name = db.StringProperty()
+
+
+class PrefetchDependenciesTest(unittest.TestCase):
+  """Unit tests for ListConfiguration.prefetchDependencies method."""
+
+  def setUp(self):
+    """See unittest.TestCase.setUp for specification."""
+    self.referenced = [
+        TestReferencedModel(name='name %s' % i) for i in range(3)]
+    ndb.put_multi(self.referenced)
+
+    self.entities = [
+        TestListModel(reference=self.referenced[i % 3].key) for i in range(5)]
+    ndb.put_multi(self.entities)
+
+    self.list_config = lists.ListConfiguration()
+    self.list_config.addPlainTextColumn(
+        'name', 'Name', lambda entity, *args: entity.reference.get().name,
+        dependencies=lambda entity: [entity.reference])
+
+  def testPrefetchDependencies(self):
+    """Tests that all referenced entities are fetched."""
+    prefetched = self.list_config.prefetchDependencies(self.entities)
+    self.assertDictEqual(
+        dict((entity.key, entity) for entity in self.referenced), prefetched)
+
+  def testNoDependencies(self):
+    """Tests that nothing is fetched for lists without dependencies."""
+    list_config = lists.ListConfiguration()
+    list_config.addSimpleColumn('reference', 'Reference')
+    self.assertDictEqual({}, list_config.prefetchDependencies(self.entities))
+
+
+class RowRendererTest(unittest.TestCase):
+  """Unit tests for RowRenderer class."""
+
+  def setUp(self):
+    """See unittest.TestCase.setUp for specification."""
+    self.list_config = lists.ListConfiguration(add_key_column=False)
+    self.list_config.addDictColumn('name', 'Name')
+    self.list_config.addNumericalColumn(
+        'value', 'Value', lambda entity, *args: entity['value'])
+    self.list_config.addCustomRedirectRowButton(
+        'name', 'edit', 'Edit', lambda entity: 'edit/%s' % entity['name'])
+    self.list_config.setRowAction(
+        lambda entity, *args: 'show/%s' % entity['name'])
+
+  def testRender(self):
+    """Tests that a row is rendered correctly."""
+    row = self.list_config.compile().render({'name': 'foo', 'value': 1})
+
+    self.assertDictEqual({'name': 'foo', 'value': 1}, row['columns'])
+    self.assertDictEqual({'link': 'show/foo'}, row['operations']['row'])
+    self.assertEqual(
+        'edit/foo',
+        row['operations']['row_buttons']['name']['buttons_def']['edit']
+            ['parameters']['link'])
+
+  def testRowsDoNotShareState(self):
+    """Tests that rendering a row does not affect other rows."""
+    row_renderer = self.list_config.compile()
+    first_row = row_renderer.render({'name': 'foo', 'value': 1})
+    second_row = row_renderer.render({'name': 'bar', 'value': 2})
+
+    self.assertEqual(
+        'edit/foo',
+        first_row['operations']['row_buttons']['name']['buttons_def']['edit']
+            ['parameters']['link'])
+    self.assertEqual(
+        'edit/bar',
+        second_row['operations']['row_buttons']['name']['buttons_def']['edit']
+            ['parameters']['link'])
+
+    # the configuration is not modified
+    self.assertNotIn('link',
+        self.list_config._row_buttons['name']['edit']['parameters'])
+
+
+def _listRequest(start='', limit=None):
+  """Returns a request for data of a list.
+
+  Args:
+    start: The start parameter of the request.
+    limit: The limit parameter of the request, if any.
+
+  Returns:
+    http.HttpRequest object.
+  """
+  request = http.HttpRequest()
+  request.GET['start'] = start
+  if limit is not None:
+    request.GET['limit'] = str(limit)
+  return request
+
+
+class RawQueryContentResponseBuilderTest(unittest.TestCase):
+  """Unit tests for RawQueryContentResponseBuilder class."""
+
+  def setUp(self):
+    """See unittest.TestCase.setUp for specification."""
+    self.list_config = lists.ListConfiguration(add_key_column=False)
+    self.list_config.addSimpleColumn('name', 'Name')
+
+  def testBuildOnDbQuery(self):
+    """Tests that build returns rows and the next token for db queries."""
+    entities = [TestDbListModel(key_name='entity%s' % i, name='name %s' % i)
+        for i in range(5)]
+    db.put(entities)
+
+    query = TestDbListModel.all().order('__key__')
+    builder = lists.RawQueryContentResponseBuilder(
+        _listRequest(limit=3), self.list_config, query, lists.keyStarter,
+        batch_size=2)
+    content = builder.build().content()
+
+    self.assertListEqual(
+        ['name 0', 'name 1', 'name 2'],
+        [row['columns']['name'] for row in content['data']['']])
+    self.assertEqual(str(entities[3].key()), content['next'])
+
+    # the next page starts with the entity of the next token
+    start = content['next']
+    query = TestDbListModel.all().order('__key__')
+    builder = lists.RawQueryContentResponseBuilder(
+        _listRequest(start=start, limit=3), self.list_config, query,
+        lists.keyStarter, batch_size=2)
+    content = builder.build().content()
+
+    self.assertListEqual(
+        ['name 3', 'name 4'],
+        [row['columns']['name'] for row in content['data'][start]])
+    self.assertEqual('done', content['next'])
+
+  def testBuildNDBOnNdbQuery(self):
+    """Tests that buildNDB returns rows and the next token for ndb queries."""
+    entities = [TestReferencedModel(id='entity%s' % i, name='name %s' % i)
+        for i in range(5)]
+    ndb.put_multi(entities)
+
+    query = TestReferencedModel.query().order(TestReferencedModel.key)
+    builder = lists.RawQueryContentResponseBuilder(
+        _listRequest(limit=3), self.list_config, query, lists.keyStarter,
+        batch_size=2)
+    content = builder.buildNDB().content()
+
+    self.assertListEqual(
+        ['name 0', 'name 1', 'name 2'],
+        [row['columns']['name'] for row in content['data']['']])
+    _, next_cursor, _ = query.fetch_page(3)
+    self.assertEqual(next_cursor.urlsafe(), content['next'])
+
+    # the next page starts after the last entity of the previous one
+    start = content['next']
+    builder = lists.RawQueryContentResponseBuilder(
+        _listRequest(start=start, limit=3), self.list_config, query,
+        lists.keyStarter, batch_size=2)
+    content = builder.buildNDB().content()
+
+    self.assertListEqual(
+        ['name 3', 'name 4'],
+        [row['columns']['name'] for row in content['data'][start]])
+    self.assertEqual('done', content['next'])
+
+  def testExportCsv(self):
+    """Tests that all the rows of a list are exported to CSV."""
+    entities = [TestDbListModel(key_name='entity%s' % i, name='name %s' % i)
+        for i in range(5)]
+    db.put(entities)
+
+    request = _listRequest(limit=2)
+    request.GET['export'] = lists.CSV_EXPORT
+    query = TestDbListModel.all().order('__key__')
+    builder = lists.RawQueryContentResponseBuilder(
+        request, self.list_config, query, lists.keyStarter, batch_size=2)
+    response = builder.build().content()
+
+    self.assertEqual('text/csv', response['Content-Type'])
+    self.assertIn('list.csv', response['Content-Disposition'])
+    rows = list(csv.reader(response.content.splitlines()))
+    self.assertListEqual(
+        [['Name']] + [['name %s' % i] for i in range(5)], rows)
+
+  def testExportJson(self):
+    """Tests that all the rows of a list are exported to JSON."""
+    entities = [TestReferencedModel(id='entity%s' % i, name='name %s' % i)
+        for i in range(5)]
+    ndb.put_multi(entities)
+
+    request = _listRequest(limit=2)
+    request.GET['export'] = lists.JSON_EXPORT
+    query = TestReferencedModel.query().order(TestReferencedModel.key)
+    builder = lists.RawQueryContentResponseBuilder(
+        request, self.list_config, query, lists.keyStarter, batch_size=2)
+    response = builder.buildNDB().content()
+
+    self.assertEqual('application/json', response['Content-Type'])
+    self.assertListEqual(
+        [{'name': 'name %s' % i} for i in range(5)],
+        json.loads(response.content))
+
+
+class GetExportFormatTest(unittest.TestCase):
+  """Unit tests for getExportFormat function."""
+
+  def testExportFormat(self):
+    """Tests that a supported export format is returned."""
+    request = http.HttpRequest()
+    request.GET['export'] = lists.CSV_EXPORT
+    self.assertEqual(lists.getExportFormat(request), lists.CSV_EXPORT)
+
+  def testNoExportFormat(self):
+    """Tests that None is returned if nothing is to be exported."""
+    request = http.HttpRequest()
+    self.assertIsNone(lists.getExportFormat(request))
+
+  def testUnsupportedExportFormat(self):
+    """Tests that None is returned for an unsupported export format."""
+    request = http.HttpRequest()
+    request.GET['export'] = 'xls'
+    self.assertIsNone(lists.getExportFormat(request))
@@ -75,11 +75,13 @@ def setup_gae_services():
 def clean_datastore():
   from google.appengine.api import apiproxy_stub_map
   from google.appengine.ext import ndb
+  from melange.utils import cache
   datastore = apiproxy_stub_map.apiproxy.GetStub('datastore_v3')
   if datastore is not None:
     datastore.Clear()
 
   ndb.get_context().clear_cache()
+  cache.clearInstanceCaches()
 
 
 def clear_memcache():
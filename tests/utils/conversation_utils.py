@@ -133,7 +133,8 @@ class ConversationHelper(object):
       time = datetime.utcnow()
 
     message = self.message_model_class(
-        conversation=conversation, author=user, content=content, sent_on=time)
+        parent=conversation, conversation=conversation, author=user,
+        content=content, sent_on=time)
     message.put()
 
     # Update conversation last_message_on time
@@ -141,11 +142,17 @@ class ConversationHelper(object):
     conversation_ent.last_message_on = message.sent_on
     conversation_ent.put()
 
-    # Update conversationuser last_message_on properties by re-putting each
-    # entity
+    # Update conversationuser last_message_on properties and count the message
+    # as unread by re-putting each entity
+    def reput(conv_user):
+      if (conv_user.num_unread_messages is not None and
+          conv_user.last_message_seen_on < message.sent_on):
+        conv_user.num_unread_messages += 1
+      conv_user.put()
+
     conv_user_query = self.conversation_user_model_class.query(
         self.conversation_user_model_class.conversation == conversation)
-    conv_user_query.map(lambda cu: cu.put())
+    conv_user_query.map(reput)
 
     return message
 
@@ -166,6 +173,8 @@ class ConversationHelper(object):
 
     conv_user = conv_users[0]
     conv_user.last_message_seen_on = time
+    # the messages are recounted when the number is read next time
+    conv_user.num_unread_messages = None
     conv_user.put()
 
   def createUser(